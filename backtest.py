@@ -0,0 +1,122 @@
+"""
+Прогон лестницы из strategy.py по историческим данным F&G и цен.
+
+Формат истории (CSV с разделителем ";", как trades.csv):
+    timestamp_utc;fng;btc_price;eth_price
+
+Запуск:
+    python backtest.py history.csv --trades bt_trades.csv --equity bt_equity.csv
+"""
+
+import argparse
+import csv
+import time
+from array import array
+
+from core import fmt_usd
+from equity import max_drawdown
+from ledger import TRADE_FIELDS
+from strategy import BASE_CAPITAL, DEFAULT_LADDER, PortfolioState, step
+
+
+def load_history(path: str):
+    """
+    История в компактных массивах: (timestamps, fng, btc, eth).
+    timestamps — список строк, числа — array("h") / array("d").
+    """
+    timestamps = []
+    fng = array("h")
+    btc = array("d")
+    eth = array("d")
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f, delimiter=";")
+        for row in reader:
+            timestamps.append(row["timestamp_utc"])
+            fng.append(int(row["fng"]))
+            btc.append(float(row["btc_price"]))
+            eth.append(float(row["eth_price"]))
+    return timestamps, fng, btc, eth
+
+
+def run_backtest(
+    timestamps, fng, btc, eth, base_capital: float = BASE_CAPITAL, ladder=DEFAULT_LADDER
+):
+    """
+    Тот же шаг стратегии, что и в bot.main, на каждом тике истории.
+    Возвращает (trades, equity, state):
+      trades — список (timestamp, Trade) в порядке исполнения,
+      equity — array("d") стоимости портфеля после каждого тика.
+    """
+    state = PortfolioState.new(base_capital, ladder)
+    trades = []
+    equity = array("d", bytes(8 * len(fng)))
+
+    for i in range(len(fng)):
+        btc_price = btc[i]
+        eth_price = eth[i]
+        state, tick_trades = step(state, fng[i], btc_price, eth_price, ladder)
+        for t in tick_trades:
+            trades.append((timestamps[i], t))
+        equity[i] = state.cash + state.btc * btc_price + state.eth * eth_price
+
+    return trades, equity, state
+
+
+def write_trades(path: str, trades):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(TRADE_FIELDS)
+        for ts, t in trades:
+            writer.writerow(
+                [
+                    ts,
+                    t.asset,
+                    t.action,
+                    t.fng,
+                    t.price,
+                    t.usd_amount,
+                    t.asset_delta,
+                    t.cash_after,
+                    t.asset_after,
+                    t.avg_entry_price if t.avg_entry_price is not None else "",
+                ]
+            )
+
+
+def write_equity(path: str, timestamps, equity):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["timestamp_utc", "total_value"])
+        for ts, v in zip(timestamps, equity):
+            writer.writerow([ts, v])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бэктест лестницы F&G")
+    parser.add_argument("history", help="CSV: timestamp_utc;fng;btc_price;eth_price")
+    parser.add_argument("--base", type=float, default=BASE_CAPITAL)
+    parser.add_argument("--trades", help="куда записать журнал сделок")
+    parser.add_argument("--equity", help="куда записать кривую капитала")
+    args = parser.parse_args(argv)
+
+    timestamps, fng, btc, eth = load_history(args.history)
+
+    t0 = time.perf_counter()
+    trades, equity, _ = run_backtest(timestamps, fng, btc, eth, args.base)
+    elapsed = time.perf_counter() - t0
+
+    if args.trades:
+        write_trades(args.trades, trades)
+    if args.equity:
+        write_equity(args.equity, timestamps, equity)
+
+    final = equity[-1] if equity else args.base
+    print(f"Тиков: {len(fng)}, сделок: {len(trades)}, время: {elapsed * 1000:.1f} мс")
+    print(
+        f"Итог: {fmt_usd(final)} $ ({(final / args.base - 1) * 100:+.2f}%), "
+        f"макс. просадка: {max_drawdown(equity) * 100:.2f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
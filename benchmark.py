@@ -0,0 +1,319 @@
+"""
+Офлайн-бенчмарк: тик бота, чтение журнала, отчёты и файл состояния без сети.
+
+CMC, CoinGecko и Telegram подменяются локальным http.server
+(базовые адреса — через CMC_BASE_URL / COINGECKO_BASE_URL / TELEGRAM_API_URL),
+всё пишется во временную папку, которая удаляется после прогона (--keep —
+оставить). Результат — JSON, удобно сравнивать между коммитами и при росте
+журнала.
+
+Запуск:
+    python benchmark.py                      # журналы 1k и 100k строк
+    python benchmark.py --rows 1000,100000,10000000 --out bench.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import contextlib
+import platform
+import tempfile
+import threading
+import statistics
+from datetime import datetime, date, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_ROWS = "1000,100000"
+TICK_RUNS = 20
+LEDGER_RUNS = 20
+REPORT_RUNS = 5
+STATE_RUNS = 200
+
+# F&G, который по кругу отдаёт заглушка CMC: тихие тики и сигналы вперемешку
+FNG_CYCLE = [50, 45, 38, 33, 50, 28, 22, 14, 30, 45, 55, 61, 66, 72, 77, 50]
+BTC_PRICE = 60_000.0
+ETH_PRICE = 3_000.0
+
+
+# ---- ЛОКАЛЬНЫЕ ЗАГЛУШКИ API ----
+
+class StubHandler(BaseHTTPRequestHandler):
+    counter = {"fng": 0, "message_id": 0}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/v3/fear-and-greed/historical":
+            if "start" in query:
+                start = date.fromisoformat(query["start"][:10])
+                end = date.fromisoformat(query["end"][:10])
+                days = (end - start).days
+                data = [
+                    {
+                        "timestamp": str(
+                            int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+                        ),
+                        "value": FNG_CYCLE[i % len(FNG_CYCLE)],
+                    }
+                    for i, d in enumerate(start + timedelta(days=n) for n in range(days))
+                ]
+            else:
+                with self.lock:
+                    n = self.counter["fng"]
+                    self.counter["fng"] += 1
+                now = datetime.now(timezone.utc)
+                data = [
+                    {
+                        "timestamp": now.isoformat(),
+                        "value": FNG_CYCLE[n % len(FNG_CYCLE)],
+                    }
+                ]
+            return self._reply({"data": data})
+
+        if url.path == "/api/v3/simple/price":
+            prices = {"bitcoin": BTC_PRICE, "ethereum": ETH_PRICE}
+            ids = query.get("ids", "").split(",")
+            return self._reply({i: {"usd": prices.get(i, 100.0)} for i in ids})
+
+        self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.path.endswith("/sendMessage"):
+            with self.lock:
+                self.counter["message_id"] += 1
+                mid = self.counter["message_id"]
+            return self._reply({"ok": True, "result": {"message_id": mid}})
+        self.send_error(404)
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# ---- ЗАМЕРЫ ----
+
+def measure(fn, runs: int, setup=None):
+    """Время fn() в миллисекундах по runs прогонам; setup() — вне замера."""
+    times = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "runs": runs,
+        "min_ms": times[0],
+        "median_ms": statistics.median(times),
+        "p90_ms": times[min(len(times) - 1, math.ceil(len(times) * 0.9) - 1)],
+        "max_ms": times[-1],
+    }
+
+
+def write_synthetic_ledger(path: str, rows: int, months: int = 24):
+    """Журнал из rows сделок, равномерно по последним months месяцам."""
+    from ledger import TRADE_FIELDS, build_index, save_index
+
+    rnd = random.Random(rows)
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=30 * months)
+    step = (end - start) / rows
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(";".join(TRADE_FIELDS) + "\r\n")
+        ts = start
+        for i in range(rows):
+            asset = "BTC" if i % 2 == 0 else "ETH"
+            action = "BUY" if rnd.random() < 0.6 else "SELL"
+            price = BTC_PRICE if asset == "BTC" else ETH_PRICE
+            usd = 550.0
+            delta = usd / price if action == "BUY" else -usd / price
+            f.write(
+                f"{ts.isoformat()};{asset};{action};{rnd.randint(5, 90)};{price};{usd};"
+                f"{delta};{5000.0};{1.0};{price * 0.9}\r\n"
+            )
+            ts += step
+    save_index(build_index(path), path)
+
+
+def bench_ledger(rows_list, workdir: str):
+    import inactivity_report
+    import monthly_report
+
+    results = {}
+    for rows in rows_list:
+        folder = os.path.join(workdir, f"ledger_{rows}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "trades.csv")
+
+        t0 = time.perf_counter()
+        write_synthetic_ledger(path, rows)
+        gen_s = time.perf_counter() - t0
+
+        monthly_report.TRADES_FILE = path
+        inactivity_report.TRADES_FILE = path
+        _, _, m_start, m_end = monthly_report.get_month_bounds()
+        runs = LEDGER_RUNS if rows <= 1_000_000 else 3
+
+        results[str(rows)] = {
+            "file_mb": os.path.getsize(path) / 1e6,
+            "generate_s": gen_s,
+            "load_trades_for_month": measure(
+                lambda: monthly_report.load_trades_for_month(m_start, m_end), runs
+            ),
+            "get_last_trade_date": measure(inactivity_report.get_last_trade_date, runs),
+        }
+        print(f"  журнал {rows}: готово")
+    return results
+
+
+def bench_tick():
+    import bot
+    import cache
+
+    def reset_cache():
+        cache._caches.clear()
+        cache._dirty.clear()
+        if os.path.exists(cache.CACHE_FILE):
+            os.remove(cache.CACHE_FILE)
+
+    return {
+        "tick_uncached": measure(bot.main, TICK_RUNS, setup=reset_cache),
+        "tick_cached": measure(bot.main, TICK_RUNS),
+    }
+
+
+def bench_reports():
+    import monthly_report
+    import yearly_report
+
+    monthly_report.TRADES_FILE = "trades.csv"
+    return {
+        "monthly_report": measure(monthly_report.main, REPORT_RUNS),
+        "yearly_report": measure(yearly_report.main, REPORT_RUNS),
+    }
+
+
+def bench_state(workdir: str):
+    """Чтение и запись одного состояния (с PnL за DAYS_KEPT дней) в JSON и .bin."""
+    import persistence
+    import pnl
+    from bot import new_state
+
+    state = new_state(10_000.0)
+    state["pnl"] = pnl.empty()
+    day = date(2024, 1, 1)
+    for i in range(pnl.DAYS_KEPT):
+        pnl.add_trade(state["pnl"], day + timedelta(days=i), "BTC",
+                      "BUY" if i % 3 else "SELL", 550.0, 0.01, 0.5, BTC_PRICE)
+
+    results = {}
+    for fmt in ("json", "bin"):
+        path = os.path.join(workdir, f"state_{fmt}", "state.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        persistence.STATE_FORMAT = fmt
+        persistence.write_state(state, path)
+        results[fmt] = {
+            "load": measure(lambda: persistence.read_state(path), STATE_RUNS),
+            "save": measure(lambda: persistence.write_state(state, path), STATE_RUNS),
+        }
+    persistence.STATE_FORMAT = "json"
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк FNG Secretary")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="размеры журналов через запятую")
+    parser.add_argument("--out", help="куда записать JSON (по умолчанию — stdout)")
+    parser.add_argument("--keep", action="store_true",
+                        help="не удалять временную папку с журналами и состоянием")
+    args = parser.parse_args(argv)
+    rows_list = [int(x) for x in args.rows.split(",") if x]
+
+    server, base_url = start_stub()
+    workdir = tempfile.mkdtemp(prefix="secretary-bench-")
+    os.environ.update(
+        {
+            "CMC_API_KEY": "bench",
+            "TELEGRAM_BOT_TOKEN": "bench",
+            "TELEGRAM_CHAT_ID": "@bench",
+            "CMC_BASE_URL": base_url,
+            "COINGECKO_BASE_URL": base_url,
+            "TELEGRAM_API_URL": base_url,
+            "SECRETARY_CACHE": os.path.join(workdir, "market_cache.json"),
+        }
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    # модули читают окружение при импорте, поэтому импортируем их только здесь
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import telegram_queue
+
+    # лимиты Telegram меряют паузы, а не код — в бенчмарке их снимаем
+    telegram_queue.PER_CHAT_INTERVAL = 0.0
+    telegram_queue.GLOBAL_PER_SECOND = 10**6
+
+    try:
+        # вывод бота и отчётов — в stderr, чтобы stdout остался чистым JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            print("Тик бота...")
+            results = {"tick": bench_tick()}
+            print("Отчёты...")
+            results["reports"] = bench_reports()
+            print("Состояние...")
+            results["state"] = bench_state(workdir)
+            print("Журналы...")
+            results["ledger"] = bench_ledger(rows_list, workdir)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        if not args.keep:
+            import cache
+            import sqlite_store
+
+            # счётчики кэша и соединения с базой пишут в папку при выходе
+            cache.save_stats()
+            sqlite_store.close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.keep:
+        report["workdir"] = workdir
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,471 +1,288 @@
 import os
-import json
-import csv
-import math
+import contextvars
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
+from typing import NamedTuple
+
+import equity
+import metrics
+import pnl
+from cache import cached
+from core import (
+    CMC_API_KEY,
+    FNG_HISTORICAL_PATH,
+    TELEGRAM_BOT_TOKEN,
+    cmc_get,
+    fmt_usd,
+    parse_cmc_timestamp,
+)
+from ledger import TRADES_FILE
+from persistence import (
+    STATE_FILE,
+    commit_tick,
+    group_commit,
+    read_state,
+    recover,
+    write_state,
+)
+from portfolios import load_portfolios
+from prices import get_prices
+from state_codec import upgrade
+import telegram_queue
+from strategy import (
+    BASE_CAPITAL,
+    DEFAULT_LADDER,
+    PortfolioState,
+    is_quiet,
+    next_triggers,
+    signals_from_trades,
+    step,
+)
+
+
+class MarketSnapshot(NamedTuple):
+    """Рыночные данные одного тика: F&G и цены, полученные параллельно."""
+
+    fng: int
+    fng_ts: datetime
+    btc_price: float
+    eth_price: float
 
-import requests
 
-STATE_FILE = "secretary_state.json"
-TRADES_FILE = "trades.csv"
-
-BASE_CAPITAL = 10_000.0  # базовый виртуальный депозит
-
-CMC_API_KEY = os.environ.get("CMC_API_KEY")
-TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-
-# ---- ПАРАМЕТРЫ СТРАТЕГИИ ----
-
-# Целевые суммы покупок по уровням F&G (кратно 50$, суммарно 10 000 $)
-BUY_TARGETS = {
-    40: 1100.0,
-    35: 1500.0,
-    30: 1850.0,
-    25: 1850.0,
-    20: 1850.0,
-    15: 1850.0,
-}
-
-# Порядок уровней для покупок и продаж
-BUY_LEVELS = [40, 35, 30, 25, 20, 15]
-SELL_LEVELS = [60, 65, 70, 75]
-
-# Доли продажи от целевого пакета на каждый уровень (суммарно 100%)
-SELL_FRACS = {
-    60: 0.25,
-    65: 0.25,
-    70: 0.25,
-    75: 0.25,
-}
+# ---- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ----
 
+def new_state(base_capital: float = BASE_CAPITAL, ladder=DEFAULT_LADDER):
+    return PortfolioState.new(base_capital, ladder).to_dict(ladder)
 
-# ---- ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ----
 
-def fmt_usd(x: float) -> str:
-    return f"{x:,.2f}".replace(",", " ")
-
-
-def round_down_50(x: float) -> float:
-    """Округление вниз до ближайших 50$."""
-    if x <= 0:
-        return 0.0
-    return math.floor(x / 50.0) * 50.0
-
-
-def load_state():
-    if not os.path.exists(STATE_FILE):
-        state = {
-            "base_capital": BASE_CAPITAL,
-            "cash_usd": BASE_CAPITAL,
-            "btc_amount": 0.0,
-            "eth_amount": 0.0,
-            "avg_entry_btc": None,
-            "avg_entry_eth": None,
-            "buckets": {
-                str(lvl): {
-                    "invested_usd": 0.0,
-                    "btc_amount": 0.0,
-                    "eth_amount": 0.0,
-                }
-                for lvl in BUY_LEVELS
-            },
-            "sell_used": {str(lvl): False for lvl in SELL_LEVELS},
-        }
-        save_state(state)
+def load_state(
+    path: str = STATE_FILE,
+    trades_path: str = TRADES_FILE,
+    base_capital: float = BASE_CAPITAL,
+    ladder=DEFAULT_LADDER,
+):
+    with metrics.stage("state_load"):
+        return _load_state(path, trades_path, base_capital, ladder)
+
+
+def _load_state(path, trades_path, base_capital, ladder):
+    recover(path, trades_path)
+
+    state = read_state(path)
+    if state is None:
+        folder = os.path.dirname(path)
+        if folder:
+            # кривая стоимости лежит рядом с состоянием и при хранении в базе
+            os.makedirs(folder, exist_ok=True)
+        state = new_state(base_capital, ladder)
+        state["pnl"] = pnl.empty()
+        set_next_trigger(state, PortfolioState.from_dict(state, ladder), ladder)
+        save_state(state, path)
         return state
 
-    with open(STATE_FILE, "r", encoding="utf-8") as f:
-        state = json.load(f)
-
-    if "buckets" not in state:
-        state["buckets"] = {
-            str(lvl): {
-                "invested_usd": 0.0,
-                "btc_amount": 0.0,
-                "eth_amount": 0.0,
-            }
-            for lvl in BUY_LEVELS
-        }
-    if "sell_used" not in state:
-        state["sell_used"] = {str(lvl): False for lvl in SELL_LEVELS}
+    upgrade(state, ladder)
+    if "pnl" not in state:
+        state["pnl"] = pnl.rebuild(path, trades_path)
+    # пороги — производные данные: при загрузке всегда пересчитываем
+    set_next_trigger(state, PortfolioState.from_dict(state, ladder), ladder)
 
     return state
 
 
-def save_state(state):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+def set_next_trigger(state, s: PortfolioState, ladder=DEFAULT_LADDER):
+    buy_at, sell_at = next_triggers(s, ladder)
+    state["next_trigger"] = {"buy_at": buy_at, "sell_at": sell_at}
 
 
-def log_trade(
-    asset: str,
-    action: str,
-    fng: int,
-    price: float,
-    usd_amount: float,
-    asset_delta: float,
-    cash_after: float,
-    asset_after: float,
-    avg_entry_price: float | None,
-):
-    is_new = not os.path.exists(TRADES_FILE)
-    with open(TRADES_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f, delimiter=";")
-        if is_new:
-            writer.writerow(
-                [
-                    "timestamp_utc",
-                    "asset",
-                    "action",
-                    "fng",
-                    "price",
-                    "usd_amount",
-                    "asset_delta",
-                    "cash_after",
-                    "asset_after",
-                    "avg_entry_price",
-                ]
-            )
-        writer.writerow(
-            [
-                datetime.now(timezone.utc).isoformat(),
-                asset,
-                action,
-                fng,
-                price,
-                usd_amount,
-                asset_delta,
-                cash_after,
-                asset_after,
-                avg_entry_price if avg_entry_price is not None else "",
-            ]
-        )
+def save_state(state, path: str = STATE_FILE):
+    write_state(state, path)
+
+
+def fetch_fng_latest():
+    return cmc_get(FNG_HISTORICAL_PATH, {"limit": 1})[0]
 
 
 def get_fng_cmc():
     """
-    Получаем последний индекс страха и жадности от CoinMarketCap.
+    Получаем последний индекс страха и жадности от CoinMarketCap
+    (через кэш: индекс обновляется раз в сутки, кредиты тратим реже;
+    устаревшее значение тику не отдаём — торгуем только по свежему).
     Поддерживаем Unix timestamp и ISO-формат.
     """
-    url = "https://pro-api.coinmarketcap.com/v3/fear-and-greed/historical"
-    headers = {"X-CMC_PRO_API_KEY": CMC_API_KEY}
-    params = {"limit": 1}
-    r = requests.get(url, headers=headers, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    item = data["data"][0]
-    value = int(item["value"])
-
-    ts_raw = str(item.get("timestamp", ""))
-    if ts_raw.isdigit():
-        ts = datetime.fromtimestamp(int(ts_raw), tz=timezone.utc)
-    else:
-        ts = datetime.fromisoformat(ts_raw.replace("Z", "+00:00"))
+    with metrics.stage("fetch_fng"):
+        item = cached("fng", "latest", fetch_fng_latest, allow_stale=False)
+    return int(item["value"]), parse_cmc_timestamp(item.get("timestamp", ""))
 
-    return value, ts
 
-
-def get_price(symbol: str) -> float:
+def get_market_snapshot() -> MarketSnapshot:
     """
-    Цена через CoinGecko:
-    symbol: "BTCUSDT" или "ETHUSDT"
+    Параллельно запрашиваем F&G и цены (все активы — одним запросом).
+    Время тика ≈ самый медленный запрос, а не сумма всех.
+    При первой же ошибке не ждём остальные запросы и пробрасываем исключение.
     """
-    if symbol == "BTCUSDT":
-        coin_id = "bitcoin"
-    elif symbol == "ETHUSDT":
-        coin_id = "ethereum"
-    else:
-        raise ValueError(f"Неизвестный тикер для CoinGecko: {symbol}")
-
-    url = "https://api.coingecko.com/api/v3/simple/price"
-    params = {"ids": coin_id, "vs_currencies": "usd"}
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    return float(data[coin_id]["usd"])
-
-
-def send_telegram(text: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-        "parse_mode": "HTML",
-    }
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-
-def reset_cycle(state):
-    """Полный сброс цикла: когда вышли из позиции полностью."""
-    state["buckets"] = {
-        str(lvl): {
-            "invested_usd": 0.0,
-            "btc_amount": 0.0,
-            "eth_amount": 0.0,
-        }
-        for lvl in BUY_LEVELS
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        # контекст копируем, чтобы этапы попали в метрики текущего запуска
+        f_fng = pool.submit(contextvars.copy_context().run, get_fng_cmc)
+        f_prices = pool.submit(
+            contextvars.copy_context().run,
+            get_prices,
+            ["BTCUSDT", "ETHUSDT"],
+            allow_stale=False,
+        )
+        futures = [f_fng, f_prices]
+
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for fut in done:
+            if fut.exception() is not None:
+                raise fut.exception()
+
+        fng, fng_ts = f_fng.result()
+        prices = f_prices.result()
+        return MarketSnapshot(fng, fng_ts, prices["BTCUSDT"], prices["ETHUSDT"])
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def trade_row(t) -> dict:
+    """Сделка strategy.Trade -> аргументы ledger.log_trade."""
+    return {
+        "asset": t.asset,
+        "action": t.action,
+        "fng": t.fng,
+        "price": t.price,
+        "usd_amount": t.usd_amount,
+        "asset_delta": t.asset_delta,
+        "cash_after": t.cash_after,
+        "asset_after": t.asset_after,
+        "avg_entry_price": t.avg_entry_price,
     }
-    state["sell_used"] = {str(lvl): False for lvl in SELL_LEVELS}
-    state["avg_entry_btc"] = None
-    state["avg_entry_eth"] = None
 
 
 # ---- ОСНОВНАЯ ЛОГИКА ----
 
-def main():
-    if not (CMC_API_KEY and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
-        print(
-            "Не заданы переменные окружения: CMC_API_KEY / TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID"
+def format_signal(signal, fng: int, base: float) -> str:
+    action, level, usd_btc, usd_eth = signal
+    total_usd = usd_btc + usd_eth
+    pct_initial = total_usd / base * 100 if base > 0 else 0.0
+
+    if action == "SELL":
+        return (
+            "📈 <b>Сигнал: ПРОДАЖА BTC и ETH</b>\n"
+            "\n"
+            f"Уровень жадности: <b>{level}</b>\n"
+            f"Текущий F&amp;G: <b>{fng}</b>\n"
+            "\n"
+            f"Общий объём продажи: <b>{fmt_usd(total_usd)} $</b> "
+            f"(≈ {pct_initial:.2f}% от базового портфеля {fmt_usd(base)} $)\n"
+            f"• BTC: продано на ~<b>{fmt_usd(usd_btc)} $</b>\n"
+            f"• ETH: продано на ~<b>{fmt_usd(usd_eth)} $</b>"
         )
-        return
-
-    state = load_state()
 
-    cash = float(state.get("cash_usd", BASE_CAPITAL))
-    btc = float(state.get("btc_amount", 0.0))
-    eth = float(state.get("eth_amount", 0.0))
-    avg_btc = state.get("avg_entry_btc")
-    avg_eth = state.get("avg_entry_eth")
-    buckets = state["buckets"]
-    sell_used = state["sell_used"]
-    base = float(state.get("base_capital", BASE_CAPITAL))
-
-    try:
-        fng, _ = get_fng_cmc()
-        btc_price = get_price("BTCUSDT")
-        eth_price = get_price("ETHUSDT")
-    except Exception as e:
-        print("Ошибка при запросе данных:", e)
-        return
-
-    actions_text_parts: list[str] = []
-
-    # --- если полностью вышли из позиции — считаем, что цикл обнулился ---
-    total_invested = sum(bucket["invested_usd"] for bucket in buckets.values())
-    if total_invested <= 0.0 and btc <= 0.0 and eth <= 0.0:
-        reset_cycle(state)
-        buckets = state["buckets"]
-        sell_used = state["sell_used"]
-
-    # ---------- ПРОДАЖИ ----------
-
-    for lvl in SELL_LEVELS:
-        lvl_str = str(lvl)
-        if sell_used[lvl_str]:
-            continue
-
-        if fng >= lvl:
-            frac = SELL_FRACS[lvl]
-
-            total_sell_btc = 0.0
-            total_sell_eth = 0.0
-            total_sell_usd_btc = 0.0
-            total_sell_usd_eth = 0.0
-
-            for bl in BUY_LEVELS:
-                bl_str = str(bl)
-                bucket = buckets[bl_str]
-                invested = float(bucket["invested_usd"])
-                if invested <= 0:
-                    continue
-
-                target = BUY_TARGETS[bl]
-                planned_usd = target * frac
-                sell_usd = min(invested, round_down_50(planned_usd))
-                if sell_usd <= 0:
-                    continue
-
-                bucket_btc = float(bucket["btc_amount"])
-                bucket_eth = float(bucket["eth_amount"])
-                btc_value = bucket_btc * btc_price
-                eth_value = bucket_eth * eth_price
-                bucket_value = btc_value + eth_value
-                if bucket_value <= 0:
-                    continue
-
-                sell_btc_usd = sell_usd * (btc_value / bucket_value)
-                sell_eth_usd = sell_usd * (eth_value / bucket_value)
-
-                sell_btc_amt = sell_btc_usd / btc_price
-                sell_eth_amt = sell_eth_usd / eth_price
-
-                sell_btc_amt = min(sell_btc_amt, bucket_btc, btc)
-                sell_eth_amt = min(sell_eth_amt, bucket_eth, eth)
-
-                btc -= sell_btc_amt
-                eth -= sell_eth_amt
-                bucket["btc_amount"] -= sell_btc_amt
-                bucket["eth_amount"] -= sell_eth_amt
-                bucket["invested_usd"] -= sell_usd
-                cash += sell_usd
-
-                total_sell_btc += sell_btc_amt
-                total_sell_eth += sell_eth_amt
-                total_sell_usd_btc += sell_btc_usd
-                total_sell_usd_eth += sell_eth_usd
-
-            if total_sell_btc > 0 or total_sell_eth > 0:
-                sell_used[lvl_str] = True
-                total_sell_usd = total_sell_usd_btc + total_sell_usd_eth
-                pct_initial = total_sell_usd / base * 100 if base > 0 else 0.0
-
-                actions_text_parts.append(
-                    "📈 <b>Сигнал: ПРОДАЖА BTC и ETH</b>\n"
-                    "\n"
-                    f"Уровень жадности: <b>{lvl}</b>\n"
-                    f"Текущий F&amp;G: <b>{fng}</b>\n"
-                    "\n"
-                    f"Общий объём продажи: <b>{fmt_usd(total_sell_usd)} $</b> "
-                    f"(≈ {pct_initial:.2f}% от базового портфеля 10 000 $)\n"
-                    f"• BTC: продано на ~<b>{fmt_usd(total_sell_usd_btc)} $</b>\n"
-                    f"• ETH: продано на ~<b>{fmt_usd(total_sell_usd_eth)} $</b>"
-                )
-
-                if total_sell_btc > 0:
-                    log_trade(
-                        asset="BTC",
-                        action="SELL",
-                        fng=fng,
-                        price=btc_price,
-                        usd_amount=total_sell_usd_btc,
-                        asset_delta=-total_sell_btc,
-                        cash_after=cash,
-                        asset_after=btc,
-                        avg_entry_price=avg_btc,
-                    )
-                if total_sell_eth > 0:
-                    log_trade(
-                        asset="ETH",
-                        action="SELL",
-                        fng=fng,
-                        price=eth_price,
-                        usd_amount=total_sell_usd_eth,
-                        asset_delta=-total_sell_eth,
-                        cash_after=cash,
-                        asset_after=eth,
-                        avg_entry_price=avg_eth,
-                    )
-
-    total_invested = sum(bucket["invested_usd"] for bucket in buckets.values())
-    if total_invested <= 0 and btc <= 0 and eth <= 0:
-        cash = base
-        reset_cycle(state)
-        buckets = state["buckets"]
-        sell_used = state["sell_used"]
-        btc = 0.0
-        eth = 0.0
-        avg_btc = None
-        avg_eth = None
-
-    # ---------- ПОКУПКИ ----------
-
-    for lvl in BUY_LEVELS:
-        if fng <= lvl:
-            lvl_str = str(lvl)
-            bucket = buckets[lvl_str]
-            target = BUY_TARGETS[lvl]
-            invested = float(bucket["invested_usd"])
-            need_usd = target - invested
-            if need_usd <= 0:
-                continue
+    return (
+        "📉 <b>Сигнал: ПОКУПКА BTC и ETH</b>\n"
+        "\n"
+        f"Уровень индекса: <b>{level}</b>\n"
+        f"Текущий F&amp;G: <b>{fng}</b>\n"
+        "\n"
+        f"Общий объём покупки: <b>{fmt_usd(total_usd)} $</b> "
+        f"(≈ {pct_initial:.2f}% от базового портфеля {fmt_usd(base)} $)\n"
+        f"• BTC: покупка на ~<b>{fmt_usd(usd_btc)} $</b>\n"
+        f"• ETH: покупка на ~<b>{fmt_usd(usd_eth)} $</b>"
+    )
+
+
+def load_portfolio_state(portfolio):
+    return load_state(
+        portfolio.state_file,
+        portfolio.trades_file,
+        portfolio.base_capital,
+        portfolio.ladder,
+    )
+
+
+def run_portfolio(portfolio, snapshot: MarketSnapshot, show_name: bool = False):
+    """
+    Тик одного портфеля на общем снимке рынка.
+    Возвращает текст для Telegram или None, если сигналов нет.
+    """
+    state = load_portfolio_state(portfolio)
+    return process_portfolio(portfolio, state, snapshot, show_name)
+
+
+def record_equity(portfolio, ts: datetime, snapshot: MarketSnapshot, state):
+    with metrics.stage("equity_append"):
+        equity.append_sample(
+            equity.equity_path(portfolio.state_file),
+            ts,
+            snapshot.fng,
+            snapshot.btc_price,
+            snapshot.eth_price,
+            state["cash_usd"],
+            state["btc_amount"],
+            state["eth_amount"],
+        )
 
-            need_usd = min(need_usd, cash)
-            buy_usd = round_down_50(need_usd)
-            if buy_usd <= 0:
-                continue
 
-            usd_btc = buy_usd / 2.0
-            usd_eth = buy_usd / 2.0
-            buy_btc_amount = usd_btc / btc_price
-            buy_eth_amount = usd_eth / eth_price
-
-            if buy_btc_amount > 0:
-                if btc <= 0:
-                    avg_btc = btc_price
-                else:
-                    total_cost_btc = avg_btc * btc + usd_btc
-                    btc_new = btc + buy_btc_amount
-                    avg_btc = total_cost_btc / btc_new
-
-            if buy_eth_amount > 0:
-                if eth <= 0:
-                    avg_eth = eth_price
-                else:
-                    total_cost_eth = avg_eth * eth + usd_eth
-                    eth_new = eth + buy_eth_amount
-                    avg_eth = total_cost_eth / eth_new
-
-            btc += buy_btc_amount
-            eth += buy_eth_amount
-            bucket["btc_amount"] += buy_btc_amount
-            bucket["eth_amount"] += buy_eth_amount
-            bucket["invested_usd"] += buy_usd
-            cash -= buy_usd
-
-            pct_initial = buy_usd / base * 100 if base > 0 else 0.0
-
-            actions_text_parts.append(
-                "📉 <b>Сигнал: ПОКУПКА BTC и ETH</b>\n"
-                "\n"
-                f"Уровень индекса: <b>{lvl}</b>\n"
-                f"Текущий F&amp;G: <b>{fng}</b>\n"
-                "\n"
-                f"Общий объём покупки: <b>{fmt_usd(buy_usd)} $</b> "
-                f"(≈ {pct_initial:.2f}% от базового портфеля 10 000 $)\n"
-                f"• BTC: покупка на ~<b>{fmt_usd(usd_btc)} $</b>\n"
-                f"• ETH: покупка на ~<b>{fmt_usd(usd_eth)} $</b>"
-            )
-
-            if buy_btc_amount > 0:
-                log_trade(
-                    asset="BTC",
-                    action="BUY",
-                    fng=fng,
-                    price=btc_price,
-                    usd_amount=usd_btc,
-                    asset_delta=buy_btc_amount,
-                    cash_after=cash,
-                    asset_after=btc,
-                    avg_entry_price=avg_btc,
-                )
-            if buy_eth_amount > 0:
-                log_trade(
-                    asset="ETH",
-                    action="BUY",
-                    fng=fng,
-                    price=eth_price,
-                    usd_amount=usd_eth,
-                    asset_delta=buy_eth_amount,
-                    cash_after=cash,
-                    asset_after=eth,
-                    avg_entry_price=avg_eth,
-                )
+def process_portfolio(
+    portfolio,
+    state,
+    snapshot: MarketSnapshot,
+    show_name: bool = False,
+    now: datetime | None = None,
+):
+    """
+    То же, что run_portfolio, но над уже загруженным state (dict меняется на месте).
+    Состояние пишем только если тик что-то изменил; точку кривой стоимости — всегда.
+    now — время тика (по умолчанию текущее; при проигрывании истории — время события).
+    """
+    base = float(state.get("base_capital", portfolio.base_capital))
+
+    fng = snapshot.fng
+    btc_price = snapshot.btc_price
+    eth_price = snapshot.eth_price
+
+    now = now or datetime.now(timezone.utc)
+    with metrics.stage("strategy"):
+        trigger = state.get("next_trigger")
+        if trigger and is_quiet(fng, trigger["buy_at"], trigger["sell_at"]):
+            # F&G между ближайшими порогами — лестницу даже не разворачиваем
+            updated = current = None
+        else:
+            current = PortfolioState.from_dict(state, portfolio.ladder)
+            updated, trades = step(current, fng, btc_price, eth_price, portfolio.ladder)
+    if updated is current:
+        # ничего не изменилось — состояние на диске уже актуально
+        record_equity(portfolio, now, snapshot, state)
+        return None
+
+    state.update(updated.to_dict(portfolio.ladder))
+    set_next_trigger(state, updated, portfolio.ladder)
+    pnl.record_trades(state, trades, now)
+    commit_tick(
+        state,
+        [trade_row(t) for t in trades],
+        portfolio.state_file,
+        portfolio.trades_file,
+        now,
+    )
+    record_equity(portfolio, now, snapshot, state)
+    signals = signals_from_trades(trades)
 
     # ---------- ИТОГ И TELEGRAM ----------
 
-    if not actions_text_parts:
-        print(f"Сигналов нет. F&G={fng}, BTC={btc_price}, ETH={eth_price}")
-        state["cash_usd"] = cash
-        state["btc_amount"] = btc
-        state["eth_amount"] = eth
-        state["avg_entry_btc"] = avg_btc
-        state["avg_entry_eth"] = avg_eth
-        state["buckets"] = buckets
-        state["sell_used"] = sell_used
-        save_state(state)
-        return
+    if not signals:
+        return None
 
-    state["cash_usd"] = cash
-    state["btc_amount"] = btc
-    state["eth_amount"] = eth
-    state["avg_entry_btc"] = avg_btc
-    state["avg_entry_eth"] = avg_eth
-    state["buckets"] = buckets
-    state["sell_used"] = sell_used
-    save_state(state)
+    cash = state["cash_usd"]
+    btc = state["btc_amount"]
+    eth = state["eth_amount"]
+    avg_btc = state["avg_entry_btc"]
+    avg_eth = state["avg_entry_eth"]
+
+    actions_text_parts = [format_signal(sig, fng, base) for sig in signals]
+    if show_name:
+        actions_text_parts.insert(0, f"🗂 Портфель: <b>{portfolio.name}</b>")
 
     total_value = cash + btc * btc_price + eth * eth_price
     port_change_pct = (total_value / base - 1.0) * 100 if base > 0 else 0.0
@@ -476,7 +293,7 @@ def main():
         f"BTC: <b>{btc:.6f}</b> (~<b>{fmt_usd(btc * btc_price)} $</b>)",
         f"ETH: <b>{eth:.6f}</b> (~<b>{fmt_usd(eth * eth_price)} $</b>)",
         f"Итого: <b>{fmt_usd(total_value)} $</b> "
-        f"({port_change_pct:+.2f}% к базовому 10 000 $)",
+        f"({port_change_pct:+.2f}% к базовому {fmt_usd(base)} $)",
     ]
 
     if avg_btc:
@@ -489,11 +306,60 @@ def main():
     else:
         summary_lines.append("Средняя цена входа ETH: —")
 
-    text = "\n\n".join(actions_text_parts) + "\n\n" + "\n".join(summary_lines)
+    return "\n\n".join(actions_text_parts) + "\n\n" + "\n".join(summary_lines)
+
+
+@metrics.run("tick")
+def main():
+    portfolios = load_portfolios()
+    if not (
+        CMC_API_KEY and TELEGRAM_BOT_TOKEN and all(p.chat_id for p in portfolios)
+    ):
+        print(
+            "Не заданы переменные окружения: CMC_API_KEY / TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID"
+        )
+        metrics.note(skipped="env")
+        return
+
+    # рынок запрашиваем один раз на все портфели
+    try:
+        with metrics.stage("market_snapshot"):
+            snapshot = get_market_snapshot()
+    except Exception as e:
+        print("Ошибка при запросе данных:", e)
+        metrics.note(skipped="market_data", error=repr(e))
+        return
+    metrics.note(fng=snapshot.fng, portfolios=len(portfolios))
+
+    show_names = len(portfolios) > 1
+    texts = []
+    # сделки всех портфелей фиксируются разом при выходе из блока
+    with group_commit():
+        for portfolio in portfolios:
+            try:
+                text = run_portfolio(portfolio, snapshot, show_names)
+            except Exception as e:
+                print(f"[{portfolio.name}] Ошибка обработки портфеля:", e)
+                continue
+
+            if text is None:
+                print(
+                    f"[{portfolio.name}] Сигналов нет. F&G={snapshot.fng}, "
+                    f"BTC={snapshot.btc_price}, ETH={snapshot.eth_price}"
+                )
+                continue
+            texts.append((portfolio, text))
+
+    for portfolio, text in texts:
+        telegram_queue.enqueue(text, portfolio.chat_id)
+        print(f"[{portfolio.name}] Сигнал(ы) поставлен(ы) в очередь Telegram.")
 
+    # сделки и состояние уже на диске — теперь можно спокойно отправлять
     try:
-        send_telegram(text)
-        print("Сигнал(ы) отправлен(ы) в Telegram.")
+        sent = telegram_queue.flush()
+        metrics.note(sent=sent)
+        if sent:
+            print(f"Отправлено сообщений в Telegram: {sent}")
     except Exception as e:
         print("Ошибка отправки в Telegram:", e)
 
@@ -0,0 +1,163 @@
+"""
+Персистентный кэш ответов CMC и CoinGecko, общий для бота и отчётов.
+
+Для каждого источника свой TTL и окно устаревания (STALE):
+  • возраст < TTL            — отдаём из кэша (hit);
+  • TTL ≤ возраст < TTL+STALE — отдаём старое значение и обновляем его
+    в фоновом потоке (stale-while-revalidate);
+  • иначе                     — синхронный запрос (miss).
+Если фоновое обновление упало, старое значение остаётся до конца окна.
+Торговый тик вызывает cached(..., allow_stale=False): окна устаревания для
+него нет, после TTL — только свежий запрос.
+
+Записи, вышедшие за TTL+STALE, выбрасываются; всего хранится не больше
+MAX_ENTRIES самых свежих. Счётчики hits/stale/misses/errors копятся в том же
+файле между запусками — по ним подбираем TTL под расход кредитов. Попадание
+в кэш файл не переписывает: счётчики уходят на диск вместе со следующим
+новым значением или при выходе из процесса.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+
+from persistence import atomic_write_json
+
+CACHE_FILE = os.environ.get("SECRETARY_CACHE", "market_cache.json")
+
+# секунды; F&G на CMC обновляется раз в сутки, цены — постоянно.
+# TTL F&G меньше интервала cron (4 ч): каждый тик бота получает свежее значение
+TTL = {"fng": 30 * 60, "prices": 5 * 60}
+STALE = {"fng": 6 * 60 * 60, "prices": 5 * 60}
+MAX_ENTRIES = 64
+
+_lock = threading.Lock()
+_caches = {}
+_refreshing = set()
+# файлы, где счётчики изменились после последней записи
+_dirty = set()
+
+
+def _empty():
+    return {"entries": {}, "stats": {}}
+
+
+def _load(path: str):
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _empty()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                print("Кэш повреждён, начинаем с пустого:", path)
+        _caches[path] = cache
+    return cache
+
+
+def _count(cache, path: str, source: str, key: str):
+    stats = cache["stats"].setdefault(
+        source, {"hits": 0, "stale": 0, "misses": 0, "errors": 0}
+    )
+    stats[key] += 1
+    _dirty.add(path)
+
+
+@atexit.register
+def save_stats():
+    """Дописать на диск счётчики, накопленные без записи файла."""
+    with _lock:
+        for path in list(_dirty):
+            try:
+                atomic_write_json(path, _caches[path], indent=None)
+            except OSError as e:
+                print("Кэш: не удалось сохранить счётчики:", e)
+        _dirty.clear()
+
+
+def _evict(cache, now: float):
+    entries = cache["entries"]
+    for name, entry in list(entries.items()):
+        source = entry["source"]
+        if now - entry["fetched_at"] >= TTL[source] + STALE[source]:
+            del entries[name]
+    if len(entries) > MAX_ENTRIES:
+        newest = sorted(entries, key=lambda n: entries[n]["fetched_at"], reverse=True)
+        for name in newest[MAX_ENTRIES:]:
+            del entries[name]
+
+
+def _store(cache, path: str, source: str, name: str, value):
+    now = time.time()
+    cache["entries"][name] = {"source": source, "fetched_at": now, "value": value}
+    _evict(cache, now)
+    atomic_write_json(path, cache, indent=None)
+    _dirty.discard(path)
+
+
+def _refresh(source: str, name: str, fetch, path: str):
+    try:
+        value = fetch()
+    except Exception as e:
+        print(f"Кэш: не удалось обновить {name}:", e)
+        with _lock:
+            _count(_load(path), path, source, "errors")
+            _refreshing.discard((path, name))
+        return
+    with _lock:
+        _store(_load(path), path, source, name, value)
+        _refreshing.discard((path, name))
+
+
+def cached(source: str, key: str, fetch, path: str = CACHE_FILE, allow_stale: bool = True):
+    """
+    Значение fetch() из кэша источника source ("fng" / "prices").
+    fetch должна возвращать JSON-сериализуемое значение.
+    allow_stale=False — без окна устаревания: старше TTL значит запрос сейчас.
+    """
+    name = f"{source}:{key}"
+    with _lock:
+        cache = _load(path)
+        entry = cache["entries"].get(name)
+        age = time.time() - entry["fetched_at"] if entry else None
+
+        if entry is not None and age < TTL[source]:
+            _count(cache, path, source, "hits")
+            return entry["value"]
+
+        if allow_stale and entry is not None and age < TTL[source] + STALE[source]:
+            _count(cache, path, source, "stale")
+            if (path, name) not in _refreshing:
+                _refreshing.add((path, name))
+                # не daemon: разовый запуск дождётся обновления перед выходом
+                threading.Thread(
+                    target=_refresh, args=(source, name, fetch, path)
+                ).start()
+            return entry["value"]
+
+        _count(cache, path, source, "misses")
+
+    value = fetch()
+    with _lock:
+        _store(_load(path), path, source, name, value)
+    return value
+
+
+def get_stats(path: str = CACHE_FILE) -> dict:
+    """{источник: {hits, stale, misses, errors}} с момента создания файла кэша."""
+    with _lock:
+        return {k: dict(v) for k, v in _load(path)["stats"].items()}
+
+
+if __name__ == "__main__":
+    for source, stats in sorted(get_stats().items()):
+        total = sum(stats[k] for k in ("hits", "stale", "misses")) or 1
+        served = (stats["hits"] + stats["stale"]) / total
+        print(
+            f"{source}: hits {stats['hits']}, stale {stats['stale']}, "
+            f"misses {stats['misses']}, errors {stats['errors']}, "
+            f"из кэша {served:.0%}"
+        )
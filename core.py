@@ -0,0 +1,83 @@
+"""
+Общие мелочи бота и отчётов: переменные окружения, форматирование,
+мета-данные отчётов (JSON-файлы или sqlite_store) и запросы к CMC.
+
+Модуль лёгкий: тяжёлые зависимости (requests через http_client,
+persistence) подгружаются только при первом обращении.
+"""
+
+import os
+import json
+from datetime import datetime, timezone
+
+CMC_API_KEY = os.environ.get("CMC_API_KEY")
+TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
+TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+
+# базовые адреса API; переопределяются окружением (локальные заглушки в benchmark.py)
+CMC_BASE_URL = os.environ.get("CMC_BASE_URL", "https://pro-api.coinmarketcap.com")
+COINGECKO_BASE_URL = os.environ.get("COINGECKO_BASE_URL", "https://api.coingecko.com")
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+FNG_HISTORICAL_PATH = "/v3/fear-and-greed/historical"
+
+
+def fmt_usd(x: float) -> str:
+    return f"{x:,.2f}".replace(",", " ")
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path, obj):
+    from persistence import atomic_write_json
+
+    atomic_write_json(path, obj)
+
+
+def load_meta(name, default):
+    """Мета-данные отчёта: из базы sqlite_store, если она есть, иначе из name.json."""
+    import sqlite_store
+
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_meta(name, default)
+    return load_json(name, default)
+
+
+def save_meta(name, obj):
+    import sqlite_store
+
+    if sqlite_store.is_enabled():
+        sqlite_store.save_meta(name, obj)
+    else:
+        save_json(name, obj)
+
+
+def message_link(message_id, chat_id: str | None = None) -> str:
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    return f"https://t.me/{chat_id.lstrip('@')}/{message_id}"
+
+
+def parse_cmc_timestamp(ts_raw) -> datetime:
+    """CMC отдаёт timestamp то как Unix-время, то как ISO-строку."""
+    ts_raw = str(ts_raw)
+    if ts_raw.isdigit():
+        return datetime.fromtimestamp(int(ts_raw), tz=timezone.utc)
+    return datetime.fromisoformat(ts_raw.replace("Z", "+00:00"))
+
+
+def cmc_get(path: str, params, timeout: float = 15):
+    """GET к CMC API с ключом из окружения; возвращает поле data ответа."""
+    import http_client
+
+    r = http_client.get(
+        CMC_BASE_URL + path,
+        headers={"X-CMC_PRO_API_KEY": CMC_API_KEY},
+        params=params,
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    return r.json()["data"]
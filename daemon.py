@@ -0,0 +1,157 @@
+"""
+Долгоживущий режим: один процесс вместо cron-запусков бота и отчётов.
+
+Состояние портфелей держится в памяти и пишется на диск только когда тик
+что-то изменил; пул HTTP-сессий http_client остаётся открытым между тиками.
+
+Запуск:
+    python daemon.py --tick-interval 300
+
+Расписание отчётов (UTC) совпадает с workflow-файлами и настраивается
+аргументами или переменными окружения TICK_INTERVAL, INACTIVITY_AT,
+MONTHLY_AT, YEARLY_AT.
+"""
+
+import os
+import argparse
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+
+import bot
+import metrics
+import inactivity_report
+import monthly_report
+import persistence
+import telegram_queue
+import yearly_report
+from portfolios import load_portfolios
+
+DEFAULT_TICK_INTERVAL = 4 * 60 * 60
+TELEGRAM_FLUSH_INTERVAL = 2.0
+
+
+def parse_hhmm(value: str) -> time:
+    hh, mm = value.split(":")
+    return time(int(hh), int(mm))
+
+
+class Daemon:
+    def __init__(self):
+        self.portfolios = load_portfolios()
+        # имя портфеля -> dict состояния в формате secretary_state.json
+        self.states = {}
+
+    @metrics.run("daemon_tick")
+    def tick(self):
+        try:
+            snapshot = bot.get_market_snapshot()
+        except Exception as e:
+            print("Ошибка при запросе данных:", e)
+            return
+
+        show_names = len(self.portfolios) > 1
+        texts = []
+        try:
+            # тики всех портфелей — одной групповой фиксацией
+            with persistence.group_commit():
+                for portfolio in self.portfolios:
+                    state = self.states.get(portfolio.name)
+                    if state is None:
+                        state = self.states[portfolio.name] = bot.load_portfolio_state(portfolio)
+                    try:
+                        text = bot.process_portfolio(portfolio, state, snapshot, show_names)
+                    except Exception as e:
+                        # состояние в памяти могло разойтись с диском — перечитаем
+                        self.states.pop(portfolio.name, None)
+                        print(f"[{portfolio.name}] Ошибка обработки портфеля:", e)
+                        continue
+                    if text is not None:
+                        texts.append((portfolio, text))
+        except Exception:
+            # фиксация не удалась — всё, что в памяти, перечитаем с диска
+            self.states.clear()
+            raise
+
+        for portfolio, text in texts:
+            telegram_queue.enqueue(text, portfolio.chat_id)
+            print(f"[{portfolio.name}] Сигнал(ы) поставлен(ы) в очередь Telegram.")
+
+
+async def run_job(name: str, job):
+    try:
+        await asyncio.to_thread(job)
+    except Exception as e:
+        print(f"[{name}] Ошибка:", e)
+
+
+async def run_periodic(name: str, interval: float, job):
+    while True:
+        await run_job(name, job)
+        await asyncio.sleep(interval)
+
+
+async def run_daily(name: str, at: time, job, when=None):
+    """Каждый день в at (UTC); when(date) -> bool дополнительно фильтрует дни."""
+    while True:
+        now = datetime.now(timezone.utc)
+        nxt = datetime.combine(now.date(), at, tzinfo=timezone.utc)
+        if nxt <= now:
+            nxt += timedelta(days=1)
+        await asyncio.sleep((nxt - now).total_seconds())
+        if when is None or when(nxt.date()):
+            await run_job(name, job)
+
+
+async def serve(tick_interval: float, inactivity_at: time, monthly_at: time, yearly_at: time):
+    daemon = Daemon()
+    print(
+        f"Демон запущен: портфелей {len(daemon.portfolios)}, "
+        f"тик каждые {tick_interval:g} с"
+    )
+    await asyncio.gather(
+        run_periodic("tick", tick_interval, daemon.tick),
+        run_periodic(
+            "telegram",
+            TELEGRAM_FLUSH_INTERVAL,
+            lambda: telegram_queue.flush(wait=False),
+        ),
+        run_daily("inactivity", inactivity_at, inactivity_report.main),
+        run_daily("monthly", monthly_at, monthly_report.main, lambda d: d.day == 1),
+        run_daily(
+            "yearly", yearly_at, yearly_report.main, lambda d: d.month == 1 and d.day == 1
+        ),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FNG Secretary: режим демона")
+    parser.add_argument(
+        "--tick-interval",
+        type=float,
+        default=float(os.environ.get("TICK_INTERVAL", DEFAULT_TICK_INTERVAL)),
+        help="интервал тика в секундах",
+    )
+    parser.add_argument("--inactivity-at", default=os.environ.get("INACTIVITY_AT", "09:05"))
+    parser.add_argument("--monthly-at", default=os.environ.get("MONTHLY_AT", "07:00"))
+    parser.add_argument("--yearly-at", default=os.environ.get("YEARLY_AT", "09:00"))
+    args = parser.parse_args(argv)
+
+    if not (bot.CMC_API_KEY and bot.TELEGRAM_BOT_TOKEN):
+        print("Не заданы переменные окружения: CMC_API_KEY / TELEGRAM_BOT_TOKEN")
+        return
+
+    try:
+        asyncio.run(
+            serve(
+                args.tick_interval,
+                parse_hhmm(args.inactivity_at),
+                parse_hhmm(args.monthly_at),
+                parse_hhmm(args.yearly_at),
+            )
+        )
+    except KeyboardInterrupt:
+        print("Демон остановлен.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Кривая стоимости портфеля: одна запись на каждый тик, включая тихие.
+
+Файл <state>.equity.bin (secretary_state.json -> secretary_state.equity.bin)
+лежит рядом с файлом состояния портфеля, у каждого портфеля свой, и только
+дописывается. Запись — FIELDS подряд как little-endian double
+(RECORD_SIZE = 64 байта), поэтому файл целиком читается в array("d")
+и режется по колонкам срезами с шагом len(FIELDS).
+
+Поверх ряда — просадка, волатильность и Sharpe для отчётов.
+"""
+
+import os
+import math
+import struct
+import bisect
+from array import array
+from datetime import datetime
+
+EQUITY_SUFFIX = ".equity.bin"
+FIELDS = ("ts", "fng", "btc_price", "eth_price", "cash", "btc", "eth", "total")
+RECORD = struct.Struct("<" + "d" * len(FIELDS))
+RECORD_SIZE = RECORD.size
+
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+
+def equity_path(state_path: str) -> str:
+    root, _ = os.path.splitext(state_path)
+    return root + EQUITY_SUFFIX
+
+
+def append_sample(path: str, ts: datetime, fng: int, btc_price: float, eth_price: float,
+                  cash: float, btc: float, eth: float):
+    total = cash + btc * btc_price + eth * eth_price
+    record = RECORD.pack(ts.timestamp(), fng, btc_price, eth_price, cash, btc, eth, total)
+    with open(path, "ab") as f:
+        # хвост от оборванной записи отрезаем, чтобы не сбить выравнивание
+        tail = f.tell() % RECORD_SIZE
+        if tail:
+            f.truncate(f.tell() - tail)
+        f.write(record)
+
+
+def load(path: str, start: datetime | None = None, end: datetime | None = None):
+    """
+    Колонки ряда {поле: array("d")} за [start, end] (по умолчанию — весь файл).
+    """
+    values = array("d")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+        values.frombytes(data[: len(data) - len(data) % RECORD_SIZE])
+        if struct.pack("=d", 1.0) != struct.pack("<d", 1.0):
+            values.byteswap()
+
+    width = len(FIELDS)
+    ts = values[0::width]
+    lo = bisect.bisect_left(ts, start.timestamp()) if start else 0
+    hi = bisect.bisect_right(ts, end.timestamp()) if end else len(ts)
+    return {
+        name: values[lo * width + i : hi * width : width] for i, name in enumerate(FIELDS)
+    }
+
+
+def max_drawdown(total) -> float:
+    """Максимальная просадка в долях (0.25 = -25%)."""
+    peak = 0.0
+    worst = 0.0
+    for v in total:
+        if v > peak:
+            peak = v
+        elif peak > 0:
+            dd = 1.0 - v / peak
+            if dd > worst:
+                worst = dd
+    return worst
+
+
+def returns(total):
+    return array("d", (b / a - 1.0 for a, b in zip(total, total[1:]) if a > 0))
+
+
+def volatility(total, periods_per_year: float) -> float:
+    """Годовая волатильность доходностей между тиками, в долях."""
+    r = returns(total)
+    if len(r) < 2:
+        return 0.0
+    mean = sum(r) / len(r)
+    var = sum((x - mean) ** 2 for x in r) / (len(r) - 1)
+    return math.sqrt(var * periods_per_year)
+
+
+def sharpe(total, periods_per_year: float, risk_free: float = 0.0) -> float:
+    """Годовой Sharpe; risk_free — годовая безрисковая ставка в долях."""
+    r = returns(total)
+    if len(r) < 2:
+        return 0.0
+    rf = risk_free / periods_per_year
+    excess = [x - rf for x in r]
+    mean = sum(excess) / len(excess)
+    var = sum((x - mean) ** 2 for x in excess) / (len(excess) - 1)
+    if var <= 0:
+        return 0.0
+    return mean / math.sqrt(var) * math.sqrt(periods_per_year)
+
+
+def periods_per_year(ts) -> float:
+    """Сколько тиков в году при медианном шаге ряда."""
+    if len(ts) < 2:
+        return 0.0
+    steps = sorted(b - a for a, b in zip(ts, ts[1:]))
+    step = steps[len(steps) // 2]
+    return SECONDS_PER_YEAR / step if step > 0 else 0.0
+
+
+def stats(path: str, start: datetime | None = None, end: datetime | None = None):
+    """Сводка за период или None, если точек меньше двух."""
+    series = load(path, start, end)
+    total = series["total"]
+    if len(total) < 2:
+        return None
+    ppy = periods_per_year(series["ts"])
+    return {
+        "samples": len(total),
+        "first": total[0],
+        "last": total[-1],
+        "return_pct": (total[-1] / total[0] - 1.0) * 100 if total[0] > 0 else 0.0,
+        "max_drawdown_pct": max_drawdown(total) * 100,
+        "volatility_pct": volatility(total, ppy) * 100,
+        "sharpe": sharpe(total, ppy),
+    }
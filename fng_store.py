@@ -0,0 +1,105 @@
+import os
+import csv
+from datetime import datetime, date, timedelta, timezone
+
+import metrics
+from core import CMC_API_KEY, FNG_HISTORICAL_PATH, cmc_get, parse_cmc_timestamp
+
+# Локальная история индекса: одна строка на день, файл только дописывается
+FNG_HISTORY_FILE = "fng_history.csv"
+
+
+def load_fng_history(path: str = FNG_HISTORY_FILE):
+    """Вся сохранённая история: список (date, value), по возрастанию даты."""
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader, None)  # заголовок
+        for row in reader:
+            if row:
+                rows.append((date.fromisoformat(row[0]), int(row[1])))
+    return rows
+
+
+def last_stored_date(path: str = FNG_HISTORY_FILE):
+    """Дата последней записи — читаем только хвост файла."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 256))
+        lines = f.read().decode("utf-8").strip().splitlines()
+    if not lines or lines[-1].startswith("date"):
+        return None
+    return date.fromisoformat(lines[-1].split(";")[0])
+
+
+def fetch_fng_daily(start: date, end: date):
+    """Дневные значения F&G из CMC за [start, end]: список (date, value)."""
+    params = {
+        "start": start.isoformat(),
+        "end": (end + timedelta(days=1)).isoformat(),
+        "interval": "daily",
+    }
+    data = cmc_get(FNG_HISTORICAL_PATH, params, timeout=20) or []
+
+    by_day = {}
+    for item in data:
+        d = parse_cmc_timestamp(item["timestamp"]).date()
+        if start <= d <= end:
+            by_day[d] = int(item["value"])
+    return sorted(by_day.items())
+
+
+def sync_fng_history(path: str = FNG_HISTORY_FILE) -> int:
+    """
+    Докачиваем только дни после последней сохранённой записи.
+    При пустом хранилище берём историю с начала прошлого года —
+    этого хватает и месячному, и годовому отчёту.
+    Сегодняшний день не сохраняем: значение за него ещё меняется, а файл
+    только дописывается — берём дни по вчерашний (UTC) включительно.
+    Возвращает количество добавленных дней.
+    """
+    if not CMC_API_KEY:
+        return 0
+
+    today = datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=1)
+    last = last_stored_date(path)
+    start = last + timedelta(days=1) if last else date(today.year - 1, 1, 1)
+    if start > yesterday:
+        return 0
+
+    new_rows = [
+        (d, v) for d, v in fetch_fng_daily(start, yesterday) if last is None or d > last
+    ]
+    if not new_rows:
+        return 0
+
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        if is_new:
+            writer.writerow(["date", "value"])
+        for d, v in new_rows:
+            writer.writerow([d.isoformat(), v])
+    return len(new_rows)
+
+
+def get_fng_range(start: date, end: date, path: str = FNG_HISTORY_FILE):
+    """Значения из локального хранилища за [start, end] включительно."""
+    return [(d, v) for d, v in load_fng_history(path) if start <= d <= end]
+
+
+def sync_quietly(path: str = FNG_HISTORY_FILE):
+    """Синхронизация для отчётов: сеть недоступна — работаем с тем, что есть."""
+    try:
+        with metrics.stage("fng_sync"):
+            added = sync_fng_history(path)
+        if added:
+            print(f"История F&G: добавлено дней: {added}")
+    except Exception as e:
+        print("Ошибка синхронизации истории F&G:", e)
@@ -0,0 +1,207 @@
+"""
+Общий HTTP-клиент для CMC, CoinGecko и Telegram.
+
+  • одна пул-сессия requests на хост (keep-alive между запросами и потоками);
+  • повторы на сетевых ошибках и кодах RETRY_STATUSES с экспоненциальной
+    паузой и случайным разбросом, Retry-After уважается; POST после
+    таймаута чтения не повторяется — сервер мог его уже выполнить
+    (второе сообщение в Telegram), только если соединение не установилось;
+  • бюджет запросов в минуту на провайдера (token bucket), чтобы не
+    выжигать кредиты CMC и лимиты CoinGecko;
+  • счётчики запросов, ошибок, повторов, задержек и байт — get_stats().
+
+requests импортируется при первом запросе: отчётам и бэктесту, которые
+обходятся кэшем и локальными файлами, он не нужен вовсе.
+"""
+
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# методы, которые безопасно повторить после таймаута или обрыва соединения
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+POOL_SIZE = 10
+
+# провайдер -> хост и бюджет запросов в минуту (None — без ограничения)
+PROVIDERS = {
+    "cmc": {"host": "pro-api.coinmarketcap.com", "per_minute": 30},
+    "coingecko": {"host": "api.coingecko.com", "per_minute": 30},
+    "telegram": {"host": "api.telegram.org", "per_minute": None},
+}
+
+_lock = threading.Lock()
+_sessions = {}
+_buckets = {}
+_stats = {}
+
+
+def __getattr__(name):
+    # http_client.RequestException — без импорта requests при загрузке модуля
+    if name == "RequestException":
+        import requests
+
+        return requests.RequestException
+    raise AttributeError(name)
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+def provider_for(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    for name, cfg in PROVIDERS.items():
+        if cfg["host"] == host:
+            return name
+    return host
+
+
+def get_session(url: str):
+    """Пул-сессия для хоста из url (создаётся один раз на процесс)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    host = urlsplit(url).netloc
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def _bucket(provider: str):
+    cfg = PROVIDERS.get(provider)
+    if not cfg or not cfg.get("per_minute"):
+        return None
+    with _lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = _buckets[provider] = _TokenBucket(cfg["per_minute"])
+        return bucket
+
+
+def _record(provider: str, **delta):
+    with _lock:
+        stats = _stats.setdefault(
+            provider,
+            {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "latency_ms_total": 0.0,
+                "latency_ms_max": 0.0,
+                "bytes": 0,
+            },
+        )
+        for key, value in delta.items():
+            if key == "latency_ms_max":
+                stats[key] = max(stats[key], value)
+            else:
+                stats[key] += value
+
+
+def get_stats() -> dict:
+    """Копия счётчиков: {провайдер: {requests, errors, retries, latency_ms_*, bytes}}."""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def _backoff(attempt: int, retry_after=None) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def _not_sent(exc) -> bool:
+    """Соединение не установилось — сервер запрос точно не получил."""
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    # ConnectionError(MaxRetryError(reason=NewConnectionError)) — отказ, DNS
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def request(method: str, url: str, retries: int = MAX_RETRIES,
+            retry_statuses=RETRY_STATUSES, **kwargs):
+    """
+    HTTP-запрос через общий пул с бюджетом и повторами.
+    Возвращает последний ответ; raise_for_status остаётся за вызывающим.
+    """
+    import requests
+
+    provider = provider_for(url)
+    session = get_session(url)
+    bucket = _bucket(provider)
+
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+
+        t0 = time.perf_counter()
+        try:
+            r = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            elapsed = (time.perf_counter() - t0) * 1000
+            _record(provider, requests=1, errors=1, latency_ms_total=elapsed,
+                    latency_ms_max=elapsed)
+            if attempt == retries:
+                raise
+            if method.upper() not in IDEMPOTENT_METHODS and not _not_sent(e):
+                raise
+            _record(provider, retries=1)
+            time.sleep(_backoff(attempt))
+            continue
+
+        elapsed = (time.perf_counter() - t0) * 1000
+        failed = r.status_code >= 400
+        _record(provider, requests=1, errors=int(failed), latency_ms_total=elapsed,
+                latency_ms_max=elapsed, bytes=len(r.content))
+
+        if r.status_code in retry_statuses and attempt < retries:
+            _record(provider, retries=1)
+            time.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+            continue
+        return r
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
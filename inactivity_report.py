@@ -1,86 +1,57 @@
-import os
-import csv
-import json
 from datetime import datetime, date, timedelta, timezone
 
-import requests
+import metrics
+import sqlite_store
+from core import CMC_API_KEY, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, load_meta, save_meta
+from fng_store import fetch_fng_daily, get_fng_range, sync_quietly
+from ledger import TRADES_FILE, tail_trades
+from persistence import STATE_FILE
+from telegram_queue import enqueue, flush
 
-CMC_API_KEY = os.environ.get("CMC_API_KEY")
-TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-
-TRADES_FILE = "trades.csv"
 INACTIVITY_META_FILE = "inactivity_meta.json"
 
 
-def send_telegram(text: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-
-def load_json(path, default):
-    if not os.path.exists(path):
-        return default
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_json(path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-
-
 def get_last_trade_date():
-    if not os.path.exists(TRADES_FILE):
+    if sqlite_store.is_enabled():
+        ts = sqlite_store.last_trade_ts(STATE_FILE)
+        return ts.date() if ts else None
+    rows = tail_trades(1, TRADES_FILE)
+    if not rows:
         return None
-    last_ts = None
-    with open(TRADES_FILE, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter=";")
-        for row in reader:
-            ts = datetime.fromisoformat(row["timestamp_utc"])
-            last_ts = ts
-    return last_ts.date() if last_ts else None
+    return datetime.fromisoformat(rows[-1]["timestamp_utc"]).date()
 
 
 def get_fng_range_last_days(days=7):
-    if not CMC_API_KEY:
-        return None
-
     today = datetime.now(timezone.utc).date()
-    start = today - timedelta(days=days)
-    url = "https://pro-api.coinmarketcap.com/v3/fear-and-greed/historical"
-    headers = {"X-CMC_PRO_API_KEY": CMC_API_KEY}
-    params = {
-        "start": start.isoformat(),
-        "end": (today + timedelta(days=1)).isoformat(),
-        "interval": "daily",
-    }
-    r = requests.get(url, headers=headers, params=params, timeout=20)
-    r.raise_for_status()
-    data = r.json()["data"]
-    if not data:
+    rows = get_fng_range(today - timedelta(days=days), today)
+    # в хранилище дни по вчерашний; сегодняшнее значение берём из CMC
+    try:
+        rows += fetch_fng_daily(today, today)
+    except Exception as e:
+        print("Не удалось получить сегодняшний F&G:", e)
+    if not rows:
         return None
 
-    values = [int(item["value"]) for item in data]
+    values = [v for _, v in rows]
     return min(values), max(values)
 
 
+@metrics.run("inactivity")
 def main():
     if not (CMC_API_KEY and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         print("Не заданы переменные окружения для inactivity-отчёта")
+        metrics.note(skipped="env")
         return
 
-    inactivity_meta = load_json(INACTIVITY_META_FILE, {})
+    inactivity_meta = load_meta(INACTIVITY_META_FILE, {})
     last_inact_ts = inactivity_meta.get("last_inactivity_report_ts")
     last_inact_date = (
         datetime.fromisoformat(last_inact_ts).date() if last_inact_ts else None
     )
 
     today = datetime.now(timezone.utc).date()
-    last_trade = get_last_trade_date()
+    with metrics.stage("last_trade"):
+        last_trade = get_last_trade_date()
 
     if last_trade is None:
         print("Нет сделок, отчёт о тишине не нужен.")
@@ -94,6 +65,7 @@ def main():
         print("Уже был отчёт о тишине менее 7 дней назад.")
         return
 
+    sync_quietly()
     fng_range = get_fng_range_last_days(7)
     if fng_range:
         f_min, f_max = fng_range
@@ -118,11 +90,12 @@ def main():
         "Если появятся сигналы — они сразу появятся в канале. Пока рынок думает — мы не торопим события."
     )
 
-    send_telegram(text)
+    enqueue(text)
     inactivity_meta["last_inactivity_report_ts"] = datetime.now(
         timezone.utc
     ).isoformat()
-    save_json(INACTIVITY_META_FILE, inactivity_meta)
+    save_meta(INACTIVITY_META_FILE, inactivity_meta)
+    flush()
     print("Отчёт о тишине отправлен.")
 
 
@@ -0,0 +1,319 @@
+"""
+Журнал сделок trades.csv и его индекс.
+
+Рядом с CSV лежит trades.idx.json: смещения в байтах начала и конца строк
+каждого месяца и позиция последней строки. LedgerWriter обновляет индекс
+при каждой дозаписи, поэтому выборка за месяц читает только свой кусок файла,
+а последняя сделка берётся одним seek. Чтение файлов не создаёт и не
+меняет: если индекса нет или он устарел, он строится в памяти. Индекс —
+производный файл, в репозиторий не коммитится. tail_trades читает хвост файла
+блоками с конца и работает даже без индекса.
+"""
+
+import os
+import io
+import csv
+import json
+from datetime import datetime, timezone
+
+import trades_columnar
+
+TRADES_FILE = "trades.csv"
+
+# Размер блока для чтения журнала с конца (tail_trades)
+TAIL_BLOCK_SIZE = 4096
+
+TRADE_FIELDS = [
+    "timestamp_utc",
+    "asset",
+    "action",
+    "fng",
+    "price",
+    "usd_amount",
+    "asset_delta",
+    "cash_after",
+    "asset_after",
+    "avg_entry_price",
+]
+
+
+def index_path(path: str = TRADES_FILE) -> str:
+    root, _ = os.path.splitext(path)
+    return root + ".idx.json"
+
+
+def columns_path(path: str = TRADES_FILE) -> str:
+    """Каталог колоночной копии журнала: trades.csv -> trades_cols."""
+    root, _ = os.path.splitext(path)
+    return root + "_cols"
+
+
+def _csv_line(values) -> bytes:
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=";").writerow(values)
+    return buf.getvalue().encode("utf-8")
+
+
+def _empty_index():
+    return {"size": 0, "header_end": 0, "last_row": None, "months": {}}
+
+
+def _index_row(index, month: str, start: int, end: int):
+    span = index["months"].get(month)
+    if span is None:
+        index["months"][month] = [start, end]
+    else:
+        span[1] = end
+    index["last_row"] = start
+    index["size"] = end
+
+
+def build_index(path: str = TRADES_FILE):
+    """Полный проход по CSV — только если индекса нет или он устарел."""
+    index = _empty_index()
+    if not os.path.exists(path):
+        return index
+    with open(path, "rb") as f:
+        header = f.readline()
+        pos = len(header)
+        index["header_end"] = index["size"] = pos
+        for line in f:
+            end = pos + len(line)
+            if line.strip():
+                _index_row(index, line[:7].decode("ascii"), pos, end)
+            pos = end
+    index["size"] = pos
+    return index
+
+
+def save_index(index, path: str = TRADES_FILE):
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp, index_path(path))
+
+
+def load_index(path: str = TRADES_FILE):
+    """
+    Индекс, согласованный с текущим размером CSV. При расхождении строим его
+    в памяти; на диск индекс пишет только LedgerWriter.write.
+    """
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    try:
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("size") == size:
+            return index
+    except (OSError, ValueError):
+        pass
+    return build_index(path)
+
+
+class LedgerWriter:
+    """
+    Буфер сделок одного журнала на тик: add() только копит строки, flush()
+    дописывает их в CSV одной записью и одним fsync, а индекс и колонки
+    обновляет один раз на весь пакет, а не на каждую сделку.
+    """
+
+    def __init__(self, path: str = TRADES_FILE):
+        self.path = path
+        self.rows = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(
+        self,
+        asset: str,
+        action: str,
+        fng: int,
+        price: float,
+        usd_amount: float,
+        asset_delta: float,
+        cash_after: float,
+        asset_after: float,
+        avg_entry_price: float | None,
+        ts: datetime | None = None,
+    ):
+        self.rows.append(
+            (
+                ts or datetime.now(timezone.utc),
+                (asset, action, fng, price, usd_amount, asset_delta,
+                 cash_after, asset_after, avg_entry_price),
+            )
+        )
+
+    def write(self) -> int:
+        """Дописать буфер без fsync (см. flush_all). Возвращает число сделок."""
+        if not self.rows:
+            return 0
+        index = load_index(self.path)
+        lines = []
+        for now, values in self.rows:
+            ts = now.isoformat()
+            avg_entry_price = values[-1]
+            row = [ts, *values[:-1], avg_entry_price if avg_entry_price is not None else ""]
+            lines.append((ts[:7], _csv_line(row)))
+
+        with open(self.path, "ab") as f:
+            pos = f.tell()
+            header = b""
+            if pos == 0:
+                header = _csv_line(TRADE_FIELDS)
+                pos = index["header_end"] = len(header)
+            f.write(header + b"".join(line for _, line in lines))
+
+        for month, line in lines:
+            _index_row(index, month, pos, pos + len(line))
+            pos += len(line)
+        save_index(index, self.path)
+
+        cols = columns_path(self.path)
+        if trades_columnar.is_enabled(cols):
+            trades_columnar.append_trades(self.rows, cols)
+
+        n = len(self.rows)
+        self.rows = []
+        return n
+
+    def flush(self, sync: bool = True) -> int:
+        return flush_all([self], sync)
+
+
+def _fsync_file(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def flush_all(writers, sync: bool = True) -> int:
+    """
+    Групповая фиксация: сначала дописываем все журналы, потом fsync каждого
+    изменённого файла — диск ждём один раз на пакет, а не на сделку.
+    """
+    counts = [(w.path, w.write()) for w in writers]
+    if sync:
+        for path in dict.fromkeys(path for path, n in counts if n):
+            _fsync_file(path)
+    return sum(n for _, n in counts)
+
+
+def log_trade(
+    asset: str,
+    action: str,
+    fng: int,
+    price: float,
+    usd_amount: float,
+    asset_delta: float,
+    cash_after: float,
+    asset_after: float,
+    avg_entry_price: float | None,
+    path: str = TRADES_FILE,
+    ts: datetime | None = None,
+):
+    """Одна сделка сразу в журнал (без fsync); для пакетов — LedgerWriter."""
+    writer = LedgerWriter(path)
+    writer.add(asset, action, fng, price, usd_amount, asset_delta,
+               cash_after, asset_after, avg_entry_price, ts)
+    writer.write()
+
+
+def ledger_position(path: str = TRADES_FILE):
+    """Текущий конец журнала (CSV и колонок) — точка отката для persistence."""
+    cols = columns_path(path)
+    return {
+        "csv_size": os.path.getsize(path) if os.path.exists(path) else 0,
+        "columns": trades_columnar.row_count(cols)
+        if trades_columnar.is_enabled(cols)
+        else None,
+    }
+
+
+def truncate_ledger(position, path: str = TRADES_FILE):
+    """Откатить журнал к позиции из ledger_position; индекс перестроится сам."""
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(position["csv_size"])
+    cols = columns_path(path)
+    if position.get("columns") is not None and trades_columnar.is_enabled(cols):
+        trades_columnar.truncate(position["columns"], cols)
+
+
+def _parse_rows(data: bytes):
+    reader = csv.reader(io.StringIO(data.decode("utf-8")), delimiter=";")
+    for values in reader:
+        if values:
+            yield dict(zip(TRADE_FIELDS, values))
+
+
+def read_trades(start, end, path: str = TRADES_FILE):
+    """
+    Строки журнала (dict как у csv.DictReader) с датой в [start, end].
+    Читается только диапазон байт, покрывающий нужные месяцы.
+    """
+    if not os.path.exists(path):
+        return []
+    index = load_index(path)
+
+    spans = [
+        span
+        for month, span in index["months"].items()
+        if start.strftime("%Y-%m") <= month <= end.strftime("%Y-%m")
+    ]
+    if not spans:
+        return []
+    lo = min(s[0] for s in spans)
+    hi = max(s[1] for s in spans)
+
+    with open(path, "rb") as f:
+        f.seek(lo)
+        data = f.read(hi - lo)
+
+    rows = []
+    for row in _parse_rows(data):
+        d = datetime.fromisoformat(row["timestamp_utc"]).date()
+        if start <= d <= end:
+            rows.append(row)
+    return rows
+
+
+def last_trade(path: str = TRADES_FILE):
+    """Последняя строка журнала через индекс, без чтения всего файла."""
+    if not os.path.exists(path):
+        return None
+    index = load_index(path)
+    if index["last_row"] is None:
+        return None
+    with open(path, "rb") as f:
+        f.seek(index["last_row"])
+        line = f.readline()
+    return next(_parse_rows(line), None)
+
+
+def tail_trades(n: int = 1, path: str = TRADES_FILE):
+    """
+    Последние n сделок: читаем файл с конца блоками по TAIL_BLOCK_SIZE байт,
+    пока не наберётся n полных строк. Индекс не нужен, время не зависит от
+    размера журнала.
+    """
+    if n <= 0 or not os.path.exists(path):
+        return []
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        # первая строка блока может быть обрезана — нужна ещё одна сверх n
+        while pos > 0 and data.count(b"\n") <= n:
+            size = min(TAIL_BLOCK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + data
+
+    lines = data.splitlines()
+    if pos > 0:
+        lines = lines[1:]
+    lines = [
+        line for line in lines if line.strip() and not line.startswith(b"timestamp_utc")
+    ]
+    return list(_parse_rows(b"\n".join(lines[-n:])))
@@ -0,0 +1,180 @@
+"""
+Метрики запусков: сколько времени ушло на каждый этап, HTTP-повторы и байты.
+
+    @metrics.run("tick")
+    def main(): ...
+        with metrics.stage("fetch_fng"):
+            ...
+        metrics.note(signals=3)
+
+По завершении запуска в metrics.jsonl (SECRETARY_METRICS, пустое значение —
+выключить) дописывается одна строка JSON:
+    {"run": "tick", "started_at": ..., "duration_ms": ..., "status": "ok",
+     "stages": {"fetch_fng": 120.5, ...}, "notes": {...},
+     "http": {"cmc": {"requests": 1, "retries": 0, "bytes": 312, ...}}}
+Время этапа, вызванного несколько раз за запуск, суммируется.
+
+Если задан SECRETARY_PROMETHEUS, туда же после каждого запуска
+перезаписывается текстовый дамп в формате Prometheus (для textfile collector).
+
+Текущий запуск хранится в contextvar: потоки из asyncio.to_thread видят его
+сами, в пул задач контекст передаётся явно (contextvars.copy_context).
+HTTP-счётчики общие на процесс, поэтому при параллельных запусках в демоне
+они делятся между запусками приблизительно.
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import http_client
+
+METRICS_FILE = os.environ.get("SECRETARY_METRICS", "metrics.jsonl")
+PROMETHEUS_FILE = os.environ.get("SECRETARY_PROMETHEUS")
+
+_current = contextvars.ContextVar("metrics_run", default=None)
+_lock = threading.Lock()
+# последние значения по каждому виду запуска — для дампа Prometheus
+_last_runs = {}
+
+
+@contextmanager
+def stage(name: str):
+    record = _current.get()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            ms = (time.perf_counter() - t0) * 1000
+            with _lock:
+                record["stages"][name] = record["stages"].get(name, 0.0) + ms
+
+
+def note(**fields):
+    """Произвольные поля текущего запуска (число сигналов, причина пропуска...)."""
+    record = _current.get()
+    if record is not None:
+        with _lock:
+            record["notes"].update(fields)
+
+
+def _http_delta(before, after):
+    delta = {}
+    for provider, stats in after.items():
+        prev = before.get(provider, {})
+        d = {
+            key: value - prev.get(key, 0)
+            for key, value in stats.items()
+            if key != "latency_ms_max"
+        }
+        if d.get("requests"):
+            delta[provider] = d
+    return delta
+
+
+def run(name: str):
+    """Декоратор: запуск функции — одна запись метрик."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            record = {
+                "run": name,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "status": "ok",
+                "stages": {},
+                "notes": {},
+            }
+            token = _current.set(record)
+            http_before = http_client.get_stats()
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException as e:
+                record["status"] = "error"
+                record["error"] = repr(e)
+                raise
+            finally:
+                _current.reset(token)
+                record["duration_ms"] = (time.perf_counter() - t0) * 1000
+                record["http"] = _http_delta(http_before, http_client.get_stats())
+                _finish(record)
+
+        return wrapper
+
+    return decorator
+
+
+def _finish(record):
+    try:
+        if METRICS_FILE:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if PROMETHEUS_FILE:
+            with _lock:
+                _last_runs[record["run"]] = record
+                text = prometheus_text(_last_runs.values())
+            tmp = PROMETHEUS_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, PROMETHEUS_FILE)
+    except OSError as e:
+        # метрики не должны ронять бота
+        print("Не удалось записать метрики:", e)
+
+
+def prometheus_text(records) -> str:
+    """Текстовый формат Prometheus: сэмплы каждого семейства подряд под его TYPE."""
+    records = list(records)
+    lines = ["# TYPE secretary_run_duration_seconds gauge"]
+    for r in records:
+        lines.append(
+            f'secretary_run_duration_seconds{{run="{r["run"]}"}} {r["duration_ms"] / 1000:.6f}'
+        )
+    lines.append("# TYPE secretary_run_success gauge")
+    for r in records:
+        lines.append(f'secretary_run_success{{run="{r["run"]}"}} {int(r["status"] == "ok")}')
+    lines.append("# TYPE secretary_stage_duration_seconds gauge")
+    for r in records:
+        for stage_name, ms in sorted(r["stages"].items()):
+            lines.append(
+                f'secretary_stage_duration_seconds{{run="{r["run"]}",stage="{stage_name}"}} '
+                f"{ms / 1000:.6f}"
+            )
+
+    http = sorted(http_client.get_stats().items())
+    for key in ("requests", "retries", "errors", "bytes"):
+        lines.append(f"# TYPE secretary_http_{key}_total counter")
+        for provider, stats in http:
+            lines.append(
+                f'secretary_http_{key}_total{{provider="{provider}"}} {stats.get(key, 0)}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def load(path: str = METRICS_FILE):
+    """Все записи из файла метрик (для разбора «куда уходит время»)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    # медиана каждого этапа по всем запускам
+    by_stage = {}
+    for r in load():
+        for stage_name, ms in r["stages"].items():
+            by_stage.setdefault((r["run"], stage_name), []).append(ms)
+    for (run_name, stage_name), values in sorted(by_stage.items()):
+        values.sort()
+        print(
+            f"{run_name:<12} {stage_name:<16} n={len(values):<6} "
+            f"медиана {values[len(values) // 2]:8.1f} мс, макс {values[-1]:8.1f} мс"
+        )
@@ -1,29 +1,26 @@
-import os
-import csv
-import json
-from datetime import datetime, date, timedelta, timezone
+from datetime import datetime, date, time, timedelta, timezone
+
+import equity
+import metrics
+import pnl
+import sqlite_store
+import trades_columnar
+from core import (
+    CMC_API_KEY,
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_ID,
+    fmt_usd,
+    load_meta,
+    message_link,
+    save_meta,
+)
+from fng_store import get_fng_range, sync_quietly
+from ledger import TRADES_FILE, read_trades
+from persistence import STATE_FILE, read_state
+from strategy import BASE_CAPITAL
+from telegram_queue import enqueue, flush, send_now
 
-import requests
-
-CMC_API_KEY = os.environ.get("CMC_API_KEY")
-TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-
-TRADES_FILE = "trades.csv"
 MONTHLY_META_FILE = "monthly_meta.json"
-BASE_CAPITAL = 10_000.0
-
-
-def send_telegram(text: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-
-def fmt_usd(x: float) -> str:
-    return f"{x:,.2f}".replace(",", " ")
 
 
 def get_month_bounds():
@@ -42,52 +39,53 @@ def get_month_bounds():
 
 
 def load_trades_for_month(start: date, end: date):
-    if not os.path.exists(TRADES_FILE):
-        return []
-
     trades = []
-    with open(TRADES_FILE, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f, delimiter=";")
-        for row in reader:
-            ts = datetime.fromisoformat(row["timestamp_utc"])
-            d = ts.date()
-            if start <= d <= end:
-                trades.append(
-                    {
-                        "date": d,
-                        "asset": row["asset"],
-                        "action": row["action"],
-                        "fng": int(row["fng"]),
-                        "price": float(row["price"]),
-                        "usd_amount": float(row["usd_amount"]),
-                        "asset_delta": float(row["asset_delta"]),
-                        "avg_entry_price": float(row["avg_entry_price"])
-                        if row["avg_entry_price"]
-                        else None,
-                    }
-                )
+    for row in read_trades(start, end, TRADES_FILE):
+        trades.append(
+            {
+                "date": datetime.fromisoformat(row["timestamp_utc"]).date(),
+                "asset": row["asset"],
+                "action": row["action"],
+                "fng": int(row["fng"]),
+                "price": float(row["price"]),
+                "usd_amount": float(row["usd_amount"]),
+                "asset_delta": float(row["asset_delta"]),
+                "avg_entry_price": float(row["avg_entry_price"])
+                if row["avg_entry_price"]
+                else None,
+            }
+        )
     return trades
 
 
-def get_monthly_fng_stats(start: date, end: date):
-    if not CMC_API_KEY:
-        return None
+def summarize_trades(trades):
+    buys = [t for t in trades if t["action"] == "BUY"]
+    sells = [t for t in trades if t["action"] == "SELL"]
+
+    pnl_usd = 0.0
+    for t in sells:
+        if t["avg_entry_price"] is None:
+            continue
+        cost = abs(t["asset_delta"]) * t["avg_entry_price"]
+        profit = t["usd_amount"] - cost
+        pnl_usd += profit
 
-    url = "https://pro-api.coinmarketcap.com/v3/fear-and-greed/historical"
-    headers = {"X-CMC_PRO_API_KEY": CMC_API_KEY}
-    params = {
-        "start": start.isoformat(),
-        "end": (end + timedelta(days=1)).isoformat(),
-        "interval": "daily",
+    return {
+        "trades": len(trades),
+        "buys": len(buys),
+        "sells": len(sells),
+        "buy_usd": sum(t["usd_amount"] for t in buys),
+        "sell_usd": sum(t["usd_amount"] for t in sells),
+        "pnl_usd": pnl_usd,
     }
-    r = requests.get(url, headers=headers, params=params, timeout=20)
-    r.raise_for_status()
-    data = r.json()["data"]
-    if not data:
+
+
+def get_monthly_fng_stats(start: date, end: date):
+    rows = get_fng_range(start, end)
+    if not rows:
         return None
 
-    data_sorted = sorted(data, key=lambda x: x["timestamp"])
-    values = [int(item["value"]) for item in data_sorted]
+    values = [v for _, v in rows]
     first = values[0]
     last = values[-1]
     vmin = min(values)
@@ -133,40 +131,38 @@ def month_name_ru_gen(m: int) -> str:
 
 
 def load_monthly_meta():
-    if not os.path.exists(MONTHLY_META_FILE):
-        return {}
-    with open(MONTHLY_META_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_meta(MONTHLY_META_FILE, {})
 
 
 def save_monthly_meta(meta):
-    with open(MONTHLY_META_FILE, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    save_meta(MONTHLY_META_FILE, meta)
 
 
+@metrics.run("monthly")
 def main():
     if not (CMC_API_KEY and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         print("Не заданы переменные окружения для месячного отчёта")
+        metrics.note(skipped="env")
         return
 
     year, month, start, end = get_month_bounds()
-    trades = load_trades_for_month(start, end)
+    with metrics.stage("summary"):
+        if sqlite_store.is_enabled():
+            summary = sqlite_store.summarize(STATE_FILE, start, end)
+        elif trades_columnar.is_enabled():
+            # колонки включают явно (каталог trades_cols) — им и отвечать
+            summary = trades_columnar.summarize(start, end)
+        elif read_state(STATE_FILE) is not None:
+            # итоги месяца бот копит в состоянии при каждой сделке
+            summary = pnl.period(
+                pnl.load(STATE_FILE, TRADES_FILE), "months", f"{year}-{month:02d}"
+            )
+        else:
+            summary = summarize_trades(load_trades_for_month(start, end))
+    sync_quietly()
     fng_stats = get_monthly_fng_stats(start, end)
 
-    buys = [t for t in trades if t["action"] == "BUY"]
-    sells = [t for t in trades if t["action"] == "SELL"]
-
-    total_buy_usd = sum(t["usd_amount"] for t in buys)
-    total_sell_usd = sum(t["usd_amount"] for t in sells)
-
-    pnl_usd = 0.0
-    for t in sells:
-        if t["avg_entry_price"] is None:
-            continue
-        cost = abs(t["asset_delta"]) * t["avg_entry_price"]
-        profit = t["usd_amount"] - cost
-        pnl_usd += profit
-
+    pnl_usd = summary["pnl_usd"]
     pnl_pct = pnl_usd / BASE_CAPITAL * 100 if BASE_CAPITAL > 0 else 0.0
 
     month_nom = month_name_ru_nom(month).capitalize()
@@ -199,9 +195,11 @@ def main():
 
     actions_block = (
         "\n💼 <b>Действия стратегии</b>\n"
-        f"Всего сделок: <b>{len(trades)}</b>\n"
-        f"Покупок (BTC и ETH): <b>{len(buys)}</b>, на сумму ~<b>{fmt_usd(total_buy_usd)} $</b>\n"
-        f"Продаж (BTC и ETH): <b>{len(sells)}</b>, на сумму ~<b>{fmt_usd(total_sell_usd)} $</b>\n"
+        f"Всего сделок: <b>{summary['trades']}</b>\n"
+        f"Покупок (BTC и ETH): <b>{summary['buys']}</b>, "
+        f"на сумму ~<b>{fmt_usd(summary['buy_usd'])} $</b>\n"
+        f"Продаж (BTC и ETH): <b>{summary['sells']}</b>, "
+        f"на сумму ~<b>{fmt_usd(summary['sell_usd'])} $</b>\n"
     )
 
     result_block = (
@@ -211,6 +209,18 @@ def main():
         f"• Сумма ориентировочная, без учёта проскальзывания и комиссий биржи.\n"
     )
 
+    risk = equity.stats(
+        equity.equity_path(STATE_FILE),
+        datetime.combine(start, time.min, tzinfo=timezone.utc),
+        datetime.combine(end, time.max, tzinfo=timezone.utc),
+    )
+    if risk:
+        result_block += (
+            f"• Стоимость портфеля за месяц: <b>{risk['return_pct']:+.2f}%</b>, "
+            f"макс. просадка <b>{risk['max_drawdown_pct']:.2f}%</b>, "
+            f"волатильность (годовая) <b>{risk['volatility_pct']:.1f}%</b>.\n"
+        )
+
     comment = (
         "\n🔎 <b>Комментарий</b>\n"
         "Стратегия симметрично работает по BTC и ETH: накапливает позицию при страхе "
@@ -225,7 +235,7 @@ def main():
 
     text = header + fng_block + actions_block + result_block + comment
 
-    res = send_telegram(text)
+    res = send_now(text)
     message_id = res["result"]["message_id"]
 
     meta[key] = {"message_id": message_id, "pnl_usd": pnl_usd, "pnl_pct": pnl_pct}
@@ -238,13 +248,12 @@ def main():
         if k in meta:
             mid = meta[k]["message_id"]
             m_name = month_name_ru_nom(m).capitalize()
-            links.append(
-                f"• <a href=\"https://t.me/{TELEGRAM_CHAT_ID.lstrip('@')}/{mid}\">{m_name} {year}</a>"
-            )
+            links.append(f"• <a href=\"{message_link(mid)}\">{m_name} {year}</a>")
 
     if links:
         links_block = "\n\n🔗 <b>Отчёты за этот год</b>\n" + "\n".join(links)
-        send_telegram(links_block)
+        enqueue(links_block)
+        flush()
 
     print("Месячный отчёт отправлен.")
 
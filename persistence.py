@@ -0,0 +1,264 @@
+"""
+Согласованное сохранение состояния и журнала сделок.
+
+Порядок фиксации тика:
+  1. рядом с файлом состояния атомарно пишется маркер <state>.pending:
+     новое состояние, сделки тика и позиция конца журнала до дозаписи;
+  2. сделки дописываются в журнал;
+  3. состояние атомарно заменяется (temp + fsync + rename) — в JSON или,
+     если рядом лежит <state>.bin, в двоичном формате state_codec;
+  4. маркер удаляется.
+
+Если процесс упал между 1 и 4, при следующем запуске recover() откатывает
+журнал к сохранённой позиции и заново применяет тик из маркера. Если упал
+до появления маркера — тик просто не состоялся.
+
+Сделки тика дописываются через ledger.LedgerWriter: одна запись и один fsync
+на журнал. group_commit() объединяет тики нескольких портфелей: общий маркер
+tick_group.pending и по одному fsync на каждый журнал группы.
+
+Если есть база sqlite_store, тик — одна её транзакция, а файлы не трогаются.
+"""
+
+import os
+import json
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import metrics
+import sqlite_store
+import state_codec
+from ledger import TRADES_FILE, LedgerWriter, flush_all, ledger_position, truncate_ledger
+
+STATE_FILE = "secretary_state.json"
+# формат новых файлов состояния: json или bin (state_codec); существующие
+# файлы остаются в своём формате
+STATE_FORMAT = os.environ.get("SECRETARY_STATE_FORMAT", "json")
+# маркер групповой фиксации (group_commit): все тики группы разом
+GROUP_PENDING = "tick_group.pending"
+
+_group = contextvars.ContextVar("commit_group", default=None)
+
+
+def pending_path(state_path: str = STATE_FILE) -> str:
+    return state_path + ".pending"
+
+
+def _fsync_dir(path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path: str, obj, indent: int | None = 2):
+    """Запись через временный файл: на диске либо старая, либо новая версия целиком."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def state_bin_path(state_path: str = STATE_FILE) -> str:
+    """Двоичная версия файла состояния: secretary_state.json -> secretary_state.bin."""
+    root, _ = os.path.splitext(state_path)
+    return root + ".bin"
+
+
+def _save_state_file(state_path: str, state):
+    # формат выбирается по уже существующему файлу, для нового — STATE_FORMAT
+    bin_path = state_bin_path(state_path)
+    if os.path.exists(bin_path) or (
+        STATE_FORMAT == "bin" and not os.path.exists(state_path)
+    ):
+        atomic_write_bytes(bin_path, state_codec.encode(state))
+    else:
+        atomic_write_json(state_path, state)
+
+
+def read_state(state_path: str = STATE_FILE):
+    """Сохранённое состояние (dict) или None, если портфель ещё не запускался."""
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_state(state_path)
+    return read_state_file(state_path)
+
+
+def read_state_file(state_path: str = STATE_FILE):
+    """Состояние из файла (.bin или .json) в обход базы sqlite_store."""
+    bin_path = state_bin_path(state_path)
+    if os.path.exists(bin_path):
+        with open(bin_path, "rb") as f:
+            return state_codec.decode(f.read())
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_state(state, state_path: str = STATE_FILE):
+    if sqlite_store.is_enabled():
+        sqlite_store.save_state(state_path, state)
+    else:
+        _save_state_file(state_path, state)
+
+
+def _apply_ticks(ticks, marker: str):
+    with metrics.stage("ledger_append"):
+        writers = {}
+        for tick in ticks:
+            writer = writers.get(tick["trades_path"])
+            if writer is None:
+                writer = writers[tick["trades_path"]] = LedgerWriter(tick["trades_path"])
+            for trade in tick["trades"]:
+                row = dict(trade)
+                row["ts"] = datetime.fromisoformat(row["ts"])
+                writer.add(**row)
+        # журналы должны оказаться на диске раньше новых состояний
+        flush_all(writers.values())
+    with metrics.stage("state_save"):
+        for tick in ticks:
+            _save_state_file(tick["state_path"], tick["state"])
+    os.remove(marker)
+    _fsync_dir(marker)
+
+
+def _apply(pending, state_path: str, trades_path: str):
+    _apply_ticks(
+        [dict(pending, state_path=state_path, trades_path=trades_path)],
+        pending_path(state_path),
+    )
+
+
+def commit_tick(state, trades, state_path: str = STATE_FILE, trades_path: str = TRADES_FILE,
+                ts: datetime | None = None):
+    """
+    Зафиксировать тик: trades — аргументы log_trade (без ts и path),
+    state — итоговое состояние. Журнал и состояние меняются вместе.
+    Внутри group_commit тик только откладывается до конца блока.
+    """
+    now = ts or datetime.now(timezone.utc)
+    group = _group.get()
+    if group is not None:
+        group.append(
+            {
+                "state_path": state_path,
+                "trades_path": trades_path,
+                "state": state,
+                "trades": [dict(t, ts=now.isoformat()) for t in trades],
+                "ts": now.isoformat(),
+            }
+        )
+        return
+    if sqlite_store.is_enabled():
+        with metrics.stage("state_save"):
+            sqlite_store.commit_tick(state_path, state, trades, now)
+        return
+    pending = {
+        "state": state,
+        "trades": [dict(t, ts=now.isoformat()) for t in trades],
+        "ledger": ledger_position(trades_path),
+    }
+    atomic_write_json(pending_path(state_path), pending, indent=None)
+    _apply(pending, state_path, trades_path)
+
+
+@contextmanager
+def group_commit(marker_path: str = GROUP_PENDING):
+    """
+    Групповая фиксация: тики всех портфелей внутри блока пишутся вместе при
+    выходе из него — один маркер на группу, по одной записи и одному fsync
+    на журнал (с базой sqlite_store — одна транзакция).
+
+        with group_commit():
+            for portfolio in portfolios:
+                run_portfolio(...)
+        # здесь сделки и состояния уже на диске
+    """
+    if _group.get() is not None:
+        yield
+        return
+    ticks = []
+    token = _group.set(ticks)
+    try:
+        yield
+    finally:
+        _group.reset(token)
+        if ticks:
+            _commit_group(ticks, marker_path)
+
+
+def _commit_group(ticks, marker_path: str):
+    metrics.note(committed_ticks=len(ticks))
+    if sqlite_store.is_enabled():
+        with metrics.stage("state_save"):
+            sqlite_store.commit_ticks(
+                [
+                    (t["state_path"], t["state"], t["trades"], datetime.fromisoformat(t["ts"]))
+                    for t in ticks
+                ]
+            )
+        return
+    group = {
+        "ticks": ticks,
+        "ledgers": {
+            path: ledger_position(path)
+            for path in dict.fromkeys(t["trades_path"] for t in ticks)
+        },
+    }
+    atomic_write_json(marker_path, group, indent=None)
+    _apply_ticks(ticks, marker_path)
+
+
+def recover_group(marker_path: str = GROUP_PENDING) -> bool:
+    """Довести до конца групповую фиксацию, прерванную сбоем."""
+    if sqlite_store.is_enabled() or not os.path.exists(marker_path):
+        return False
+
+    with open(marker_path, "r", encoding="utf-8") as f:
+        group = json.load(f)
+
+    for path, position in group["ledgers"].items():
+        truncate_ledger(position, path)
+    _apply_ticks(group["ticks"], marker_path)
+    print(f"Восстановлена незавершённая групповая фиксация: тиков {len(group['ticks'])}")
+    return True
+
+
+def recover(state_path: str = STATE_FILE, trades_path: str = TRADES_FILE) -> bool:
+    """
+    Довести до конца тик, прерванный сбоем. Возвращает True, если что-то
+    восстанавливали.
+    """
+    recovered = recover_group()
+    marker = pending_path(state_path)
+    if sqlite_store.is_enabled() or not os.path.exists(marker):
+        return recovered
+
+    with open(marker, "r", encoding="utf-8") as f:
+        pending = json.load(f)
+
+    truncate_ledger(pending["ledger"], trades_path)
+    _apply(pending, state_path, trades_path)
+    print(f"Восстановлен незавершённый тик: сделок {len(pending['trades'])}")
+    return True
@@ -0,0 +1,123 @@
+"""
+Накопительный PnL, который бот ведёт в состоянии в момент сделки.
+
+state["pnl"] = {
+  "assets": {"BTC": {"realized_usd": ..., "cost_basis_usd": ...}, "ETH": {...}},
+  "days":   {"2025-03-14": ROLLUP, ...},   # последние DAYS_KEPT дней с сделками
+  "months": {"2025-03": ROLLUP, ...},
+  "years":  {"2025": ROLLUP, ...},
+}
+ROLLUP = {trades, buys, sells, buy_usd, sell_usd, pnl_usd} — те же поля,
+что у summarize_trades в месячном отчёте.
+
+Реализованный PnL продажи: usd_amount - |asset_delta| * avg_entry_price.
+Себестоимость позиции: asset_after * avg_entry_price после сделки.
+Отчёты берут готовые суммы за период вместо пересчёта по журналу.
+"""
+
+from datetime import date
+
+import sqlite_store
+from ledger import TRADES_FILE, read_trades
+from persistence import STATE_FILE, read_state
+
+DAYS_KEPT = 400
+
+
+def empty_rollup():
+    return {
+        "trades": 0,
+        "buys": 0,
+        "sells": 0,
+        "buy_usd": 0.0,
+        "sell_usd": 0.0,
+        "pnl_usd": 0.0,
+    }
+
+
+def empty():
+    return {"assets": {}, "days": {}, "months": {}, "years": {}}
+
+
+def add_trade(pnl, ts, asset: str, action: str, usd_amount: float, asset_delta: float,
+              asset_after: float, avg_entry_price: float | None):
+    """Учесть одну сделку (ts — datetime или date сделки)."""
+    realized = 0.0
+    if action == "SELL" and avg_entry_price is not None:
+        realized = usd_amount - abs(asset_delta) * avg_entry_price
+
+    a = pnl["assets"].setdefault(asset, {"realized_usd": 0.0, "cost_basis_usd": 0.0})
+    a["realized_usd"] += realized
+    a["cost_basis_usd"] = asset_after * avg_entry_price if avg_entry_price else 0.0
+
+    day = ts.strftime("%Y-%m-%d")
+    for period, key in (("days", day), ("months", day[:7]), ("years", day[:4])):
+        r = pnl[period].setdefault(key, empty_rollup())
+        r["trades"] += 1
+        if action == "BUY":
+            r["buys"] += 1
+            r["buy_usd"] += usd_amount
+        else:
+            r["sells"] += 1
+            r["sell_usd"] += usd_amount
+            r["pnl_usd"] += realized
+
+    days = pnl["days"]
+    if len(days) > DAYS_KEPT:
+        for key in sorted(days)[: len(days) - DAYS_KEPT]:
+            del days[key]
+
+
+def record_trades(state, trades, ts):
+    """Сделки тика (strategy.Trade) -> state["pnl"]."""
+    pnl = state.setdefault("pnl", empty())
+    for t in trades:
+        add_trade(pnl, ts, t.asset, t.action, t.usd_amount, t.asset_delta,
+                  t.asset_after, t.avg_entry_price)
+
+
+def from_rows(rows):
+    """Накопители по строкам журнала (dict как у ledger.read_trades)."""
+    pnl = empty()
+    for row in rows:
+        avg = row["avg_entry_price"]
+        add_trade(
+            pnl,
+            date.fromisoformat(row["timestamp_utc"][:10]),
+            row["asset"],
+            row["action"],
+            float(row["usd_amount"]),
+            float(row["asset_delta"]),
+            float(row["asset_after"]),
+            float(avg) if avg not in (None, "") else None,
+        )
+    return pnl
+
+
+def from_ledger(trades_path: str = TRADES_FILE):
+    """Собрать накопители заново по журналу (миграция старых состояний)."""
+    return from_rows(read_trades(date(1970, 1, 1), date(9999, 12, 31), trades_path))
+
+
+def rebuild(state_path: str = STATE_FILE, trades_path: str = TRADES_FILE):
+    """Накопители по сделкам портфеля — из базы, если она есть, иначе из журнала."""
+    if sqlite_store.is_enabled():
+        return from_rows(sqlite_store.read_trades(state_path))
+    return from_ledger(trades_path)
+
+
+def realized_total(pnl) -> float:
+    return sum(a["realized_usd"] for a in pnl["assets"].values())
+
+
+def period(pnl, kind: str, key: str):
+    """Итоги за день/месяц/год: period(pnl, "months", "2025-03")."""
+    return dict(pnl[kind].get(key) or empty_rollup())
+
+
+def load(state_path: str = STATE_FILE, trades_path: str = TRADES_FILE):
+    """PnL из состояния бота; если его там ещё нет — по сделкам."""
+    state = read_state(state_path)
+    if state is not None and "pnl" in state:
+        return state["pnl"]
+    return rebuild(state_path, trades_path)
@@ -0,0 +1,99 @@
+"""
+Конфигурация виртуальных портфелей.
+
+Без файла portfolios.json бот работает как раньше: один портфель,
+secretary_state.json + trades.csv, чат из TELEGRAM_CHAT_ID.
+
+Формат portfolios.json:
+[
+  {
+    "name": "main",
+    "base_capital": 10000,
+    "chat_id": "@channel",
+    "state_file": "portfolios/main/state.json",
+    "trades_file": "portfolios/main/trades.csv",
+    "ladder": {
+      "buy_targets": {"40": 1100, "35": 1500, ...},
+      "sell_fracs": {"60": 0.25, ...},
+      "btc_share": 0.5
+    }
+  },
+  ...
+]
+Все поля, кроме name, необязательны; ladder по умолчанию — из strategy.py.
+"""
+
+import os
+import json
+from dataclasses import dataclass
+
+from ledger import TRADES_FILE
+from persistence import STATE_FILE
+from strategy import BASE_CAPITAL, DEFAULT_LADDER, Ladder
+
+PORTFOLIOS_FILE = "portfolios.json"
+PORTFOLIOS_DIR = "portfolios"
+
+
+@dataclass(slots=True)
+class Portfolio:
+    name: str
+    base_capital: float
+    chat_id: str | None
+    state_file: str
+    trades_file: str
+    ladder: Ladder
+
+
+def ladder_from_config(cfg) -> Ladder:
+    if not cfg:
+        return DEFAULT_LADDER
+    buy_targets = {int(k): float(v) for k, v in cfg["buy_targets"].items()}
+    sell_fracs = {int(k): float(v) for k, v in cfg["sell_fracs"].items()}
+    # покупки — от верхнего уровня к нижнему, продажи — от нижнего к верхнему
+    return Ladder.build(
+        buy_targets,
+        sell_fracs,
+        cfg.get("btc_share", DEFAULT_LADDER.btc_share),
+        buy_levels=sorted(buy_targets, reverse=True),
+        sell_levels=sorted(sell_fracs),
+    )
+
+
+def default_portfolio() -> Portfolio:
+    return Portfolio(
+        name="main",
+        base_capital=BASE_CAPITAL,
+        chat_id=os.environ.get("TELEGRAM_CHAT_ID"),
+        state_file=STATE_FILE,
+        trades_file=TRADES_FILE,
+        ladder=DEFAULT_LADDER,
+    )
+
+
+def load_portfolios(path: str = PORTFOLIOS_FILE):
+    if not os.path.exists(path):
+        return [default_portfolio()]
+
+    with open(path, "r", encoding="utf-8") as f:
+        configs = json.load(f)
+
+    portfolios = []
+    names = set()
+    for cfg in configs:
+        name = cfg["name"]
+        if name in names:
+            raise ValueError(f"Повторяющееся имя портфеля: {name}")
+        names.add(name)
+        folder = os.path.join(PORTFOLIOS_DIR, name)
+        portfolios.append(
+            Portfolio(
+                name=name,
+                base_capital=float(cfg.get("base_capital", BASE_CAPITAL)),
+                chat_id=cfg.get("chat_id") or os.environ.get("TELEGRAM_CHAT_ID"),
+                state_file=cfg.get("state_file", os.path.join(folder, "state.json")),
+                trades_file=cfg.get("trades_file", os.path.join(folder, "trades.csv")),
+                ladder=ladder_from_config(cfg.get("ladder")),
+            )
+        )
+    return portfolios
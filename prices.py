@@ -0,0 +1,56 @@
+import http_client
+import metrics
+from cache import cached
+from core import COINGECKO_BASE_URL
+
+COINGECKO_URL = COINGECKO_BASE_URL + "/api/v3/simple/price"
+
+# Реестр тикер -> id CoinGecko. Новые активы добавляются через register_symbol.
+COINGECKO_IDS = {
+    "BTCUSDT": "bitcoin",
+    "ETHUSDT": "ethereum",
+    "SOLUSDT": "solana",
+    "BNBUSDT": "binancecoin",
+}
+
+
+def register_symbol(symbol: str, coin_id: str):
+    """Добавить (или переопределить) соответствие тикера и id CoinGecko."""
+    COINGECKO_IDS[symbol] = coin_id
+
+
+def get_prices(symbols, timeout: float = 15, allow_stale: bool = True) -> dict:
+    """
+    Цены в USD для любого набора тикеров одним запросом к CoinGecko.
+    Ответ кэшируется (cache.TTL["prices"]), так что бот и отчёты,
+    запущенные подряд, не запрашивают одно и то же дважды.
+    Торговый тик передаёт allow_stale=False (см. cache.cached).
+    Возвращает {"BTCUSDT": 87506.0, "ETHUSDT": 2918.67, ...}.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    unknown = [s for s in symbols if s not in COINGECKO_IDS]
+    if unknown:
+        raise ValueError(f"Неизвестный тикер для CoinGecko: {', '.join(unknown)}")
+    if not symbols:
+        return {}
+
+    ids = sorted({COINGECKO_IDS[s] for s in symbols})
+    params = {"ids": ",".join(ids), "vs_currencies": "usd"}
+
+    def fetch():
+        r = http_client.get(COINGECKO_URL, params=params, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        # неполный ответ не должен попасть в кэш
+        for coin_id in ids:
+            if coin_id not in data or "usd" not in data[coin_id]:
+                raise ValueError(f"CoinGecko не вернул цену для {coin_id}")
+        return data
+
+    with metrics.stage("fetch_prices"):
+        data = cached("prices", params["ids"], fetch, allow_stale=allow_stale)
+    return {s: float(data[COINGECKO_IDS[s]]["usd"]) for s in symbols}
+
+
+def get_price(symbol: str) -> float:
+    return get_prices([symbol])[symbol]
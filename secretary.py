@@ -0,0 +1,59 @@
+"""
+Единая точка входа:
+
+    python secretary.py tick          # один тик бота (bot.py)
+    python secretary.py monthly       # месячный отчёт
+    python secretary.py yearly        # годовой отчёт
+    python secretary.py inactivity    # отчёт о тишине
+    python secretary.py backtest history.csv [...]
+    python secretary.py sweep history.csv [...]
+    python secretary.py daemon [...]
+    python secretary.py stream replay|socket ...
+    python secretary.py benchmark [--rows ...]
+
+Модуль команды импортируется только после разбора аргументов, так что
+каждая команда грузит лишь то, что ей нужно.
+"""
+
+import sys
+import importlib
+
+# команда -> (модуль, принимает ли main() свои аргументы)
+COMMANDS = {
+    "tick": ("bot", False),
+    "monthly": ("monthly_report", False),
+    "yearly": ("yearly_report", False),
+    "inactivity": ("inactivity_report", False),
+    "backtest": ("backtest", True),
+    "sweep": ("sweep", True),
+    "daemon": ("daemon", True),
+    "stream": ("stream", True),
+    "benchmark": ("benchmark", True),
+}
+
+
+def usage() -> str:
+    return "Использование: python secretary.py {" + "|".join(COMMANDS) + "} [аргументы]"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(usage())
+        return 2
+
+    module_name, takes_args = COMMANDS[argv[0]]
+    if argv[1:] and not takes_args:
+        print(f"Команда {argv[0]} не принимает аргументов")
+        return 2
+
+    module = importlib.import_module(module_name)
+    if takes_args:
+        module.main(argv[1:])
+    else:
+        module.main()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
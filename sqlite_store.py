@@ -0,0 +1,333 @@
+"""
+Хранилище на SQLite: состояние портфелей, журнал сделок и мета-данные отчётов
+в одном файле secretary.db (SECRETARY_DB) вместо secretary_state.json,
+trades.csv и *_meta.json.
+
+Как и trades_cols/, включается самим фактом существования файла: если базы
+нет — бот работает с файлами как раньше. Создать базу из текущих файлов:
+    python sqlite_store.py migrate
+
+Таблицы:
+  state(portfolio, data, updated_at)  — состояние портфеля целиком (JSON);
+  trades(portfolio, ts, asset, ...)   — сделки, индексы (portfolio, ts) и (asset, ts);
+  meta(name, data)                    — бывшие monthly/yearly/inactivity_meta.json.
+
+Портфель определяется путём его файла состояния (secretary_state.json,
+portfolios/<имя>/state.json) — тем же ключом, что и в файловом режиме.
+Тик — одна транзакция: сделки и новое состояние попадают в базу вместе,
+маркер .pending не нужен. Журнал — WAL: отчёты читают, не мешая тику.
+"""
+
+import os
+import sys
+import json
+import atexit
+import sqlite3
+import threading
+from datetime import datetime, date, timedelta, timezone
+
+DB_FILE = os.environ.get("SECRETARY_DB", "secretary.db")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    portfolio  TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id              INTEGER PRIMARY KEY,
+    portfolio       TEXT NOT NULL,
+    ts              TEXT NOT NULL,
+    asset           TEXT NOT NULL,
+    action          TEXT NOT NULL,
+    fng             INTEGER NOT NULL,
+    price           REAL NOT NULL,
+    usd_amount      REAL NOT NULL,
+    asset_delta     REAL NOT NULL,
+    cash_after      REAL NOT NULL,
+    asset_after     REAL NOT NULL,
+    avg_entry_price REAL
+);
+CREATE INDEX IF NOT EXISTS trades_portfolio_ts ON trades (portfolio, ts);
+CREATE INDEX IF NOT EXISTS trades_asset_ts ON trades (asset, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+TRADE_COLUMNS = (
+    "asset",
+    "action",
+    "fng",
+    "price",
+    "usd_amount",
+    "asset_delta",
+    "cash_after",
+    "asset_after",
+    "avg_entry_price",
+)
+
+# соединение на поток: демон и пул задач пишут из разных потоков
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+
+
+def is_enabled(path: str = DB_FILE) -> bool:
+    return bool(path) and os.path.exists(path)
+
+
+def connect(path: str = DB_FILE) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is not None:
+        return conn
+
+    # isolation_level=None: транзакции открываем сами (BEGIN IMMEDIATE в _transaction)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # FULL: зафиксированный тик переживает и отключение питания
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    conns[path] = conn
+    with _lock:
+        _connections.append(conn)
+    return conn
+
+
+@atexit.register
+def close_all():
+    """
+    Закрыть соединения. Последнее закрытие переносит WAL в основной файл,
+    так что в git коммитится один secretary.db без -wal/-shm.
+    """
+    with _lock:
+        conns = list(_connections)
+        _connections.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.pop("conns", None)
+
+
+class _transaction:
+    """with _transaction(conn): ... — BEGIN IMMEDIATE / COMMIT / ROLLBACK."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _trade_values(portfolio: str, ts: str, trade):
+    return (portfolio, ts) + tuple(trade.get(k) for k in TRADE_COLUMNS)
+
+
+_INSERT_TRADE = (
+    "INSERT INTO trades (portfolio, ts, " + ", ".join(TRADE_COLUMNS) + ") "
+    "VALUES (" + ", ".join("?" * (len(TRADE_COLUMNS) + 2)) + ")"
+)
+_UPSERT_STATE = (
+    "INSERT INTO state (portfolio, data, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(portfolio) DO UPDATE SET data = excluded.data, "
+    "updated_at = excluded.updated_at"
+)
+
+
+# ---- СОСТОЯНИЕ И СДЕЛКИ ----
+
+def load_state(portfolio: str, path: str = DB_FILE):
+    """Состояние портфеля (dict) или None, если его ещё нет."""
+    row = connect(path).execute(
+        "SELECT data FROM state WHERE portfolio = ?", (portfolio,)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def save_state(portfolio: str, state, path: str = DB_FILE):
+    conn = connect(path)
+    with _transaction(conn):
+        conn.execute(
+            _UPSERT_STATE,
+            (portfolio, json.dumps(state, ensure_ascii=False),
+             datetime.now(timezone.utc).isoformat()),
+        )
+
+
+def commit_tick(portfolio: str, state, trades, ts: datetime, path: str = DB_FILE):
+    """Сделки тика и новое состояние — одной транзакцией."""
+    commit_ticks([(portfolio, state, trades, ts)], path)
+
+
+def commit_ticks(ticks, path: str = DB_FILE):
+    """Тики нескольких портфелей (portfolio, state, trades, ts) — одной транзакцией."""
+    conn = connect(path)
+    with _transaction(conn):
+        for portfolio, state, trades, ts in ticks:
+            stamp = ts.isoformat()
+            conn.executemany(
+                _INSERT_TRADE, [_trade_values(portfolio, stamp, t) for t in trades]
+            )
+            conn.execute(
+                _UPSERT_STATE, (portfolio, json.dumps(state, ensure_ascii=False), stamp)
+            )
+
+
+def _day_bounds(start: date, end: date):
+    # ts хранится ISO-строкой в UTC, поэтому диапазон дат — сравнение строк
+    return start.isoformat(), (end + timedelta(days=1)).isoformat()
+
+
+def read_trades(portfolio: str, start: date = date(1970, 1, 1),
+                end: date = date(9999, 12, 30), path: str = DB_FILE):
+    """Сделки с датой в [start, end] в том же виде, что ledger.read_trades."""
+    lo, hi = _day_bounds(start, end)
+    rows = connect(path).execute(
+        "SELECT ts, " + ", ".join(TRADE_COLUMNS) + " FROM trades "
+        "WHERE portfolio = ? AND ts >= ? AND ts < ? ORDER BY id",
+        (portfolio, lo, hi),
+    )
+    keys = ("timestamp_utc",) + TRADE_COLUMNS
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def summarize(portfolio: str, start: date, end: date, path: str = DB_FILE):
+    """Итоги за период одним запросом по индексу (portfolio, ts)."""
+    lo, hi = _day_bounds(start, end)
+    row = connect(path).execute(
+        """
+        SELECT COUNT(*),
+               TOTAL(action = 'BUY'),
+               TOTAL(action = 'SELL'),
+               TOTAL(CASE WHEN action = 'BUY' THEN usd_amount END),
+               TOTAL(CASE WHEN action = 'SELL' THEN usd_amount END),
+               TOTAL(CASE WHEN action = 'SELL' AND avg_entry_price IS NOT NULL
+                          THEN usd_amount - ABS(asset_delta) * avg_entry_price END)
+        FROM trades
+        WHERE portfolio = ? AND ts >= ? AND ts < ?
+        """,
+        (portfolio, lo, hi),
+    ).fetchone()
+    return {
+        "trades": row[0],
+        "buys": int(row[1]),
+        "sells": int(row[2]),
+        "buy_usd": row[3],
+        "sell_usd": row[4],
+        "pnl_usd": row[5],
+    }
+
+
+def last_trade_ts(portfolio: str, path: str = DB_FILE):
+    """Время последней сделки портфеля (datetime) или None."""
+    row = connect(path).execute(
+        "SELECT MAX(ts) FROM trades WHERE portfolio = ?", (portfolio,)
+    ).fetchone()
+    return datetime.fromisoformat(row[0]) if row[0] else None
+
+
+# ---- МЕТА-ДАННЫЕ ОТЧЁТОВ ----
+
+def load_meta(name: str, default, path: str = DB_FILE):
+    row = connect(path).execute("SELECT data FROM meta WHERE name = ?", (name,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+
+def save_meta(name: str, obj, path: str = DB_FILE):
+    conn = connect(path)
+    with _transaction(conn):
+        conn.execute(
+            "INSERT INTO meta (name, data) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+            (name, json.dumps(obj, ensure_ascii=False)),
+        )
+
+
+# ---- МИГРАЦИЯ ИЗ ФАЙЛОВ ----
+
+META_FILES = ("monthly_meta.json", "yearly_meta.json", "inactivity_meta.json")
+
+
+def _float_or_none(value):
+    return float(value) if value not in (None, "") else None
+
+
+def migrate_portfolio(state_path: str, trades_path: str, path: str = DB_FILE):
+    """
+    Перенести состояние и журнал одного портфеля. Повторный запуск
+    перезаписывает данные портфеля в базе, а не дублирует сделки.
+    """
+    import pnl
+    from ledger import read_trades as read_ledger
+    from persistence import read_state_file, recover
+
+    recover(state_path, trades_path)
+    rows = read_ledger(date(1970, 1, 1), date(9999, 12, 31), trades_path)
+    # после state_codec convert состояние лежит только в .bin
+    state = read_state_file(state_path)
+    if state is not None and "pnl" not in state:
+        state["pnl"] = pnl.from_ledger(trades_path)
+
+    values = [
+        (
+            state_path,
+            row["timestamp_utc"],
+            row["asset"],
+            row["action"],
+            int(row["fng"]),
+            float(row["price"]),
+            float(row["usd_amount"]),
+            float(row["asset_delta"]),
+            float(row["cash_after"]),
+            float(row["asset_after"]),
+            _float_or_none(row["avg_entry_price"]),
+        )
+        for row in rows
+    ]
+    conn = connect(path)
+    with _transaction(conn):
+        conn.execute("DELETE FROM trades WHERE portfolio = ?", (state_path,))
+        conn.executemany(_INSERT_TRADE, values)
+        if state is not None:
+            conn.execute(
+                _UPSERT_STATE,
+                (state_path, json.dumps(state, ensure_ascii=False),
+                 datetime.now(timezone.utc).isoformat()),
+            )
+    return len(values)
+
+
+def migrate(path: str = DB_FILE):
+    from portfolios import load_portfolios
+
+    for portfolio in load_portfolios():
+        n = migrate_portfolio(portfolio.state_file, portfolio.trades_file, path)
+        print(f"[{portfolio.name}] перенесено сделок: {n}")
+    for name in META_FILES:
+        if os.path.exists(name):
+            with open(name, "r", encoding="utf-8") as f:
+                save_meta(name, json.load(f), path)
+            print(f"Мета-данные {name} перенесены")
+    print(f"Готово: {path}. Старые файлы можно удалить из репозитория.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Использование: python sqlite_store.py migrate")
+        sys.exit(2)
+    migrate()
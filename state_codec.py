@@ -0,0 +1,279 @@
+"""
+Компактный двоичный формат состояния портфеля (<state>.bin рядом с .json).
+
+Схема фиксирована, числа — little-endian, без текста:
+  заголовок   "FNGS", версия (H)
+  основное    base_capital, cash_usd, btc_amount, eth_amount,
+              avg_entry_btc, avg_entry_eth (6d, NaN — средней цены нет)
+  buckets     число (H), по уровню: level (h), invested_usd, btc_amount, eth_amount (3d)
+  sell_used   число (H), по уровню: level (h), флаг (?)
+  pnl         есть ли (?); assets: число (H), имя (B + ASCII), realized_usd, cost_basis_usd (2d);
+              days/months/years: число (I), по периоду: ключ ASCII ("2025-03-14" /
+              "2025-03" / "2025", 10s/7s/4s), trades, buys, sells (3I),
+              buy_usd, sell_usd, pnl_usd (3d)
+  прочее      длина (I) и JSON остальных ключей (обычно пусто)
+
+next_trigger не хранится: бот пересчитывает его при загрузке.
+Версия файла растёт при любом изменении схемы; чтение старой версии —
+через её декодер и цепочку MIGRATIONS до текущей.
+
+Файлы в JSON читаются как раньше (upgrade дополняет старые состояния).
+Перевести портфели в двоичный формат и посмотреть состояние глазами:
+    python state_codec.py convert
+    python state_codec.py export secretary_state.bin [--out state.json]
+"""
+
+import os
+import sys
+import json
+import math
+import struct
+import argparse
+
+MAGIC = b"FNGS"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sH")
+_CORE = struct.Struct("<6d")
+_COUNT = struct.Struct("<H")
+_COUNT_LONG = struct.Struct("<I")
+_BUCKET = struct.Struct("<h3d")
+_SELL = struct.Struct("<h?")
+_FLAG = struct.Struct("<?")
+_NAME_LEN = struct.Struct("<B")
+_ASSET = struct.Struct("<2d")
+# ключ периода — ASCII фиксированной длины: "2025-03-14", "2025-03", "2025"
+_ROLLUPS = {
+    "days": struct.Struct("<10s3I3d"),
+    "months": struct.Struct("<7s3I3d"),
+    "years": struct.Struct("<4s3I3d"),
+}
+
+_NAN = float("nan")
+# ключи, которые пишутся схемой; остальное уходит в JSON-хвост
+_SCHEMA_KEYS = {
+    "base_capital",
+    "cash_usd",
+    "btc_amount",
+    "eth_amount",
+    "avg_entry_btc",
+    "avg_entry_eth",
+    "buckets",
+    "sell_used",
+    "pnl",
+    "next_trigger",
+}
+
+
+def _opt(x):
+    return _NAN if x is None else float(x)
+
+
+def _opt_back(x):
+    return None if math.isnan(x) else x
+
+
+def encode(state) -> bytes:
+    parts = [
+        _HEADER.pack(MAGIC, VERSION),
+        _CORE.pack(
+            float(state["base_capital"]),
+            float(state["cash_usd"]),
+            float(state["btc_amount"]),
+            float(state["eth_amount"]),
+            _opt(state.get("avg_entry_btc")),
+            _opt(state.get("avg_entry_eth")),
+        ),
+    ]
+
+    buckets = state.get("buckets") or {}
+    parts.append(_COUNT.pack(len(buckets)))
+    for lvl, b in buckets.items():
+        parts.append(
+            _BUCKET.pack(int(lvl), b["invested_usd"], b["btc_amount"], b["eth_amount"])
+        )
+
+    sell_used = state.get("sell_used") or {}
+    parts.append(_COUNT.pack(len(sell_used)))
+    for lvl, used in sell_used.items():
+        parts.append(_SELL.pack(int(lvl), bool(used)))
+
+    pnl = state.get("pnl")
+    parts.append(_FLAG.pack(pnl is not None))
+    if pnl is not None:
+        parts.append(_COUNT.pack(len(pnl["assets"])))
+        for name, a in pnl["assets"].items():
+            raw = name.encode("ascii")
+            parts.append(_NAME_LEN.pack(len(raw)) + raw)
+            parts.append(_ASSET.pack(a["realized_usd"], a["cost_basis_usd"]))
+        for kind, rollup in _ROLLUPS.items():
+            rollups = pnl[kind]
+            parts.append(_COUNT_LONG.pack(len(rollups)))
+            parts.extend(
+                rollup.pack(
+                    key.encode("ascii"),
+                    r["trades"], r["buys"], r["sells"],
+                    r["buy_usd"], r["sell_usd"], r["pnl_usd"],
+                )
+                for key, r in rollups.items()
+            )
+
+    extra = {k: v for k, v in state.items() if k not in _SCHEMA_KEYS}
+    raw = json.dumps(extra, ensure_ascii=False).encode("utf-8") if extra else b""
+    parts.append(_COUNT_LONG.pack(len(raw)) + raw)
+    return b"".join(parts)
+
+
+def _decode_v1(data, pos: int):
+    base, cash, btc, eth, avg_btc, avg_eth = _CORE.unpack_from(data, pos)
+    pos += _CORE.size
+    state = {
+        "base_capital": base,
+        "cash_usd": cash,
+        "btc_amount": btc,
+        "eth_amount": eth,
+        "avg_entry_btc": _opt_back(avg_btc),
+        "avg_entry_eth": _opt_back(avg_eth),
+    }
+
+    (n,) = _COUNT.unpack_from(data, pos)
+    pos += _COUNT.size
+    end = pos + n * _BUCKET.size
+    state["buckets"] = {
+        str(lvl): {"invested_usd": inv, "btc_amount": b, "eth_amount": e}
+        for lvl, inv, b, e in _BUCKET.iter_unpack(data[pos:end])
+    }
+    pos = end
+
+    (n,) = _COUNT.unpack_from(data, pos)
+    pos += _COUNT.size
+    end = pos + n * _SELL.size
+    state["sell_used"] = {str(lvl): used for lvl, used in _SELL.iter_unpack(data[pos:end])}
+    pos = end
+
+    (has_pnl,) = _FLAG.unpack_from(data, pos)
+    pos += _FLAG.size
+    if has_pnl:
+        pnl = {"assets": {}}
+        (n,) = _COUNT.unpack_from(data, pos)
+        pos += _COUNT.size
+        for _ in range(n):
+            (size,) = _NAME_LEN.unpack_from(data, pos)
+            pos += _NAME_LEN.size
+            name = bytes(data[pos:pos + size]).decode("ascii")
+            pos += size
+            realized, cost = _ASSET.unpack_from(data, pos)
+            pos += _ASSET.size
+            pnl["assets"][name] = {"realized_usd": realized, "cost_basis_usd": cost}
+        for kind, rollup in _ROLLUPS.items():
+            (n,) = _COUNT_LONG.unpack_from(data, pos)
+            pos += _COUNT_LONG.size
+            end = pos + n * rollup.size
+            pnl[kind] = {
+                k.decode("ascii"): {
+                    "trades": t,
+                    "buys": b,
+                    "sells": sl,
+                    "buy_usd": bu,
+                    "sell_usd": su,
+                    "pnl_usd": p,
+                }
+                for k, t, b, sl, bu, su, p in rollup.iter_unpack(data[pos:end])
+            }
+            pos = end
+        state["pnl"] = pnl
+
+    (size,) = _COUNT_LONG.unpack_from(data, pos)
+    pos += _COUNT_LONG.size
+    if size:
+        state.update(json.loads(bytes(data[pos:pos + size]).decode("utf-8")))
+    return state
+
+
+# версия файла -> декодер этой версии
+_DECODERS = {1: _decode_v1}
+# MIGRATIONS[v]: dict в схеме версии v -> dict в схеме v + 1
+MIGRATIONS = {}
+
+
+def decode(data) -> dict:
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Не файл состояния FNG Secretary")
+    if version not in _DECODERS:
+        raise ValueError(f"Неизвестная версия файла состояния: {version} (поддерживается ≤ {VERSION})")
+    state = _DECODERS[version](memoryview(data), _HEADER.size)
+    for v in range(version, VERSION):
+        state = MIGRATIONS[v](state)
+    return state
+
+
+def upgrade(state, ladder):
+    """
+    Дополнить состояние из старого JSON до текущей схемы. Для состояний,
+    прочитанных из .bin, ничего не делает: декодер всегда отдаёт полную схему.
+    """
+    if "buckets" not in state:
+        state["buckets"] = {
+            str(lvl): {
+                "invested_usd": 0.0,
+                "btc_amount": 0.0,
+                "eth_amount": 0.0,
+            }
+            for lvl in ladder.buy_levels
+        }
+    if "sell_used" not in state:
+        state["sell_used"] = {str(lvl): False for lvl in ladder.sell_levels}
+    return state
+
+
+def export_json(bin_path: str) -> str:
+    """Состояние из .bin в читаемом JSON (тот же вид, что secretary_state.json)."""
+    with open(bin_path, "rb") as f:
+        state = decode(f.read())
+    return json.dumps(state, ensure_ascii=False, indent=2)
+
+
+def convert():
+    """Перевести все портфели из portfolios.json с JSON на .bin."""
+    import bot
+    import sqlite_store
+    from persistence import atomic_write_bytes, state_bin_path
+    from portfolios import load_portfolios
+
+    if sqlite_store.is_enabled():
+        print("Состояния хранятся в базе sqlite_store — переводить нечего.")
+        return
+    for portfolio in load_portfolios():
+        path = portfolio.state_file
+        if not os.path.exists(path):
+            print(f"[{portfolio.name}] нет {path}, пропускаем")
+            continue
+        state = bot.load_portfolio_state(portfolio)
+        atomic_write_bytes(state_bin_path(path), encode(state))
+        os.remove(path)
+        print(f"[{portfolio.name}] {path} -> {state_bin_path(path)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Двоичный формат состояния FNG Secretary")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("convert", help="перевести состояния портфелей в .bin")
+    p_export = sub.add_parser("export", help="вывести .bin как JSON")
+    p_export.add_argument("path")
+    p_export.add_argument("--out", help="записать в файл вместо stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        convert()
+        return
+    text = export_json(args.path)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
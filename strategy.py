@@ -0,0 +1,462 @@
+"""
+Чистая логика лестницы F&G: без сети, диска и глобального состояния.
+
+step(state, fng, btc_price, eth_price) -> (new_state, trades) используют
+живой бот, бэктест и перебор параметров.
+"""
+
+import math
+from dataclasses import dataclass, field
+
+# ---- ПАРАМЕТРЫ СТРАТЕГИИ ----
+
+BASE_CAPITAL = 10_000.0  # базовый виртуальный депозит
+
+# Целевые суммы покупок по уровням F&G (кратно 50$, суммарно 10 000 $)
+BUY_TARGETS = {
+    40: 1100.0,
+    35: 1500.0,
+    30: 1850.0,
+    25: 1850.0,
+    20: 1850.0,
+    15: 1850.0,
+}
+
+# Порядок уровней для покупок и продаж
+BUY_LEVELS = [40, 35, 30, 25, 20, 15]
+SELL_LEVELS = [60, 65, 70, 75]
+
+# Доли продажи от целевого пакета на каждый уровень (суммарно 100%)
+SELL_FRACS = {
+    60: 0.25,
+    65: 0.25,
+    70: 0.25,
+    75: 0.25,
+}
+
+# Доля BTC в каждой покупке (остальное — ETH)
+BTC_SHARE = 0.5
+
+
+def round_down_50(x: float) -> float:
+    """Округление вниз до ближайших 50$."""
+    if x <= 0:
+        return 0.0
+    return math.floor(x / 50.0) * 50.0
+
+
+@dataclass(frozen=True, slots=True)
+class Ladder:
+    """Параметры лестницы; списки выровнены по индексам уровней."""
+
+    buy_levels: tuple
+    buy_targets: tuple
+    sell_levels: tuple
+    sell_fracs: tuple
+    btc_share: float
+    # sell_plan[i][j] — сколько $ продать из пакета j на уровне продажи i
+    sell_plan: tuple
+
+    @classmethod
+    def build(cls, buy_targets: dict, sell_fracs: dict, btc_share: float = BTC_SHARE,
+              buy_levels=None, sell_levels=None):
+        buy_levels = tuple(buy_levels if buy_levels is not None else buy_targets)
+        sell_levels = tuple(sell_levels if sell_levels is not None else sell_fracs)
+        targets = tuple(float(buy_targets[lvl]) for lvl in buy_levels)
+        fracs = tuple(float(sell_fracs[lvl]) for lvl in sell_levels)
+        sell_plan = tuple(
+            tuple(round_down_50(target * frac) for target in targets) for frac in fracs
+        )
+        return cls(buy_levels, targets, sell_levels, fracs, float(btc_share), sell_plan)
+
+
+DEFAULT_LADDER = Ladder.build(
+    BUY_TARGETS, SELL_FRACS, BTC_SHARE, buy_levels=BUY_LEVELS, sell_levels=SELL_LEVELS
+)
+
+
+@dataclass(slots=True)
+class PortfolioState:
+    """Состояние портфеля; пакеты и флаги продаж — списки по индексам уровней."""
+
+    base_capital: float
+    cash: float
+    btc: float
+    eth: float
+    avg_btc: float | None
+    avg_eth: float | None
+    invested: list
+    bucket_btc: list
+    bucket_eth: list
+    sell_used: list
+    # кэш next_triggers: (ladder, buy_at, sell_at); в сравнение не входит
+    triggers: tuple | None = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def new(cls, base_capital: float = BASE_CAPITAL, ladder: Ladder = DEFAULT_LADDER):
+        n = len(ladder.buy_levels)
+        return cls(
+            base_capital,
+            base_capital,
+            0.0,
+            0.0,
+            None,
+            None,
+            [0.0] * n,
+            [0.0] * n,
+            [0.0] * n,
+            [False] * len(ladder.sell_levels),
+        )
+
+    def copy(self):
+        return PortfolioState(
+            self.base_capital,
+            self.cash,
+            self.btc,
+            self.eth,
+            self.avg_btc,
+            self.avg_eth,
+            self.invested[:],
+            self.bucket_btc[:],
+            self.bucket_eth[:],
+            self.sell_used[:],
+        )
+
+    @classmethod
+    def from_dict(cls, d: dict, ladder: Ladder = DEFAULT_LADDER):
+        """Из формата secretary_state.json (buckets/sell_used с ключами-строками)."""
+        base = float(d.get("base_capital", BASE_CAPITAL))
+        buckets = d.get("buckets") or {}
+        sell_used = d.get("sell_used") or {}
+        empty = {"invested_usd": 0.0, "btc_amount": 0.0, "eth_amount": 0.0}
+        rows = [buckets.get(str(lvl), empty) for lvl in ladder.buy_levels]
+        return cls(
+            base,
+            float(d.get("cash_usd", base)),
+            float(d.get("btc_amount", 0.0)),
+            float(d.get("eth_amount", 0.0)),
+            d.get("avg_entry_btc"),
+            d.get("avg_entry_eth"),
+            [float(b["invested_usd"]) for b in rows],
+            [float(b["btc_amount"]) for b in rows],
+            [float(b["eth_amount"]) for b in rows],
+            [bool(sell_used.get(str(lvl), False)) for lvl in ladder.sell_levels],
+        )
+
+    def to_dict(self, ladder: Ladder = DEFAULT_LADDER) -> dict:
+        return {
+            "base_capital": self.base_capital,
+            "cash_usd": self.cash,
+            "btc_amount": self.btc,
+            "eth_amount": self.eth,
+            "avg_entry_btc": self.avg_btc,
+            "avg_entry_eth": self.avg_eth,
+            "buckets": {
+                str(lvl): {
+                    "invested_usd": self.invested[i],
+                    "btc_amount": self.bucket_btc[i],
+                    "eth_amount": self.bucket_eth[i],
+                }
+                for i, lvl in enumerate(ladder.buy_levels)
+            },
+            "sell_used": {
+                str(lvl): self.sell_used[i] for i, lvl in enumerate(ladder.sell_levels)
+            },
+        }
+
+    def total_value(self, btc_price: float, eth_price: float) -> float:
+        return self.cash + self.btc * btc_price + self.eth * eth_price
+
+
+@dataclass(frozen=True, slots=True)
+class Trade:
+    asset: str
+    action: str
+    level: int
+    fng: int
+    price: float
+    usd_amount: float
+    asset_delta: float
+    cash_after: float
+    asset_after: float
+    avg_entry_price: float | None
+
+
+def _is_fresh(state: PortfolioState) -> bool:
+    """Позиции нет и состояние уже сброшено — сброс цикла ничего не меняет."""
+    return (
+        state.cash == state.base_capital
+        and state.btc == 0.0
+        and state.eth == 0.0
+        and state.avg_btc is None
+        and state.avg_eth is None
+        and not any(state.sell_used)
+        and not any(state.invested)
+        and not any(state.bucket_btc)
+        and not any(state.bucket_eth)
+    )
+
+
+def next_triggers(state: PortfolioState, ladder: Ladder = DEFAULT_LADDER):
+    """
+    Ближайшие пороги (buy_at, sell_at): тик может что-то поменять, только
+    если fng <= buy_at (верхний незаполненный уровень покупки, на который
+    хватает кэша) или fng >= sell_at (нижний неиспользованный уровень
+    продажи при открытой позиции). None — такого порога нет.
+    Меняются только вместе с состоянием, поэтому между сделками их можно
+    не пересчитывать.
+    """
+    invested = state.invested
+    cash = state.cash
+    if state.btc <= 0.0 and state.eth <= 0.0 and sum(invested) <= 0.0:
+        if not _is_fresh(state):
+            # незавершённый сброс цикла сработает при любом F&G
+            return 100, 0
+        cash = state.base_capital
+
+    buy_at = None
+    if cash >= 50.0:
+        for lvl, target, inv in zip(ladder.buy_levels, ladder.buy_targets, invested):
+            if inv < target and (buy_at is None or lvl > buy_at):
+                buy_at = lvl
+
+    sell_at = None
+    if any(inv > 0 for inv in invested):
+        for lvl, used in zip(ladder.sell_levels, state.sell_used):
+            if not used and (sell_at is None or lvl < sell_at):
+                sell_at = lvl
+    return buy_at, sell_at
+
+
+def is_quiet(fng: int, buy_at, sell_at) -> bool:
+    """F&G строго между порогами next_triggers — тик ничего не меняет."""
+    return (buy_at is None or fng > buy_at) and (sell_at is None or fng < sell_at)
+
+
+def _triggers(state: PortfolioState, ladder: Ladder):
+    cached = state.triggers
+    if cached is None or cached[0] is not ladder:
+        cached = state.triggers = (ladder, *next_triggers(state, ladder))
+    return cached
+
+
+def may_act(state: PortfolioState, fng: int, ladder: Ladder = DEFAULT_LADDER) -> bool:
+    """
+    Быстрая проверка без изменений: может ли тик что-то поменять.
+    False гарантирует, что step вернёт то же состояние и ни одной сделки.
+    Пороги кэшируются в state, так что на тихом тике это O(1).
+    """
+    _, buy_at, sell_at = _triggers(state, ladder)
+    return not is_quiet(fng, buy_at, sell_at)
+
+
+def ladder_zone(fng: int, ladder: Ladder = DEFAULT_LADDER):
+    """
+    Зона F&G относительно порогов лестницы: (сколько уровней покупки
+    достигнуто, сколько уровней продажи достигнуто). Внутри одной зоны
+    step при неизменном состоянии сделок не добавляет.
+    """
+    return (
+        sum(1 for lvl in ladder.buy_levels if fng <= lvl),
+        sum(1 for lvl in ladder.sell_levels if fng >= lvl),
+    )
+
+
+def _reset_cycle(s: PortfolioState):
+    n = len(s.invested)
+    s.invested = [0.0] * n
+    s.bucket_btc = [0.0] * n
+    s.bucket_eth = [0.0] * n
+    s.sell_used = [False] * len(s.sell_used)
+    s.avg_btc = None
+    s.avg_eth = None
+
+
+def _apply(s: PortfolioState, fng: int, btc_price: float, eth_price: float,
+           ladder: Ladder) -> list:
+    """Один проход продаж и покупок; меняет s на месте."""
+    trades = []
+    cash = s.cash
+    btc = s.btc
+    eth = s.eth
+    avg_btc = s.avg_btc
+    avg_eth = s.avg_eth
+    base = s.base_capital
+
+    # --- если полностью вышли из позиции — считаем, что цикл обнулился ---
+    if sum(s.invested) <= 0.0 and btc <= 0.0 and eth <= 0.0:
+        _reset_cycle(s)
+        avg_btc = None
+        avg_eth = None
+
+    invested = s.invested
+    bucket_btc = s.bucket_btc
+    bucket_eth = s.bucket_eth
+    sell_used = s.sell_used
+    n_buckets = len(invested)
+
+    # ---------- ПРОДАЖИ ----------
+
+    for si, lvl in enumerate(ladder.sell_levels):
+        if sell_used[si] or fng < lvl:
+            continue
+
+        plan = ladder.sell_plan[si]
+        total_sell_btc = 0.0
+        total_sell_eth = 0.0
+        total_sell_usd_btc = 0.0
+        total_sell_usd_eth = 0.0
+
+        for bi in range(n_buckets):
+            inv = invested[bi]
+            if inv <= 0:
+                continue
+
+            sell_usd = min(inv, plan[bi])
+            if sell_usd <= 0:
+                continue
+
+            b_btc = bucket_btc[bi]
+            b_eth = bucket_eth[bi]
+            btc_value = b_btc * btc_price
+            eth_value = b_eth * eth_price
+            bucket_value = btc_value + eth_value
+            if bucket_value <= 0:
+                continue
+
+            sell_btc_usd = sell_usd * (btc_value / bucket_value)
+            sell_eth_usd = sell_usd * (eth_value / bucket_value)
+
+            sell_btc_amt = min(sell_btc_usd / btc_price, b_btc, btc)
+            sell_eth_amt = min(sell_eth_usd / eth_price, b_eth, eth)
+
+            btc -= sell_btc_amt
+            eth -= sell_eth_amt
+            bucket_btc[bi] = b_btc - sell_btc_amt
+            bucket_eth[bi] = b_eth - sell_eth_amt
+            invested[bi] = inv - sell_usd
+            cash += sell_usd
+
+            total_sell_btc += sell_btc_amt
+            total_sell_eth += sell_eth_amt
+            total_sell_usd_btc += sell_btc_usd
+            total_sell_usd_eth += sell_eth_usd
+
+        if total_sell_btc > 0 or total_sell_eth > 0:
+            sell_used[si] = True
+            if total_sell_btc > 0:
+                trades.append(
+                    Trade("BTC", "SELL", lvl, fng, btc_price, total_sell_usd_btc,
+                          -total_sell_btc, cash, btc, avg_btc)
+                )
+            if total_sell_eth > 0:
+                trades.append(
+                    Trade("ETH", "SELL", lvl, fng, eth_price, total_sell_usd_eth,
+                          -total_sell_eth, cash, eth, avg_eth)
+                )
+
+    if sum(invested) <= 0 and btc <= 0 and eth <= 0:
+        cash = base
+        _reset_cycle(s)
+        invested = s.invested
+        bucket_btc = s.bucket_btc
+        bucket_eth = s.bucket_eth
+        btc = 0.0
+        eth = 0.0
+        avg_btc = None
+        avg_eth = None
+
+    # ---------- ПОКУПКИ ----------
+
+    btc_share = ladder.btc_share
+    for bi, lvl in enumerate(ladder.buy_levels):
+        if fng > lvl:
+            continue
+
+        need_usd = ladder.buy_targets[bi] - invested[bi]
+        if need_usd <= 0:
+            continue
+
+        buy_usd = round_down_50(min(need_usd, cash))
+        if buy_usd <= 0:
+            continue
+
+        usd_btc = buy_usd * btc_share
+        usd_eth = buy_usd - usd_btc
+        buy_btc_amount = usd_btc / btc_price
+        buy_eth_amount = usd_eth / eth_price
+
+        if buy_btc_amount > 0:
+            if btc <= 0:
+                avg_btc = btc_price
+            else:
+                avg_btc = (avg_btc * btc + usd_btc) / (btc + buy_btc_amount)
+
+        if buy_eth_amount > 0:
+            if eth <= 0:
+                avg_eth = eth_price
+            else:
+                avg_eth = (avg_eth * eth + usd_eth) / (eth + buy_eth_amount)
+
+        btc += buy_btc_amount
+        eth += buy_eth_amount
+        bucket_btc[bi] += buy_btc_amount
+        bucket_eth[bi] += buy_eth_amount
+        invested[bi] += buy_usd
+        cash -= buy_usd
+
+        if buy_btc_amount > 0:
+            trades.append(
+                Trade("BTC", "BUY", lvl, fng, btc_price, usd_btc, buy_btc_amount,
+                      cash, btc, avg_btc)
+            )
+        if buy_eth_amount > 0:
+            trades.append(
+                Trade("ETH", "BUY", lvl, fng, eth_price, usd_eth, buy_eth_amount,
+                      cash, eth, avg_eth)
+            )
+
+    s.cash = cash
+    s.btc = btc
+    s.eth = eth
+    s.avg_btc = avg_btc
+    s.avg_eth = avg_eth
+    return trades
+
+
+def step(state: PortfolioState, fng: int, btc_price: float, eth_price: float,
+         ladder: Ladder = DEFAULT_LADDER):
+    """
+    Один тик стратегии. Исходное состояние не меняется.
+    Если may_act ложно — возвращается тот же объект state и пустой кортеж,
+    иначе новая копия состояния и кортеж сделок в порядке исполнения.
+    Копия возвращается и без сделок: сброс цикла после полного выхода
+    меняет состояние, не совершая сделок.
+    """
+    if not may_act(state, fng, ladder):
+        return state, ()
+    new_state = state.copy()
+    trades = _apply(new_state, fng, btc_price, eth_price, ladder)
+    # пороги меняются только здесь — сразу считаем их для нового состояния
+    _triggers(new_state, ladder)
+    return new_state, tuple(trades)
+
+
+def signals_from_trades(trades):
+    """
+    Сработавшие уровни для сообщений: [(action, level, usd_btc, usd_eth), ...]
+    в порядке исполнения.
+    """
+    signals = []
+    index = {}
+    for t in trades:
+        key = (t.action, t.level)
+        if key not in index:
+            index[key] = len(signals)
+            signals.append([t.action, t.level, 0.0, 0.0])
+        sig = signals[index[key]]
+        if t.asset == "BTC":
+            sig[2] += t.usd_amount
+        else:
+            sig[3] += t.usd_amount
+    return [tuple(sig) for sig in signals]
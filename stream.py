@@ -0,0 +1,266 @@
+"""
+Потоковый режим: бот реагирует на рыночные события сразу, а не раз в 4 часа.
+
+Источник событий — любой итерируемый объект, отдающий MarketEvent
+(ts, fng, btc_price, eth_price; None — значение не изменилось):
+  • ReplaySource  — файл истории в формате backtest.py, для проверки и тестов;
+  • SocketSource  — TCP-поток, по строке JSON на событие:
+                    {"ts": "...", "fng": 58, "btc": 87500.1, "eth": 2950.3}
+
+Лестница пересчитывается только когда F&G переходит в другую зону
+(strategy.ladder_zone): пороги лестницы заданы только по F&G, цены влияют
+лишь на объёмы. Цены берутся последние на момент пересчёта. Дальше всё как
+в обычном тике: bot.process_portfolio со step, пакетами и sell_used.
+
+Проигрывание истории работает только с отдельным каталогом --state-dir:
+состояние и журнал каждого портфеля заводятся там заново, рабочие
+secretary_state.json и trades.csv не трогаются (с базой sqlite_store
+проигрывание не запускается). Сделки получают время события, а не текущее.
+
+Запуск:
+    python stream.py replay history.csv --state-dir replay_out [--speed 60] [--no-telegram]
+    python stream.py socket 127.0.0.1:9000
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import socket
+import argparse
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import bot
+import metrics
+import sqlite_store
+import telegram_queue
+from core import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from portfolios import load_portfolios
+from strategy import ladder_zone
+
+
+class MarketEvent(NamedTuple):
+    ts: datetime
+    fng: int | None
+    btc_price: float | None
+    eth_price: float | None
+
+
+def _float_or_none(value):
+    return float(value) if value not in (None, "") else None
+
+
+class ReplaySource:
+    """
+    История timestamp_utc;fng;btc_price;eth_price.
+    speed=0 — как можно быстрее, иначе во столько раз быстрее реального времени.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        prev_ts = None
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                ts = datetime.fromisoformat(row["timestamp_utc"])
+                if self.speed > 0 and prev_ts is not None:
+                    time.sleep(max(0.0, (ts - prev_ts).total_seconds() / self.speed))
+                prev_ts = ts
+                fng = row.get("fng")
+                yield MarketEvent(
+                    ts,
+                    int(fng) if fng else None,
+                    _float_or_none(row.get("btc_price")),
+                    _float_or_none(row.get("eth_price")),
+                )
+
+
+class SocketSource:
+    """TCP-клиент: строки JSON {"ts", "fng", "btc", "eth"}, любые поля необязательны."""
+
+    def __init__(self, host: str, port: int, timeout: float | None = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def __iter__(self):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            with sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        msg = json.loads(line)
+                    except ValueError:
+                        print("Поток: пропущена строка не в JSON:", line[:80])
+                        continue
+                    ts = msg.get("ts")
+                    yield MarketEvent(
+                        datetime.fromisoformat(ts) if ts else datetime.now(timezone.utc),
+                        int(msg["fng"]) if msg.get("fng") is not None else None,
+                        _float_or_none(msg.get("btc")),
+                        _float_or_none(msg.get("eth")),
+                    )
+
+
+class Streamer:
+    def __init__(self, portfolios=None, send: bool = True):
+        self.portfolios = portfolios if portfolios is not None else load_portfolios()
+        self.send = send
+        # имя портфеля -> dict состояния и зона F&G последнего пересчёта
+        self.states = {}
+        self.zones = {}
+        self.fng = None
+        self.btc_price = None
+        self.eth_price = None
+        self.evaluations = 0
+
+    def on_event(self, event: MarketEvent):
+        if event.fng is not None:
+            self.fng = event.fng
+        if event.btc_price is not None:
+            self.btc_price = event.btc_price
+        if event.eth_price is not None:
+            self.eth_price = event.eth_price
+        if self.fng is None or self.btc_price is None or self.eth_price is None:
+            return
+
+        snapshot = None
+        show_names = len(self.portfolios) > 1
+        for portfolio in self.portfolios:
+            zone = ladder_zone(self.fng, portfolio.ladder)
+            if self.zones.get(portfolio.name) == zone:
+                continue
+            if snapshot is None:
+                snapshot = bot.MarketSnapshot(
+                    self.fng, event.ts, self.btc_price, self.eth_price
+                )
+            # после сбоя зону не запоминаем: следующее событие повторит пересчёт
+            if self.evaluate(portfolio, snapshot, show_names, event.ts):
+                self.zones[portfolio.name] = zone
+
+    @metrics.run("stream_eval")
+    def evaluate(self, portfolio, snapshot, show_names: bool, ts: datetime) -> bool:
+        """Пересчитать портфель; False — тик не удался и его надо повторить."""
+        self.evaluations += 1
+        state = self.states.get(portfolio.name)
+        if state is None:
+            state = self.states[portfolio.name] = bot.load_portfolio_state(portfolio)
+        try:
+            text = bot.process_portfolio(portfolio, state, snapshot, show_names, ts)
+        except Exception as e:
+            # состояние в памяти могло разойтись с диском — перечитаем
+            self.states.pop(portfolio.name, None)
+            self.zones.pop(portfolio.name, None)
+            print(f"[{portfolio.name}] Ошибка обработки портфеля:", e)
+            return False
+
+        if text is None:
+            return True
+        if not self.send:
+            print(text)
+            return True
+        telegram_queue.enqueue(text, portfolio.chat_id)
+        telegram_queue.flush(wait=False)
+        return True
+
+    def run(self, source):
+        events = 0
+        for event in source:
+            events += 1
+            self.on_event(event)
+        if self.send:
+            telegram_queue.flush()
+        return events
+
+
+def scratch_portfolios(state_dir: str, portfolios=None):
+    """
+    Портфели с состоянием и журналом в state_dir/<имя>/ для проигрывания истории.
+    Если какой-то путь совпал с рабочими файлами портфелей — ValueError.
+    """
+    portfolios = portfolios if portfolios is not None else load_portfolios()
+    live = set()
+    for portfolio in portfolios:
+        live.add(os.path.abspath(portfolio.state_file))
+        live.add(os.path.abspath(portfolio.trades_file))
+
+    result = []
+    for portfolio in portfolios:
+        folder = os.path.join(state_dir, portfolio.name)
+        scratch = replace(
+            portfolio,
+            state_file=os.path.join(folder, "state.json"),
+            trades_file=os.path.join(folder, "trades.csv"),
+        )
+        paths = {os.path.abspath(scratch.state_file), os.path.abspath(scratch.trades_file)}
+        if paths & live:
+            raise ValueError(
+                f"Каталог {state_dir} пересекается с рабочими файлами портфеля {portfolio.name}"
+            )
+        result.append(scratch)
+    return result
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--no-telegram", action="store_true",
+                        help="печатать сообщения вместо отправки")
+    parser = argparse.ArgumentParser(description="FNG Secretary: потоковый режим")
+    sub = parser.add_subparsers(dest="source", required=True)
+    p_replay = sub.add_parser("replay", parents=[common], help="проиграть файл истории")
+    p_replay.add_argument("path")
+    p_replay.add_argument("--state-dir", required=True,
+                          help="отдельный каталог для состояния и журнала проигрывания")
+    p_replay.add_argument("--speed", type=float, default=0.0,
+                          help="ускорение относительно реального времени (0 — без пауз)")
+    p_socket = sub.add_parser("socket", parents=[common], help="читать события из TCP host:port")
+    p_socket.add_argument("address")
+    args = parser.parse_args(argv)
+
+    send = not args.no_telegram
+    if send and not (TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
+        print("Не заданы переменные окружения: TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID")
+        return
+
+    if args.source == "replay":
+        if sqlite_store.is_enabled():
+            # база общая на все пути состояния: проигрывание писало бы в неё
+            print(
+                f"Состояние хранится в {sqlite_store.DB_FILE}: для проигрывания "
+                "запустите с пустым SECRETARY_DB= (файловый режим)"
+            )
+            return
+        try:
+            portfolios = scratch_portfolios(args.state_dir)
+        except ValueError as e:
+            print(e)
+            return
+        source = ReplaySource(args.path, args.speed)
+    else:
+        portfolios = None
+        host, port = args.address.rsplit(":", 1)
+        source = SocketSource(host, int(port))
+
+    streamer = Streamer(portfolios, send=send)
+    t0 = time.perf_counter()
+    try:
+        events = streamer.run(source)
+    except KeyboardInterrupt:
+        print("Поток остановлен.")
+        return
+    print(
+        f"Событий: {events}, пересчётов лестницы: {streamer.evaluations}, "
+        f"время: {time.perf_counter() - t0:.2f} с",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
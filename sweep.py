@@ -0,0 +1,214 @@
+"""
+Перебор альтернативных лестниц на исторических данных.
+
+История загружается один раз в разделяемую память (multiprocessing.shared_memory),
+воркеры ProcessPoolExecutor читают её без копирования.
+
+Запуск:
+    python sweep.py history.csv --top 20 --out sweep.csv
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import backtest
+from core import fmt_usd
+from strategy import (
+    BASE_CAPITAL,
+    BUY_LEVELS,
+    BUY_TARGETS,
+    Ladder,
+    PortfolioState,
+    round_down_50,
+    step,
+)
+
+# Профили распределения капитала по уровням покупок (от верхнего к нижнему)
+TARGET_PROFILES = {
+    "current": [BUY_TARGETS[lvl] for lvl in BUY_LEVELS],
+    "flat": [1.0] * len(BUY_LEVELS),
+    "back": [1.0 + i for i in range(len(BUY_LEVELS))],
+}
+
+# Профили долей продажи по уровням жадности (сумма = 1)
+SELL_PROFILES = {
+    "even": [0.25, 0.25, 0.25, 0.25],
+    "front": [0.4, 0.3, 0.2, 0.1],
+    "back": [0.1, 0.2, 0.3, 0.4],
+}
+
+BUY_SHIFTS = [-10, -5, 0, 5, 10]
+BUY_STEPS = [3, 5, 7]
+SELL_STARTS = [55, 60, 65, 70]
+SELL_STEPS = [3, 5, 7]
+BTC_SHARES = [0.3, 0.4, 0.5, 0.6, 0.7]
+
+# Разделяемые массивы истории в воркере: (fng, btc, eth)
+_history = None
+_shm_blocks = []
+
+
+def make_ladder(buy_shift, buy_step, target_profile, sell_start, sell_step, sell_profile,
+                btc_share, base_capital=BASE_CAPITAL):
+    top = BUY_LEVELS[0] + buy_shift
+    buy_levels = [top - i * buy_step for i in range(len(BUY_LEVELS))]
+    weights = TARGET_PROFILES[target_profile]
+    total_w = sum(weights)
+    buy_targets = {
+        lvl: round_down_50(base_capital * w / total_w)
+        for lvl, w in zip(buy_levels, weights)
+    }
+    fracs = SELL_PROFILES[sell_profile]
+    sell_levels = [sell_start + i * sell_step for i in range(len(fracs))]
+    return Ladder.build(
+        buy_targets,
+        dict(zip(sell_levels, fracs)),
+        btc_share,
+        buy_levels=buy_levels,
+        sell_levels=sell_levels,
+    )
+
+
+def iter_configs():
+    yield from itertools.product(
+        BUY_SHIFTS,
+        BUY_STEPS,
+        list(TARGET_PROFILES),
+        SELL_STARTS,
+        SELL_STEPS,
+        list(SELL_PROFILES),
+        BTC_SHARES,
+    )
+
+
+def evaluate(fng, btc, eth, ladder, base_capital=BASE_CAPITAL):
+    """Прогон одной лестницы без журнала: PnL, макс. просадка и оборот."""
+    state = PortfolioState.new(base_capital, ladder)
+    traded_usd = 0.0
+    n_trades = 0
+    peak = 0.0
+    max_dd = 0.0
+    value = base_capital
+
+    for i in range(len(fng)):
+        btc_price = btc[i]
+        eth_price = eth[i]
+        state, trades = step(state, fng[i], btc_price, eth_price, ladder)
+        if trades:
+            n_trades += len(trades)
+            for t in trades:
+                traded_usd += t.usd_amount
+
+        value = state.cash + state.btc * btc_price + state.eth * eth_price
+        if value > peak:
+            peak = value
+        elif peak > 0:
+            dd = 1.0 - value / peak
+            if dd > max_dd:
+                max_dd = dd
+
+    return {
+        "pnl_usd": value - base_capital,
+        "pnl_pct": (value / base_capital - 1.0) * 100 if base_capital > 0 else 0.0,
+        "max_drawdown_pct": max_dd * 100,
+        "turnover": traded_usd / base_capital if base_capital > 0 else 0.0,
+        "trades": n_trades,
+    }
+
+
+def _share(arr):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(arr) * arr.itemsize))
+    shm.buf[: len(arr) * arr.itemsize] = arr.tobytes()
+    return shm, (shm.name, arr.typecode, len(arr))
+
+
+def _attach(spec):
+    name, typecode, n = spec
+    shm = shared_memory.SharedMemory(name=name)
+    _shm_blocks.append(shm)
+    return shm.buf.cast(typecode)[:n]
+
+
+def _init_worker(specs):
+    global _history
+    _history = tuple(_attach(spec) for spec in specs)
+
+
+def _run_config(config):
+    fng, btc, eth = _history
+    return config, evaluate(fng, btc, eth, make_ladder(*config))
+
+
+def run_sweep(fng, btc, eth, configs, workers=None):
+    """Все конфигурации на всех ядрах; история передаётся через разделяемую память."""
+    blocks = []
+    specs = []
+    for arr in (fng, btc, eth):
+        shm, spec = _share(arr)
+        blocks.append(shm)
+        specs.append(spec)
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(specs,)
+        ) as pool:
+            return list(pool.map(_run_config, configs, chunksize=64))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+CONFIG_FIELDS = [
+    "buy_shift",
+    "buy_step",
+    "target_profile",
+    "sell_start",
+    "sell_step",
+    "sell_profile",
+    "btc_share",
+]
+RESULT_FIELDS = ["pnl_usd", "pnl_pct", "max_drawdown_pct", "turnover", "trades"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор параметров лестницы F&G")
+    parser.add_argument("history", help="CSV: timestamp_utc;fng;btc_price;eth_price")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="куда записать полную таблицу результатов")
+    args = parser.parse_args(argv)
+
+    _, fng, btc, eth = backtest.load_history(args.history)
+    configs = list(iter_configs())
+
+    t0 = time.perf_counter()
+    results = run_sweep(fng, btc, eth, configs, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    results.sort(key=lambda x: x[1]["pnl_usd"], reverse=True)
+
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(["rank"] + CONFIG_FIELDS + RESULT_FIELDS)
+            for rank, (config, res) in enumerate(results, 1):
+                writer.writerow([rank, *config] + [res[k] for k in RESULT_FIELDS])
+
+    print(f"Конфигураций: {len(configs)}, тиков: {len(fng)}, время: {elapsed:.1f} с")
+    print(f"{'#':>3} {'PnL $':>12} {'PnL %':>8} {'MaxDD %':>8} {'оборот':>7}  параметры")
+    for rank, (config, res) in enumerate(results[: args.top], 1):
+        params = " ".join(f"{k}={v}" for k, v in zip(CONFIG_FIELDS, config))
+        print(
+            f"{rank:>3} {fmt_usd(res['pnl_usd']):>12} {res['pnl_pct']:>+8.2f} "
+            f"{res['max_drawdown_pct']:>8.2f} {res['turnover']:>7.2f}  {params}"
+        )
+
+
+if __name__ == "__main__":
+    main()
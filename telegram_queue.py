@@ -0,0 +1,237 @@
+"""
+Исходящая очередь сообщений в Telegram.
+
+enqueue() только дописывает сообщение в telegram_queue.json и сразу
+возвращается; flush() отправляет накопленное:
+  • сообщения одному чату, поставленные в пределах MERGE_WINDOW секунд,
+    склеиваются в одно (если влезают в лимит длины Telegram);
+  • соблюдаются лимиты: не чаще раза в PER_CHAT_INTERVAL секунд в один чат
+    и не больше GLOBAL_PER_SECOND сообщений в секунду всего;
+  • на 429 ждём parameters.retry_after, на 5xx и сетевые ошибки —
+    экспоненциальная пауза; после MAX_ATTEMPTS сообщение выбрасывается;
+  • прочие 4xx (кривой HTML, бот заблокирован, неверный chat_id) повтором
+    не исправить — такое сообщение выбрасывается сразу.
+Неотправленное остаётся в файле до следующего flush().
+
+send_now() — синхронная отправка с теми же лимитами и повторами, когда нужен
+message_id (ссылки на отчёты).
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+
+import http_client
+import metrics
+from core import TELEGRAM_API_URL, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from persistence import atomic_write_json
+
+QUEUE_FILE = "telegram_queue.json"
+
+MAX_MESSAGE_LEN = 4096
+MERGE_WINDOW = 10.0
+PER_CHAT_INTERVAL = 1.0
+GLOBAL_PER_SECOND = 25
+MAX_ATTEMPTS = 5
+
+# _queue_lock — только на чтение/запись файла очереди, сеть под ним не трогаем
+_queue_lock = threading.Lock()
+# отправляет очередь только один flush() за раз, иначе сообщение уйдёт дважды
+_flush_lock = threading.Lock()
+_rate_lock = threading.Lock()
+_last_sent_chat = {}
+_sent_times = []
+
+
+class TelegramError(Exception):
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TelegramRejected(Exception):
+    """Telegram отклонил сообщение (4xx, кроме 429): повторять бесполезно."""
+
+
+def _load(path: str):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(queue, path: str):
+    atomic_write_json(path, queue, indent=None)
+
+
+def enqueue(text: str, chat_id: str | None = None, path: str = QUEUE_FILE):
+    """Поставить сообщение в очередь; сеть не трогаем."""
+    with _queue_lock:
+        queue = _load(path)
+        queue.append(
+            {
+                "id": uuid.uuid4().hex,
+                "chat_id": chat_id or TELEGRAM_CHAT_ID,
+                "text": text,
+                "enqueued_at": time.time(),
+                "attempts": 0,
+                "not_before": 0.0,
+            }
+        )
+        _save(queue, path)
+
+
+def _wait_for_slot(chat_id: str):
+    """Блокируемся, пока отправка в chat_id не уложится в лимиты."""
+    while True:
+        with _rate_lock:
+            now = time.monotonic()
+            while _sent_times and now - _sent_times[0] >= 1.0:
+                _sent_times.pop(0)
+            delay = 0.0
+            if len(_sent_times) >= GLOBAL_PER_SECOND:
+                delay = 1.0 - (now - _sent_times[0])
+            last = _last_sent_chat.get(chat_id)
+            if last is not None:
+                delay = max(delay, PER_CHAT_INTERVAL - (now - last))
+            if delay <= 0:
+                _sent_times.append(now)
+                _last_sent_chat[chat_id] = now
+                return
+        time.sleep(delay)
+
+
+def _post(text: str, chat_id: str):
+    with metrics.stage("telegram_wait"):
+        _wait_for_slot(chat_id)
+    url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+    payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+    # 429 разбираем сами (retry_after из тела), пул повторяет только 5xx и сеть
+    with metrics.stage("telegram_send"):
+        r = http_client.post(
+            url, json=payload, timeout=10, retry_statuses=(500, 502, 503, 504)
+        )
+    if r.status_code == 429:
+        try:
+            retry_after = float(r.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            retry_after = 5.0
+        raise TelegramError("Telegram: слишком много запросов (429)", retry_after)
+    if 400 <= r.status_code < 500:
+        raise TelegramRejected(f"Telegram отклонил сообщение ({r.status_code}): {r.text[:200]}")
+    r.raise_for_status()
+    return r.json()
+
+
+def send_now(text: str, chat_id: str | None = None, attempts: int = MAX_ATTEMPTS):
+    """
+    Синхронная отправка с повторами; возвращает ответ Telegram.
+    На 4xx (кроме 429) сразу TelegramRejected, без повторов.
+    """
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    for attempt in range(attempts):
+        try:
+            return _post(text, chat_id)
+        except TelegramError as e:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(e.retry_after)
+        except http_client.RequestException:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(2**attempt)
+
+
+def _merge(queue):
+    """Склеить сообщения одного чата, поставленные в пределах MERGE_WINDOW секунд."""
+    merged = []
+    for item in queue:
+        for prev in merged:
+            if (
+                prev["chat_id"] == item["chat_id"]
+                and prev["attempts"] == 0
+                and item["attempts"] == 0
+                and item["enqueued_at"] - prev["enqueued_at"] <= MERGE_WINDOW
+                and len(prev["text"]) + 2 + len(item["text"]) <= MAX_MESSAGE_LEN
+            ):
+                prev["text"] += "\n\n" + item["text"]
+                break
+        else:
+            merged.append(dict(item))
+    return merged
+
+
+def _update(path: str, msg_id: str, sent: bool, msg=None):
+    """Убрать отправленное сообщение или сохранить новые attempts/not_before."""
+    with _queue_lock:
+        queue = _load(path)
+        for i, item in enumerate(queue):
+            if item["id"] == msg_id:
+                if sent or msg["attempts"] >= MAX_ATTEMPTS:
+                    del queue[i]
+                else:
+                    queue[i] = msg
+                break
+        _save(queue, path)
+
+
+def flush(path: str = QUEUE_FILE, wait: bool = True) -> int:
+    """
+    Отправить всё, что можно. wait=True — дожидаться retry_after/пауз,
+    иначе отложенные сообщения остаются до следующего вызова.
+    Пока идёт отправка, enqueue() из других потоков не блокируется.
+    Одновременные flush() выстраиваются друг за другом; с wait=False, если
+    очередь уже отправляет другой поток, сразу возвращаем 0.
+    Возвращает количество отправленных сообщений.
+    """
+    if not _flush_lock.acquire(blocking=wait):
+        return 0
+    try:
+        return _flush(path, wait)
+    finally:
+        _flush_lock.release()
+
+
+def _flush(path: str, wait: bool) -> int:
+    with _queue_lock:
+        queue = _merge(_load(path))
+        _save(queue, path)
+
+    sent = 0
+    while queue:
+        now = time.time()
+        ready = [m for m in queue if m["not_before"] <= now]
+        if not ready:
+            if not wait:
+                break
+            time.sleep(min(m["not_before"] for m in queue) - now)
+            continue
+
+        msg = ready[0]
+        try:
+            _post(msg["text"], msg["chat_id"])
+            queue = [m for m in queue if m is not msg]
+            _update(path, msg["id"], sent=True)
+            sent += 1
+            continue
+        except TelegramRejected as e:
+            queue = [m for m in queue if m is not msg]
+            _update(path, msg["id"], sent=False, msg=dict(msg, attempts=MAX_ATTEMPTS))
+            print(e, "— сообщение выброшено")
+            continue
+        except TelegramError as e:
+            msg["attempts"] += 1
+            msg["not_before"] = time.time() + e.retry_after
+            print("Telegram просит подождать:", e.retry_after, "с")
+        except http_client.RequestException as e:
+            msg["attempts"] += 1
+            msg["not_before"] = time.time() + 2 ** msg["attempts"]
+            print("Ошибка отправки в Telegram:", e)
+
+        if msg["attempts"] >= MAX_ATTEMPTS:
+            queue = [m for m in queue if m is not msg]
+            print("Сообщение выброшено после", MAX_ATTEMPTS, "попыток")
+        _update(path, msg["id"], sent=False, msg=msg)
+    return sent
@@ -0,0 +1,99 @@
+"""
+Кэш ответов API: TTL, окно устаревания и счётчики.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cache  # noqa: E402
+
+
+class Fetch:
+    """fetch() для кэша: отдаёт 1, 2, 3, ... и считает вызовы."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"value": self.calls}
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "market_cache.json")
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(cache.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache._caches.pop(self.path, None)
+        cache._dirty.discard(self.path)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def get(self, fetch, **kwargs):
+        return cache.cached("fng", "latest", fetch, path=self.path, **kwargs)
+
+    def wait_refresh(self):
+        for t in list(cache.threading.enumerate()):
+            if t.name != "MainThread" and t.is_alive() and not t.daemon:
+                t.join(5)
+
+    def test_hit_within_ttl(self):
+        fetch = Fetch()
+        self.assertEqual(self.get(fetch), {"value": 1})
+        self.now += cache.TTL["fng"] - 1
+        self.assertEqual(self.get(fetch), {"value": 1})
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(cache.get_stats(self.path)["fng"]["hits"], 1)
+
+    def test_stale_returns_old_value_and_refreshes(self):
+        fetch = Fetch()
+        self.get(fetch)
+        self.now += cache.TTL["fng"] + 1
+        self.assertEqual(self.get(fetch), {"value": 1})
+        self.wait_refresh()
+        self.assertEqual(fetch.calls, 2)
+        self.assertEqual(self.get(fetch), {"value": 2})
+
+    def test_no_stale_window_fetches_now(self):
+        fetch = Fetch()
+        self.get(fetch)
+        self.now += cache.TTL["fng"] + 1
+        self.assertEqual(self.get(fetch, allow_stale=False), {"value": 2})
+        self.assertEqual(fetch.calls, 2)
+
+    def test_expired_entry_is_fetched_synchronously(self):
+        fetch = Fetch()
+        self.get(fetch)
+        self.now += cache.TTL["fng"] + cache.STALE["fng"]
+        self.assertEqual(self.get(fetch), {"value": 2})
+
+    def test_hits_are_written_on_next_store(self):
+        fetch = Fetch()
+        self.get(fetch)
+        mtime = os.stat(self.path).st_mtime_ns
+        for _ in range(3):
+            self.get(fetch)
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+        cache.cached("prices", "bitcoin", fetch, path=self.path)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["stats"]["fng"]["hits"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
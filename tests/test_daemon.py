@@ -0,0 +1,98 @@
+"""
+Долгоживущий режим: состояния портфелей живут в памяти между тиками.
+
+Сеть не нужна: снимок рынка и очередь Telegram подменяются.
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bot  # noqa: E402
+import daemon  # noqa: E402
+import metrics  # noqa: E402
+from portfolios import Portfolio  # noqa: E402
+from strategy import BASE_CAPITAL, DEFAULT_LADDER  # noqa: E402
+
+
+class DaemonTickTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        # маркеры фиксации и прочие файлы по умолчанию — во временной папке
+        cwd = os.getcwd()
+        os.chdir(self.tmp)
+        self.addCleanup(os.chdir, cwd)
+        self.portfolios = [
+            Portfolio(name, BASE_CAPITAL, name, os.path.join(name, "state.json"),
+                      os.path.join(name, "trades.csv"), DEFAULT_LADDER)
+            for name in ("main", "alt")
+        ]
+        self.fng = 50
+        self.sent = []
+        self.loads = []
+        load = bot.load_portfolio_state
+        for target, name, value in [
+            (metrics, "METRICS_FILE", ""),
+            (daemon, "load_portfolios", lambda: self.portfolios),
+            (bot, "get_market_snapshot", self.snapshot),
+            (bot, "load_portfolio_state", lambda p: self.loads.append(p.name) or load(p)),
+            (daemon.telegram_queue, "enqueue", lambda text, chat_id: self.sent.append(chat_id)),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def snapshot(self):
+        return bot.MarketSnapshot(self.fng, datetime.now(timezone.utc), 40000.0, 2500.0)
+
+    def trades(self, portfolio):
+        with open(portfolio.trades_file, encoding="utf-8") as f:
+            return len(f.readlines()) - 1
+
+    def test_states_stay_in_memory(self):
+        d = daemon.Daemon()
+        with mock.patch("builtins.print"):
+            d.tick()
+            self.assertEqual(self.sent, [])
+            self.fng = 30
+            d.tick()
+            d.tick()
+        self.assertEqual(self.loads, ["main", "alt"])
+        self.assertEqual(self.sent, ["main", "alt"])
+        # по сделке BTC и ETH на каждом уровне покупки от 40 до 30, повтор ничего не добавил
+        levels = [lvl for lvl in DEFAULT_LADDER.buy_levels if lvl >= 30]
+        for portfolio in self.portfolios:
+            self.assertEqual(self.trades(portfolio), 2 * len(levels))
+            self.assertEqual(d.states[portfolio.name], bot.load_state(
+                portfolio.state_file, portfolio.trades_file))
+
+    def test_failed_portfolio_is_reloaded(self):
+        d = daemon.Daemon()
+        process = bot.process_portfolio
+
+        def fail_main(portfolio, *args, **kwargs):
+            if portfolio.name == "main":
+                raise RuntimeError("сбой")
+            return process(portfolio, *args, **kwargs)
+
+        with mock.patch("builtins.print"):
+            with mock.patch.object(bot, "process_portfolio", fail_main):
+                d.tick()
+            self.assertNotIn("main", d.states)
+            d.tick()
+        self.assertEqual(self.loads, ["main", "alt", "main"])
+
+
+if __name__ == "__main__":
+    unittest.main()
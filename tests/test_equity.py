@@ -0,0 +1,63 @@
+"""
+Кривая стоимости: файл на портфель, выборка по времени, оборванная запись.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import equity  # noqa: E402
+
+T0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+class EquityTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = equity.equity_path(os.path.join(self.tmp, "state.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def append(self, hours: int, cash: float):
+        equity.append_sample(self.path, T0 + timedelta(hours=hours), 50,
+                             100.0, 10.0, cash, 1.0, 2.0)
+
+    def test_path_per_state_file_without_side_effects(self):
+        a = equity.equity_path(os.path.join(self.tmp, "a.json"))
+        b = equity.equity_path(os.path.join(self.tmp, "b.json"))
+        self.assertNotEqual(a, b)
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_range_and_torn_record(self):
+        for h, cash in enumerate([1000.0, 1200.0, 900.0, 1100.0]):
+            self.append(4 * h, cash)
+
+        series = equity.load(self.path, T0 + timedelta(hours=4), T0 + timedelta(hours=8))
+        self.assertEqual(list(series["cash"]), [1200.0, 900.0])
+        self.assertEqual(list(series["total"]), [1320.0, 1020.0])
+
+        # процесс упал посреди записи: хвост не читается и отрезается следующей
+        with open(self.path, "ab") as f:
+            f.write(b"\x00" * 13)
+        self.assertEqual(len(equity.load(self.path)["ts"]), 4)
+        self.append(16, 1000.0)
+        self.assertEqual(os.path.getsize(self.path), 5 * equity.RECORD_SIZE)
+        self.assertEqual(equity.load(self.path)["cash"][-1], 1000.0)
+
+    def test_drawdown(self):
+        self.assertAlmostEqual(equity.max_drawdown([100.0, 120.0, 90.0, 130.0, 117.0]), 0.25)
+        self.assertEqual(equity.max_drawdown([]), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Сверка стратегии с эталонным журналом на фиксированной истории.
+
+fixtures/history_4h.csv — 180 дней 4-часовых тиков (F&G и цены), на которых
+лестница заполняется целиком, проходит все уровни продаж и снова докупается.
+Эталон (reference_trades.csv, reference_equity.csv, reference_state.json)
+записан исходным bot.main — до выделения strategy.py — тик за тиком на этой
+истории. Бэктест и живой тик (bot.process_portfolio) обязаны совпасть с ним
+до последнего знака.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import csv
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import backtest  # noqa: E402
+import bot  # noqa: E402
+import equity  # noqa: E402
+from persistence import read_state  # noqa: E402
+from portfolios import default_portfolio  # noqa: E402
+
+HISTORY = os.path.join(FIXTURES, "history_4h.csv")
+STATE_FIELDS = (
+    "base_capital",
+    "cash_usd",
+    "btc_amount",
+    "eth_amount",
+    "avg_entry_btc",
+    "avg_entry_eth",
+    "buckets",
+    "sell_used",
+)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read().splitlines()
+
+
+def reference_equity():
+    with open(os.path.join(FIXTURES, "reference_equity.csv"), encoding="utf-8") as f:
+        return [float(row["total_value"]) for row in csv.DictReader(f, delimiter=";")]
+
+
+def reference_state():
+    with open(os.path.join(FIXTURES, "reference_state.json"), encoding="utf-8") as f:
+        state = json.load(f)
+    return {k: state[k] for k in STATE_FIELDS}
+
+
+class FakeDateTime(datetime):
+    """bot.datetime на время прогона: now() — время текущего тика истории."""
+
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+class EquivalenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_backtest_matches_reference(self):
+        timestamps, fng, btc, eth = backtest.load_history(HISTORY)
+        trades, curve, state = backtest.run_backtest(timestamps, fng, btc, eth)
+
+        path = os.path.join(self.tmp, "bt_trades.csv")
+        backtest.write_trades(path, trades)
+        self.assertEqual(
+            read_lines(path), read_lines(os.path.join(FIXTURES, "reference_trades.csv"))
+        )
+        self.assertEqual(list(curve), reference_equity())
+        self.assertEqual(state.to_dict(), reference_state())
+
+    def test_live_tick_matches_reference(self):
+        portfolio = default_portfolio()
+        portfolio.state_file = os.path.join(self.tmp, "state.json")
+        portfolio.trades_file = os.path.join(self.tmp, "trades.csv")
+
+        timestamps, fng, btc, eth = backtest.load_history(HISTORY)
+        state = bot.load_portfolio_state(portfolio)
+        with mock.patch.object(bot, "datetime", FakeDateTime):
+            for i in range(len(fng)):
+                FakeDateTime.current = datetime.fromisoformat(timestamps[i])
+                snapshot = bot.MarketSnapshot(fng[i], None, btc[i], eth[i])
+                bot.process_portfolio(portfolio, state, snapshot)
+
+        self.assertEqual(
+            read_lines(portfolio.trades_file),
+            read_lines(os.path.join(FIXTURES, "reference_trades.csv")),
+        )
+        saved = read_state(portfolio.state_file)
+        self.assertEqual({k: saved[k] for k in STATE_FIELDS}, reference_state())
+        curve = equity.load(equity.equity_path(portfolio.state_file))["total"]
+        self.assertEqual(list(curve), reference_equity())
+
+
+if __name__ == "__main__":
+    unittest.main()
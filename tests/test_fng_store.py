@@ -0,0 +1,98 @@
+"""
+Локальная история F&G: докачка только завершённых дней.
+
+Сеть не нужна: ответ CMC подменяется.
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fng_store  # noqa: E402
+import inactivity_report  # noqa: E402
+
+
+class FakeDateTime(datetime):
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def value_for(d: date) -> int:
+    return d.toordinal() % 100
+
+
+class FakeCMC:
+    """fetch_fng_daily: значения по дате, запоминает запрошенные диапазоны."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start: date, end: date):
+        self.calls.append((start, end))
+        days = (end - start).days + 1
+        return [(start + timedelta(days=i), value_for(start + timedelta(days=i)))
+                for i in range(days)]
+
+
+class FngStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "fng_history.csv")
+        self.cmc = FakeCMC()
+        for target, name, value in [
+            (fng_store, "CMC_API_KEY", "key"),
+            (fng_store, "fetch_fng_daily", self.cmc),
+            (fng_store, "datetime", FakeDateTime),
+            (inactivity_report, "fetch_fng_daily", self.cmc),
+            (inactivity_report, "datetime", FakeDateTime),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def at(self, day: date, hour: int = 12):
+        FakeDateTime.current = datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+
+    def test_sync_stores_completed_days_only(self):
+        self.at(date(2025, 3, 10))
+        added = fng_store.sync_fng_history(self.path)
+        self.assertEqual(self.cmc.calls, [(date(2024, 1, 1), date(2025, 3, 9))])
+        self.assertEqual(added, (date(2025, 3, 9) - date(2024, 1, 1)).days + 1)
+        self.assertEqual(fng_store.last_stored_date(self.path), date(2025, 3, 9))
+
+        # в тот же день докачивать нечего, на следующий — один день
+        self.assertEqual(fng_store.sync_fng_history(self.path), 0)
+        self.at(date(2025, 3, 11), hour=1)
+        self.assertEqual(fng_store.sync_fng_history(self.path), 1)
+        self.assertEqual(
+            fng_store.get_fng_range(date(2025, 3, 8), date(2025, 3, 31), self.path),
+            [(d, value_for(d)) for d in (date(2025, 3, 8), date(2025, 3, 9), date(2025, 3, 10))],
+        )
+
+    def test_inactivity_range_includes_today(self):
+        self.at(date(2025, 3, 10))
+        fng_store.sync_fng_history(self.path)
+        with mock.patch.object(inactivity_report, "get_fng_range",
+                               lambda start, end: fng_store.get_fng_range(start, end, self.path)):
+            f_min, f_max = inactivity_report.get_fng_range_last_days(7)
+        values = [value_for(date(2025, 3, 3) + timedelta(days=i)) for i in range(8)]
+        self.assertEqual((f_min, f_max), (min(values), max(values)))
+        self.assertEqual(self.cmc.calls[-1], (date(2025, 3, 10), date(2025, 3, 10)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Общий HTTP-клиент: какие ошибки повторяются.
+
+Сеть не нужна: сессия подменяется. Нужен установленный requests.
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import http_client  # noqa: E402
+
+try:
+    import requests
+    from urllib3.exceptions import MaxRetryError, NewConnectionError
+except ImportError:
+    requests = None
+
+URL = "https://api.telegram.org/botTOKEN/sendMessage"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.content = b"{}"
+        self.headers = {}
+
+
+class FakeSession:
+    """session.request: по очереди бросает исключения или отдаёт ответы из outcomes."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, URL, reason))
+
+
+@unittest.skipIf(requests is None, "нужен requests")
+class RetryTest(unittest.TestCase):
+    def call(self, method, outcomes):
+        session = FakeSession(outcomes)
+        with mock.patch.object(http_client, "get_session", lambda url: session), \
+                mock.patch.object(http_client.time, "sleep", lambda s: None):
+            try:
+                return http_client.request(method, URL), session.calls
+            except requests.RequestException as e:
+                return e, session.calls
+
+    def test_get_retries_read_timeout(self):
+        r, calls = self.call("GET", [requests.ReadTimeout(), FakeResponse(200)])
+        self.assertEqual((r.status_code, calls), (200, 2))
+
+    def test_post_read_timeout_is_not_retried(self):
+        e, calls = self.call("POST", [requests.ReadTimeout(), FakeResponse(200)])
+        self.assertIsInstance(e, requests.ReadTimeout)
+        self.assertEqual(calls, 1)
+
+    def test_post_dropped_connection_is_not_retried(self):
+        e, calls = self.call("POST", [requests.ConnectionError("Connection aborted"),
+                                      FakeResponse(200)])
+        self.assertIsInstance(e, requests.ConnectionError)
+        self.assertEqual(calls, 1)
+
+    def test_post_retries_when_not_connected(self):
+        r, calls = self.call("POST", [refused(), requests.ConnectTimeout(), FakeResponse(200)])
+        self.assertEqual((r.status_code, calls), (200, 3))
+
+    def test_retry_statuses(self):
+        r, calls = self.call("GET", [FakeResponse(503), FakeResponse(200)])
+        self.assertEqual((r.status_code, calls), (200, 2))
+        r, calls = self.call("GET", [FakeResponse(404), FakeResponse(200)])
+        self.assertEqual((r.status_code, calls), (404, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Журнал сделок: индекс по месяцам, чтение диапазонов и хвоста.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import csv
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import ledger  # noqa: E402
+
+
+def all_rows(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+
+def rows_between(rows, start, end):
+    return [
+        r for r in rows
+        if start <= datetime.fromisoformat(r["timestamp_utc"]).date() <= end
+    ]
+
+
+class LedgerIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "trades.csv")
+        shutil.copyfile(os.path.join(FIXTURES, "reference_trades.csv"), self.path)
+        self.rows = all_rows(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_month_ranges_match_full_scan(self):
+        for start, end in [
+            (date(2022, 3, 1), date(2022, 3, 31)),
+            (date(2022, 2, 10), date(2022, 4, 5)),
+            (date(2020, 1, 1), date(2030, 1, 1)),
+            (date(2031, 1, 1), date(2031, 12, 31)),
+        ]:
+            expected = rows_between(self.rows, start, end)
+            self.assertEqual(ledger.read_trades(start, end, self.path), expected)
+        self.assertEqual(ledger.last_trade(self.path), self.rows[-1])
+
+    def test_reads_do_not_write_index(self):
+        ledger.read_trades(date(2022, 1, 1), date(2022, 12, 31), self.path)
+        ledger.last_trade(self.path)
+        self.assertFalse(os.path.exists(ledger.index_path(self.path)))
+
+    def test_stale_index_is_rebuilt_in_memory(self):
+        ledger.save_index(ledger.build_index(self.path), self.path)
+        with open(ledger.index_path(self.path), "rb") as f:
+            saved = f.read()
+        # строку дописали мимо журнала — индекс на диске отстал
+        with open(self.path, "ab") as f:
+            f.write(b"2030-05-01T00:00:00+00:00;BTC;BUY;20;1.0;10.0;10.0;0.0;10.0;1.0\n")
+
+        last = ledger.last_trade(self.path)
+        self.assertEqual(last["timestamp_utc"], "2030-05-01T00:00:00+00:00")
+        self.assertEqual(
+            len(ledger.read_trades(date(2030, 5, 1), date(2030, 5, 31), self.path)), 1
+        )
+        with open(ledger.index_path(self.path), "rb") as f:
+            self.assertEqual(f.read(), saved)
+
+    def test_log_trade_keeps_index_on_disk(self):
+        ledger.log_trade("BTC", "BUY", 20, 90000.0, 100.0, 0.001, 9900.0, 0.001, 90000.0,
+                         path=self.path)
+        index = ledger.load_index(self.path)
+        self.assertEqual(index, ledger.build_index(self.path))
+        self.assertTrue(os.path.exists(ledger.index_path(self.path)))
+        self.assertEqual(ledger.last_trade(self.path)["usd_amount"], "100.0")
+
+
+class TailTradesTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(FIXTURES, "reference_trades.csv")
+        self.rows = all_rows(self.path)
+        with open(self.path, "rb") as f:
+            self.line_sizes = [len(line) for line in f]
+
+    def test_tail_at_block_boundaries(self):
+        # блок меньше строки, ровно строка, на байт больше и длиннее файла
+        sizes = {1, 7, self.line_sizes[-1], self.line_sizes[-1] + 1,
+                 self.line_sizes[-1] + self.line_sizes[-2], 4096}
+        for block in sorted(sizes):
+            with mock.patch.object(ledger, "TAIL_BLOCK_SIZE", block):
+                for n in (1, 2, 3, len(self.rows), len(self.rows) + 5):
+                    with self.subTest(block=block, n=n):
+                        self.assertEqual(ledger.tail_trades(n, self.path), self.rows[-n:])
+
+    def test_empty_and_missing(self):
+        self.assertEqual(ledger.tail_trades(0, self.path), [])
+        self.assertEqual(ledger.tail_trades(3, os.path.join(FIXTURES, "nope.csv")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
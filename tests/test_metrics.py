@@ -0,0 +1,79 @@
+"""
+Метрики запусков: запись в JSON lines и дамп Prometheus.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics  # noqa: E402
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "metrics.jsonl")
+        patcher = mock.patch.object(metrics, "METRICS_FILE", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_run_records_stages_and_errors(self):
+        @metrics.run("tick")
+        def tick(fail: bool):
+            with metrics.stage("fetch_fng"):
+                pass
+            with metrics.stage("fetch_fng"):
+                pass
+            metrics.note(signals=2)
+            if fail:
+                raise ValueError("нет цены")
+
+        tick(False)
+        with self.assertRaises(ValueError):
+            tick(True)
+
+        ok, failed = metrics.load(self.path)
+        self.assertEqual((ok["run"], ok["status"]), ("tick", "ok"))
+        self.assertEqual(list(ok["stages"]), ["fetch_fng"])
+        self.assertEqual(ok["notes"], {"signals": 2})
+        self.assertEqual(failed["status"], "error")
+        self.assertIn("нет цены", failed["error"])
+
+    def test_prometheus_families_are_grouped(self):
+        records = [
+            {"run": run, "duration_ms": 1500.0, "status": "ok",
+             "stages": {"fetch_fng": 100.0, "strategy": 2.0}}
+            for run in ("tick", "monthly")
+        ]
+        stats = {"cmc": {"requests": 3, "retries": 1, "errors": 0, "bytes": 900},
+                 "telegram": {"requests": 1, "retries": 0, "errors": 0, "bytes": 50}}
+        with mock.patch.object(metrics.http_client, "get_stats", lambda: stats):
+            text = metrics.prometheus_text(records)
+
+        families = []
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                families.append(line.split()[2])
+                continue
+            name = line.split("{", 1)[0]
+            # сэмпл относится к последнему объявленному семейству
+            self.assertEqual(name, families[-1])
+        self.assertEqual(len(families), len(set(families)))
+        self.assertIn('secretary_http_requests_total{provider="cmc"} 3', text)
+        self.assertIn('secretary_run_success{run="monthly"} 1', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
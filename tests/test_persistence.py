@@ -0,0 +1,162 @@
+"""
+Фиксация тика: восстановление после сбоя между маркером и состоянием,
+в том числе для групповой фиксации нескольких портфелей.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import csv
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import persistence  # noqa: E402
+
+
+def trade(asset, usd, cash_after):
+    return {
+        "asset": asset,
+        "action": "BUY",
+        "fng": 30,
+        "price": 100.0,
+        "usd_amount": usd,
+        "asset_delta": usd / 100.0,
+        "cash_after": cash_after,
+        "asset_after": usd / 100.0,
+        "avg_entry_price": 100.0,
+    }
+
+
+def ledger_rows(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+
+class Crash(Exception):
+    pass
+
+
+class CommitRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.state_path = os.path.join(self.tmp, "state.json")
+        self.trades_path = os.path.join(self.tmp, "trades.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def commit(self, state, trades):
+        persistence.commit_tick(state, trades, self.state_path, self.trades_path)
+
+    def crash_after_partial_append(self, *args):
+        # сбой посреди дозаписи: в журнале обрывок строки, состояние старое
+        with open(self.trades_path, "ab") as f:
+            f.write(b"2025-01-01T00:00:00+00:00;ETH;BU")
+        raise Crash()
+
+    def test_recover_replays_interrupted_tick(self):
+        self.commit({"cash_usd": 900.0}, [trade("BTC", 100.0, 900.0)])
+
+        with mock.patch.object(persistence, "_apply", self.crash_after_partial_append):
+            with self.assertRaises(Crash):
+                self.commit({"cash_usd": 700.0},
+                            [trade("BTC", 100.0, 800.0), trade("ETH", 100.0, 700.0)])
+        with open(self.state_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"cash_usd": 900.0})
+        with open(persistence.pending_path(self.state_path), encoding="utf-8") as f:
+            pending = json.load(f)
+
+        self.assertTrue(persistence.recover(self.state_path, self.trades_path))
+        self.assertFalse(os.path.exists(persistence.pending_path(self.state_path)))
+        with open(self.state_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"cash_usd": 700.0})
+
+        rows = ledger_rows(self.trades_path)
+        self.assertEqual([r["cash_after"] for r in rows], ["900.0", "800.0", "700.0"])
+        self.assertEqual([r["timestamp_utc"] for r in rows[1:]],
+                         [t["ts"] for t in pending["trades"]])
+        # повторный запуск ничего не делает
+        self.assertFalse(persistence.recover(self.state_path, self.trades_path))
+        self.assertEqual(len(ledger_rows(self.trades_path)), 3)
+
+    def test_crash_before_marker_leaves_files_untouched(self):
+        self.commit({"cash_usd": 900.0}, [trade("BTC", 100.0, 900.0)])
+        with open(self.trades_path, "rb") as f:
+            ledger = f.read()
+
+        with mock.patch.object(persistence, "atomic_write_json", side_effect=Crash()):
+            with self.assertRaises(Crash):
+                self.commit({"cash_usd": 800.0}, [trade("BTC", 100.0, 800.0)])
+
+        self.assertFalse(persistence.recover(self.state_path, self.trades_path))
+        with open(self.trades_path, "rb") as f:
+            self.assertEqual(f.read(), ledger)
+        with open(self.state_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"cash_usd": 900.0})
+
+
+class GroupCommitRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.marker = os.path.join(self.tmp, persistence.GROUP_PENDING)
+        self.paths = [
+            (os.path.join(self.tmp, name, "state.json"), os.path.join(self.tmp, name, "trades.csv"))
+            for name in ("main", "alt")
+        ]
+        for state_path, _ in self.paths:
+            os.makedirs(os.path.dirname(state_path))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def commit_group(self, cash):
+        with persistence.group_commit(self.marker):
+            for state_path, trades_path in self.paths:
+                persistence.commit_tick({"cash_usd": cash}, [trade("BTC", 100.0, cash)],
+                                        state_path, trades_path)
+
+    def test_group_is_written_on_exit(self):
+        with persistence.group_commit(self.marker):
+            state_path, trades_path = self.paths[0]
+            persistence.commit_tick({"cash_usd": 900.0}, [trade("BTC", 100.0, 900.0)],
+                                    state_path, trades_path)
+            self.assertFalse(os.path.exists(state_path))
+        self.assertEqual(len(ledger_rows(trades_path)), 1)
+        self.assertFalse(os.path.exists(self.marker))
+
+    def test_recover_group_after_crash_between_states(self):
+        self.commit_group(900.0)
+        save = persistence._save_state_file
+        alt_state = self.paths[1][0]
+
+        def crash_on_second(state_path, state):
+            # первое состояние успело записаться, второе — нет
+            if state_path == alt_state:
+                raise Crash()
+            save(state_path, state)
+
+        with mock.patch.object(persistence, "_save_state_file", crash_on_second):
+            with self.assertRaises(Crash):
+                self.commit_group(800.0)
+        self.assertTrue(os.path.exists(self.marker))
+
+        with mock.patch("builtins.print"):
+            self.assertTrue(persistence.recover_group(self.marker))
+        self.assertFalse(os.path.exists(self.marker))
+        for state_path, trades_path in self.paths:
+            with open(state_path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), {"cash_usd": 800.0})
+            self.assertEqual([r["cash_after"] for r in ledger_rows(trades_path)],
+                             ["900.0", "800.0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Накопительный PnL в состоянии: итоги за периоды совпадают с пересчётом
+по журналу, как его делает месячный отчёт.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import pnl  # noqa: E402
+import monthly_report  # noqa: E402
+from strategy import Trade  # noqa: E402
+
+REFERENCE = os.path.join(FIXTURES, "reference_trades.csv")
+
+
+def trade(action, usd, delta, asset_after, avg):
+    return Trade("BTC", action, 20, 25, 100.0, usd, delta, 0.0, asset_after, avg)
+
+
+class PnlTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def assertRollup(self, got, expected):
+        for key in ("trades", "buys", "sells"):
+            self.assertEqual(got[key], expected[key])
+        for key in ("buy_usd", "sell_usd", "pnl_usd"):
+            self.assertAlmostEqual(got[key], expected[key], places=6)
+
+    def test_rollups_match_monthly_report(self):
+        rollups = pnl.from_ledger(REFERENCE)
+        with mock.patch.object(monthly_report, "TRADES_FILE", REFERENCE):
+            for month in range(1, 6):
+                start = date(2022, month, 1)
+                end = date(2022, month + 1, 1) - timedelta(days=1)
+                expected = monthly_report.summarize_trades(
+                    monthly_report.load_trades_for_month(start, end)
+                )
+                with self.subTest(month=month):
+                    self.assertRollup(pnl.period(rollups, "months", f"2022-{month:02d}"), expected)
+            year = monthly_report.summarize_trades(
+                monthly_report.load_trades_for_month(date(2022, 1, 1), date(2022, 12, 31))
+            )
+        self.assertRollup(pnl.period(rollups, "years", "2022"), year)
+        self.assertAlmostEqual(pnl.realized_total(rollups), year["pnl_usd"], places=6)
+
+    def test_record_trades(self):
+        state = {}
+        day = datetime(2025, 3, 14, 8, tzinfo=timezone.utc)
+        pnl.record_trades(state, [trade("BUY", 100.0, 1.0, 1.0, 100.0)], day)
+        pnl.record_trades(state, [trade("SELL", 60.0, -0.5, 0.5, 100.0)], day + timedelta(days=1))
+        # продажа без средней цены в PnL не попадает
+        pnl.record_trades(state, [trade("SELL", 10.0, -0.1, 0.4, None)], day + timedelta(days=1))
+
+        btc = state["pnl"]["assets"]["BTC"]
+        self.assertEqual((btc["realized_usd"], btc["cost_basis_usd"]), (10.0, 0.0))
+        self.assertEqual(sorted(state["pnl"]["days"]), ["2025-03-14", "2025-03-15"])
+        month = pnl.period(state["pnl"], "months", "2025-03")
+        self.assertEqual((month["trades"], month["buys"], month["sells"]), (3, 1, 2))
+        self.assertEqual((month["sell_usd"], month["pnl_usd"]), (70.0, 10.0))
+        self.assertEqual(pnl.period(state["pnl"], "months", "2025-04"), pnl.empty_rollup())
+
+        with mock.patch.object(pnl, "DAYS_KEPT", 1):
+            pnl.record_trades(state, [trade("BUY", 5.0, 0.05, 0.45, 100.0)], day + timedelta(days=3))
+        self.assertEqual(list(state["pnl"]["days"]), ["2025-03-17"])
+        self.assertEqual(pnl.period(state["pnl"], "months", "2025-03")["trades"], 4)
+
+    def test_load_backfills_from_ledger(self):
+        state_path = os.path.join(self.tmp, "state.json")
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"cash_usd": 0.0}, f)
+        self.assertEqual(pnl.load(state_path, REFERENCE), pnl.from_ledger(REFERENCE))
+
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"cash_usd": 0.0, "pnl": pnl.empty()}, f)
+        self.assertEqual(pnl.load(state_path, REFERENCE), pnl.empty())
+
+
+if __name__ == "__main__":
+    unittest.main()
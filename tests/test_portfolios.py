@@ -0,0 +1,77 @@
+"""
+Конфигурация виртуальных портфелей: умолчания, пути и лестница из portfolios.json.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import portfolios  # noqa: E402
+from strategy import BASE_CAPITAL, DEFAULT_LADDER  # noqa: E402
+
+
+class PortfoliosTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "portfolios.json")
+        patcher = mock.patch.dict(os.environ, {"TELEGRAM_CHAT_ID": "@main"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, configs):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(configs, f)
+
+    def test_without_file_single_default_portfolio(self):
+        (p,) = portfolios.load_portfolios(self.path)
+        self.assertEqual((p.name, p.chat_id, p.base_capital), ("main", "@main", BASE_CAPITAL))
+        self.assertEqual((p.state_file, p.trades_file),
+                         (portfolios.STATE_FILE, portfolios.TRADES_FILE))
+        self.assertIs(p.ladder, DEFAULT_LADDER)
+
+    def test_config_fields_and_defaults(self):
+        self.write([
+            {"name": "main"},
+            {
+                "name": "aggressive",
+                "base_capital": 5000,
+                "chat_id": "@aggr",
+                "ladder": {
+                    "buy_targets": {"30": 1000, "45": 500},
+                    "sell_fracs": {"80": 0.5, "65": 0.25},
+                    "btc_share": 0.7,
+                },
+            },
+        ])
+        main, aggr = portfolios.load_portfolios(self.path)
+        self.assertEqual(main.state_file, os.path.join("portfolios", "main", "state.json"))
+        self.assertEqual(main.trades_file, os.path.join("portfolios", "main", "trades.csv"))
+        self.assertEqual((main.chat_id, main.ladder), ("@main", DEFAULT_LADDER))
+
+        self.assertEqual((aggr.base_capital, aggr.chat_id), (5000.0, "@aggr"))
+        self.assertEqual(aggr.ladder.buy_levels, (45, 30))
+        self.assertEqual(aggr.ladder.buy_targets, (500.0, 1000.0))
+        self.assertEqual(aggr.ladder.sell_levels, (65, 80))
+        self.assertEqual(aggr.ladder.btc_share, 0.7)
+
+    def test_duplicate_names_rejected(self):
+        self.write([{"name": "main"}, {"name": "main"}])
+        with self.assertRaises(ValueError):
+            portfolios.load_portfolios(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Хранилище SQLite: перенос портфеля из файлов и итоги по базе.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import pnl  # noqa: E402
+import sqlite_store  # noqa: E402
+from ledger import read_trades  # noqa: E402
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.db = os.path.join(self.tmp, "secretary.db")
+        self.state_path = os.path.join(self.tmp, "state.json")
+        self.trades_path = os.path.join(self.tmp, "trades.csv")
+        shutil.copy(os.path.join(FIXTURES, "reference_trades.csv"), self.trades_path)
+        shutil.copy(os.path.join(FIXTURES, "reference_state.json"), self.state_path)
+
+    def tearDown(self):
+        sqlite_store.close_all()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def migrate(self):
+        return sqlite_store.migrate_portfolio(self.state_path, self.trades_path, self.db)
+
+    def test_migrate_portfolio(self):
+        rows = read_trades(date(1970, 1, 1), date(9999, 12, 31), self.trades_path)
+        self.assertEqual(self.migrate(), len(rows))
+        # повторный перенос перезаписывает, а не дублирует
+        self.assertEqual(self.migrate(), len(rows))
+        stored = sqlite_store.read_trades(self.state_path, path=self.db)
+        self.assertEqual([(r["timestamp_utc"], r["asset"], r["action"]) for r in stored],
+                         [(r["timestamp_utc"], r["asset"], r["action"]) for r in rows])
+
+        state = sqlite_store.load_state(self.state_path, self.db)
+        with open(self.state_path, encoding="utf-8") as f:
+            expected = json.load(f)
+        expected["pnl"] = json.loads(json.dumps(pnl.from_ledger(self.trades_path)))
+        self.assertEqual(state, expected)
+
+        for key in ("2022-02", "2022-03", "2022-04"):
+            year, month = map(int, key.split("-"))
+            end = date(year, month + 1, 1) - timedelta(days=1)
+            got = sqlite_store.summarize(self.state_path, date(year, month, 1), end, self.db)
+            want = pnl.period(expected["pnl"], "months", key)
+            with self.subTest(month=key):
+                for field in ("trades", "buys", "sells"):
+                    self.assertEqual(got[field], want[field])
+                for field in ("buy_usd", "sell_usd", "pnl_usd"):
+                    self.assertAlmostEqual(got[field], want[field], places=6)
+
+    def test_last_trade_and_meta(self):
+        self.migrate()
+        last = read_trades(date(1970, 1, 1), date(9999, 12, 31), self.trades_path)[-1]
+        self.assertEqual(sqlite_store.last_trade_ts(self.state_path, self.db).isoformat(),
+                         last["timestamp_utc"])
+        self.assertEqual(sqlite_store.load_meta("monthly_meta.json", {}, self.db), {})
+        sqlite_store.save_meta("monthly_meta.json", {"2022-03": 1}, self.db)
+        self.assertEqual(sqlite_store.load_meta("monthly_meta.json", {}, self.db), {"2022-03": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
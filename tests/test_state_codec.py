@@ -0,0 +1,65 @@
+"""
+Двоичный формат состояния: круговой перевод без потерь и проверка заголовка.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import struct
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import pnl  # noqa: E402
+import persistence  # noqa: E402
+import state_codec  # noqa: E402
+
+
+def reference_state():
+    with open(os.path.join(FIXTURES, "reference_state.json"), encoding="utf-8") as f:
+        state = json.load(f)
+    state.pop("next_trigger", None)
+    # ETH ещё не покупали: средней цены нет (в файле — NaN)
+    state["avg_entry_eth"] = None
+    state["pnl"] = pnl.from_ledger(os.path.join(FIXTURES, "reference_trades.csv"))
+    state["note"] = "ручная правка"
+    return state
+
+
+class StateCodecTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_round_trip(self):
+        state = reference_state()
+        self.assertTrue(state["pnl"]["days"] and state["pnl"]["months"] and state["pnl"]["years"])
+        self.assertEqual(state_codec.decode(state_codec.encode(state)), state)
+
+    def test_bin_state_is_read_by_persistence(self):
+        state = reference_state()
+        state_path = os.path.join(self.tmp, "state.json")
+        with open(persistence.state_bin_path(state_path), "wb") as f:
+            f.write(state_codec.encode(state))
+        self.assertEqual(persistence.read_state_file(state_path), state)
+
+    def test_rejects_foreign_and_future_files(self):
+        data = state_codec.encode(reference_state())
+        with self.assertRaises(ValueError):
+            state_codec.decode(b"JUNK" + data[4:])
+        future = struct.pack("<4sH", state_codec.MAGIC, state_codec.VERSION + 1)
+        with self.assertRaises(ValueError):
+            state_codec.decode(future + data[6:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Потоковый режим: проигрывание истории в отдельный каталог.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import io
+import os
+import csv
+import sys
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import bot  # noqa: E402
+import metrics  # noqa: E402
+import stream  # noqa: E402
+from portfolios import default_portfolio  # noqa: E402
+
+HISTORY = os.path.join(FIXTURES, "history_4h.csv")
+
+
+class StreamReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        patcher = mock.patch.object(metrics, "METRICS_FILE", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def replay(self, streamer):
+        with redirect_stdout(io.StringIO()):
+            return streamer.run(stream.ReplaySource(HISTORY))
+
+    def test_replay_writes_only_scratch_files_with_event_time(self):
+        live = default_portfolio()
+        (portfolio,) = stream.scratch_portfolios(self.tmp, [live])
+        self.assertTrue(portfolio.state_file.startswith(self.tmp))
+
+        events = self.replay(stream.Streamer([portfolio], send=False))
+        self.assertEqual(events, 1080)
+
+        with open(HISTORY, encoding="utf-8") as f:
+            history_ts = {line.split(";", 1)[0] for line in f}
+        with open(portfolio.trades_file, encoding="utf-8") as f:
+            trades = list(csv.DictReader(f, delimiter=";"))
+        self.assertTrue(trades)
+        for row in trades:
+            self.assertIn(row["timestamp_utc"], history_ts)
+
+    def test_state_dir_overlapping_live_files_is_refused(self):
+        live = default_portfolio()
+        live.state_file = os.path.join(self.tmp, "main", "state.json")
+        with self.assertRaises(ValueError):
+            stream.scratch_portfolios(self.tmp, [live])
+
+    def test_failed_evaluation_is_retried_in_same_zone(self):
+        (portfolio,) = stream.scratch_portfolios(self.tmp, [default_portfolio()])
+        streamer = stream.Streamer([portfolio], send=False)
+        real = bot.process_portfolio
+        calls = []
+
+        def flaky(*args, **kwargs):
+            calls.append(args[2].fng)
+            if len(calls) == 1:
+                raise OSError("диск занят")
+            return real(*args, **kwargs)
+
+        ts = stream.datetime(2025, 1, 1, tzinfo=stream.timezone.utc)
+        with mock.patch.object(bot, "process_portfolio", flaky):
+            with redirect_stdout(io.StringIO()):
+                streamer.on_event(stream.MarketEvent(ts, 50, 90000.0, 3000.0))
+                streamer.on_event(stream.MarketEvent(ts, 50, 90100.0, 3010.0))
+                streamer.on_event(stream.MarketEvent(ts, 50, 90200.0, 3020.0))
+        self.assertEqual(calls, [50, 50])
+
+
+if __name__ == "__main__":
+    unittest.main()
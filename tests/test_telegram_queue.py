@@ -0,0 +1,142 @@
+"""
+Очередь Telegram: повторы на 429 и 5xx, отказ без повторов на прочие 4xx.
+
+Сеть не нужна: отправка и часы подменяются. Нужен установленный requests.
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import telegram_queue  # noqa: E402
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+
+class Clock:
+    """time для модуля очереди: sleep двигает часы, а не ждёт."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += max(seconds, 0.0)
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body=None):
+        self.status_code = status_code
+        self.body = body if body is not None else {"ok": status_code == 200}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Server Error", response=self)
+
+
+@unittest.skipIf(requests is None, "нужен requests")
+class QueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.path = os.path.join(self.tmp, "telegram_queue.json")
+        self.clock = Clock()
+        self.responses = []
+        self.posted = []
+        self.patch(telegram_queue, "time", self.clock)
+        self.patch(telegram_queue, "_wait_for_slot", lambda chat_id: None)
+        self.patch(telegram_queue.http_client, "post", self.post)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def patch(self, target, name, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, url, json=None, **kwargs):
+        self.posted.append(json["text"])
+        return self.responses.pop(0)
+
+    def queued(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_rejected_message_is_dropped_at_once(self):
+        telegram_queue.enqueue("<b>кривой", "42", self.path)
+        self.responses = [FakeResponse(400, {"ok": False, "description": "can't parse"})]
+        with mock.patch("builtins.print"):
+            self.assertEqual(telegram_queue.flush(self.path), 0)
+        self.assertEqual(len(self.posted), 1)
+        self.assertEqual(self.queued(), [])
+        self.assertEqual(self.clock.slept, [])
+
+    def test_429_waits_retry_after(self):
+        telegram_queue.enqueue("сигнал", "42", self.path)
+        self.responses = [
+            FakeResponse(429, {"ok": False, "parameters": {"retry_after": 7}}),
+            FakeResponse(200),
+        ]
+        with mock.patch("builtins.print"):
+            self.assertEqual(telegram_queue.flush(self.path), 1)
+        self.assertEqual(self.posted, ["сигнал", "сигнал"])
+        self.assertEqual(self.clock.slept, [7.0])
+        self.assertEqual(self.queued(), [])
+
+    def test_429_without_wait_keeps_message(self):
+        telegram_queue.enqueue("сигнал", "42", self.path)
+        self.responses = [FakeResponse(429, {"ok": False, "parameters": {"retry_after": 7}})]
+        with mock.patch("builtins.print"):
+            self.assertEqual(telegram_queue.flush(self.path, wait=False), 0)
+        (msg,) = self.queued()
+        self.assertEqual(msg["attempts"], 1)
+        self.assertEqual(msg["not_before"], self.clock.now + 7)
+
+    def test_server_errors_are_retried_then_dropped(self):
+        telegram_queue.enqueue("сигнал", "42", self.path)
+        self.responses = [FakeResponse(502) for _ in range(telegram_queue.MAX_ATTEMPTS)]
+        with mock.patch("builtins.print"):
+            self.assertEqual(telegram_queue.flush(self.path), 0)
+        self.assertEqual(len(self.posted), telegram_queue.MAX_ATTEMPTS)
+        self.assertEqual(self.queued(), [])
+
+    def test_send_now_does_not_retry_rejected(self):
+        self.responses = [FakeResponse(403, {"ok": False, "description": "bot was blocked"})]
+        with self.assertRaises(telegram_queue.TelegramRejected):
+            telegram_queue.send_now("отчёт", "42")
+        self.assertEqual(len(self.posted), 1)
+
+    def test_messages_within_window_are_merged(self):
+        telegram_queue.enqueue("первое", "42", self.path)
+        self.clock.now += telegram_queue.MERGE_WINDOW / 2
+        telegram_queue.enqueue("второе", "42", self.path)
+        telegram_queue.enqueue("другой чат", "7", self.path)
+        self.responses = [FakeResponse(200), FakeResponse(200)]
+        self.assertEqual(telegram_queue.flush(self.path), 2)
+        self.assertEqual(self.posted, ["первое\n\nвторое", "другой чат"])
+
+
+if __name__ == "__main__":
+    unittest.main()
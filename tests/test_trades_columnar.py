@@ -0,0 +1,95 @@
+"""
+Колоночное хранилище сделок: итоги совпадают с разбором CSV, откат дозаписи.
+
+Запуск без сети:
+    python -m unittest discover tests
+"""
+
+import os
+import csv
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+sys.path.insert(0, ROOT)
+
+import trades_columnar  # noqa: E402
+
+REFERENCE = os.path.join(FIXTURES, "reference_trades.csv")
+
+
+def csv_summary(path, start, end):
+    """Те же итоги построчным разбором CSV — эталон для колонок."""
+    result = {"trades": 0, "buys": 0, "sells": 0, "buy_usd": 0.0, "sell_usd": 0.0,
+              "pnl_usd": 0.0}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            if not start <= datetime.fromisoformat(row["timestamp_utc"]).date() <= end:
+                continue
+            usd = float(row["usd_amount"])
+            result["trades"] += 1
+            if row["action"] == "BUY":
+                result["buys"] += 1
+                result["buy_usd"] += usd
+                continue
+            result["sells"] += 1
+            result["sell_usd"] += usd
+            if row["avg_entry_price"]:
+                cost = abs(float(row["asset_delta"])) * float(row["avg_entry_price"])
+                result["pnl_usd"] += usd - cost
+    return result
+
+
+class ColumnarTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="secretary-test-")
+        self.cols = os.path.join(self.tmp, "trades_cols")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_summary_matches_csv(self):
+        n = trades_columnar.convert(REFERENCE, self.cols)
+        self.assertEqual(trades_columnar.row_count(self.cols), n)
+        for start, end in [
+            (date(2022, 2, 1), date(2022, 2, 28)),
+            (date(2022, 3, 1), date(2022, 4, 30)),
+            (date(2020, 1, 1), date(2030, 1, 1)),
+            (date(2031, 1, 1), date(2031, 1, 31)),
+        ]:
+            got = trades_columnar.summarize(start, end, self.cols)
+            expected = csv_summary(REFERENCE, start, end)
+            with self.subTest(start=start):
+                for key in ("trades", "buys", "sells"):
+                    self.assertEqual(got[key], expected[key])
+                for key in ("buy_usd", "sell_usd", "pnl_usd"):
+                    self.assertAlmostEqual(got[key], expected[key], places=6)
+
+    def test_sell_without_avg_price_has_no_pnl(self):
+        ts = datetime(2025, 5, 1, tzinfo=timezone.utc)
+        trades_columnar.append_trade(ts, "BTC", "SELL", 80, 100.0, 50.0, -0.5, 50.0, 0.0,
+                                     None, self.cols)
+        trades_columnar.append_trade(ts, "ETH", "SELL", 80, 10.0, 30.0, -3.0, 80.0, 0.0,
+                                     8.0, self.cols)
+        s = trades_columnar.summarize(date(2025, 5, 1), date(2025, 5, 1), self.cols)
+        self.assertEqual((s["sells"], s["sell_usd"], s["pnl_usd"]), (2, 80.0, 6.0))
+
+    def test_truncate_rolls_back_partial_append(self):
+        trades_columnar.convert(REFERENCE, self.cols)
+        n = trades_columnar.row_count(self.cols)
+        # дозапись оборвалась: цена дописана, остальные колонки — нет
+        with open(os.path.join(self.cols, "price"), "ab") as f:
+            f.write(b"\x00" * 8)
+        self.assertEqual(trades_columnar.row_count(self.cols), n)
+        trades_columnar.truncate(n, self.cols)
+        sizes = {os.path.getsize(os.path.join(self.cols, name)) // (8 if code == "d" else 1)
+                 for name, code in trades_columnar.COLUMNS.items() if code in "dB"}
+        self.assertEqual(sizes, {n})
+
+
+if __name__ == "__main__":
+    unittest.main()
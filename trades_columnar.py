@@ -0,0 +1,235 @@
+"""
+Колоночное бинарное хранилище сделок (необязательное дополнение к trades.csv).
+
+Каталог trades_cols/ содержит по файлу на колонку фиксированной ширины
+(формат модуля array). Если каталог существует, ledger.LedgerWriter дописывает
+туда каждую сделку; отчёты открывают колонки через mmap и считают суммы
+по срезам без разбора текста.
+
+Конвертация существующего журнала:
+    python trades_columnar.py convert [trades.csv] [trades_cols]
+"""
+
+import os
+import sys
+import csv
+import math
+import mmap
+import operator
+from array import array
+from bisect import bisect_left
+from itertools import compress, filterfalse
+from datetime import datetime, time, timezone, timedelta
+
+COLUMNS_DIR = "trades_cols"
+
+# имя колонки -> typecode модуля array
+COLUMNS = {
+    "ts": "d",  # Unix-время, секунды
+    "asset": "B",
+    "action": "B",
+    "fng": "h",
+    "price": "d",
+    "usd_amount": "d",
+    "asset_delta": "d",
+    "cash_after": "d",
+    "asset_after": "d",
+    "avg_entry_price": "d",  # NaN, если средней цены нет
+}
+
+ASSETS = ["BTC", "ETH", "SOL", "BNB"]
+ACTIONS = ["BUY", "SELL"]
+# bytes.translate: код действия -> 1 для продажи, иначе 0
+_SELL_MASK = bytes(int(code == ACTIONS.index("SELL")) for code in range(256))
+
+
+def is_enabled(directory: str = COLUMNS_DIR) -> bool:
+    return os.path.isdir(directory)
+
+
+def _encode(ts: datetime, asset, action, fng, price, usd_amount, asset_delta,
+            cash_after, asset_after, avg_entry_price):
+    return {
+        "ts": ts.timestamp(),
+        "asset": ASSETS.index(asset),
+        "action": ACTIONS.index(action),
+        "fng": int(fng),
+        "price": float(price),
+        "usd_amount": float(usd_amount),
+        "asset_delta": float(asset_delta),
+        "cash_after": float(cash_after),
+        "asset_after": float(asset_after),
+        "avg_entry_price": float(avg_entry_price)
+        if avg_entry_price not in (None, "")
+        else float("nan"),
+    }
+
+
+def append_rows(rows, directory: str = COLUMNS_DIR):
+    """rows — список dict в формате _encode; одна запись в каждый файл колонки."""
+    if not rows:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name, code in COLUMNS.items():
+        with open(os.path.join(directory, name), "ab") as f:
+            f.write(array(code, [r[name] for r in rows]).tobytes())
+
+
+def append_trade(ts: datetime, asset, action, fng, price, usd_amount, asset_delta,
+                 cash_after, asset_after, avg_entry_price, directory: str = COLUMNS_DIR):
+    append_rows(
+        [
+            _encode(ts, asset, action, fng, price, usd_amount, asset_delta,
+                    cash_after, asset_after, avg_entry_price)
+        ],
+        directory,
+    )
+
+
+def append_trades(trades, directory: str = COLUMNS_DIR):
+    """Пакет сделок (ts, (asset, action, ...)) — по одной записи в файл колонки."""
+    append_rows([_encode(ts, *values) for ts, values in trades], directory)
+
+
+def row_count(directory: str = COLUMNS_DIR) -> int:
+    """Число полных строк (минимум по колонкам)."""
+    counts = []
+    for name, code in COLUMNS.items():
+        path = os.path.join(directory, name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        counts.append(size // array(code).itemsize)
+    return min(counts)
+
+
+def truncate(rows: int, directory: str = COLUMNS_DIR):
+    """Обрезать все колонки до rows строк (откат незавершённой дозаписи)."""
+    for name, code in COLUMNS.items():
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(rows * array(code).itemsize)
+
+
+class ColumnStore:
+    """Колонки, отображённые в память: store["price"] — memoryview типа "d"."""
+
+    def __init__(self, directory: str = COLUMNS_DIR):
+        self._maps = []
+        self.columns = {}
+        # после оборванной дозаписи колонки могут различаться по длине
+        self.rows = row_count(directory)
+
+        for name, code in COLUMNS.items():
+            if self.rows == 0:
+                self.columns[name] = memoryview(array(code))
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mm)
+            nbytes = self.rows * array(code).itemsize
+            self.columns[name] = memoryview(mm)[:nbytes].cast(code)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def date_range(self, start, end):
+        """Срез индексов [lo, hi) сделок с датой в [start, end] (ts отсортирован)."""
+        t0 = datetime.combine(start, time(), tzinfo=timezone.utc).timestamp()
+        t1 = datetime.combine(
+            end + timedelta(days=1), time(), tzinfo=timezone.utc
+        ).timestamp()
+        ts = self.columns["ts"]
+        return bisect_left(ts, t0), bisect_left(ts, t1)
+
+
+def summarize(start, end, directory: str = COLUMNS_DIR):
+    """
+    Итоги за период по колонкам: количество и суммы покупок/продаж
+    и реализованный PnL (как в monthly_report).
+
+    Строки выбираются байтовыми масками (колонка action через translate),
+    а суммы считают compress/map/sum по срезам mmap: весь проход идёт
+    внутри C, без цикла Python по сделкам.
+    """
+    with ColumnStore(directory) as store:
+        lo, hi = store.date_range(start, end)
+        action = store["action"][lo:hi]
+        usd = store["usd_amount"][lo:hi]
+        delta = store["asset_delta"][lo:hi]
+        avg = store["avg_entry_price"][lo:hi]
+
+        is_sell = action.tobytes().translate(_SELL_MASK)
+        sells = is_sell.count(1)
+        total_usd = sum(usd, 0.0)
+        sell_usd = sum(compress(usd, is_sell), 0.0)
+        # u - |delta| * avg по продажам; без средней цены (NaN) сделка не в счёт
+        pnl = map(
+            operator.sub,
+            compress(usd, is_sell),
+            map(operator.mul, map(abs, compress(delta, is_sell)), compress(avg, is_sell)),
+        )
+        pnl_usd = sum(filterfalse(math.isnan, pnl), 0.0)
+        result = {
+            "trades": hi - lo,
+            "buys": hi - lo - sells,
+            "sells": sells,
+            "buy_usd": total_usd - sell_usd,
+            "sell_usd": sell_usd,
+            "pnl_usd": pnl_usd,
+        }
+        for view in (action, usd, delta, avg):
+            view.release()
+    return result
+
+
+def convert(csv_path: str = "trades.csv", directory: str = COLUMNS_DIR):
+    """Собрать колонки заново из существующего trades.csv."""
+    os.makedirs(directory, exist_ok=True)
+    for name in COLUMNS:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    rows = []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            rows.append(
+                _encode(
+                    datetime.fromisoformat(row["timestamp_utc"]),
+                    row["asset"],
+                    row["action"],
+                    row["fng"],
+                    row["price"],
+                    row["usd_amount"],
+                    row["asset_delta"],
+                    row["cash_after"],
+                    row["asset_after"],
+                    row["avg_entry_price"],
+                )
+            )
+    append_rows(rows, directory)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "convert":
+        print("Использование: python trades_columnar.py convert [trades.csv] [trades_cols]")
+        sys.exit(1)
+    n = convert(*sys.argv[2:4])
+    print(f"Сконвертировано сделок: {n}")
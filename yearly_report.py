@@ -1,37 +1,26 @@
-import os
-import json
-from datetime import datetime, date, timedelta, timezone
+from datetime import datetime, date, time, timezone
+
+import equity
+import metrics
+import pnl
+import sqlite_store
+from core import (
+    CMC_API_KEY,
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_ID,
+    fmt_usd,
+    load_meta,
+    message_link,
+    save_meta,
+)
+from fng_store import get_fng_range, sync_quietly
+from ledger import TRADES_FILE
+from persistence import STATE_FILE, read_state
+from prices import get_prices
+from strategy import BASE_CAPITAL
+from telegram_queue import enqueue, flush, send_now
 
-import requests
-
-CMC_API_KEY = os.environ.get("CMC_API_KEY")
-TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
-
-MONTHLY_META_FILE = "monthly_meta.json"
 YEARLY_META_FILE = "yearly_meta.json"
-STATE_FILE = "secretary_state.json"
-BASE_CAPITAL = 10_000.0
-
-
-def send_telegram(text: str):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML"}
-    r = requests.post(url, json=payload, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-
-def load_json(path, default):
-    if not os.path.exists(path):
-        return default
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_json(path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
 
 
 def get_year_bounds():
@@ -45,28 +34,11 @@ def get_year_bounds():
 
 
 def get_yearly_fng_stats(year: int):
-    if not CMC_API_KEY:
+    rows = get_fng_range(date(year, 1, 1), date(year, 12, 31))
+    if not rows:
         return None
 
-    start = date(year, 1, 1)
-    end = date(year, 12, 31)
-    url = "https://pro-api.coinmarketcap.com/v3/fear-and-greed/historical"
-    headers = {"X-CMC_PRO_API_KEY": CMC_API_KEY}
-    params = {
-        "start": start.isoformat(),
-        "end": (end + timedelta(days=1)).isoformat(),
-        "interval": "daily",
-    }
-    r = requests.get(url, headers=headers, params=params, timeout=20)
-    r.raise_for_status()
-    data = r.json()["data"]
-    if not data:
-        return None
-
-    data_sorted = sorted(data, key=lambda x: x["timestamp"])
-    values = [int(item["value"]) for item in data_sorted]
-    timestamps = [x["timestamp"] for x in data_sorted]
-
+    values = [v for _, v in rows]
     vmin = min(values)
     vmax = max(values)
     avg = sum(values) / len(values)
@@ -74,43 +46,36 @@ def get_yearly_fng_stats(year: int):
     idx_min = values.index(vmin)
     idx_max = values.index(vmax)
 
-    ts_min = datetime.fromisoformat(
-        timestamps[idx_min].replace("Z", "+00:00")
-    ).date()
-    ts_max = datetime.fromisoformat(
-        timestamps[idx_max].replace("Z", "+00:00")
-    ).date()
-
     return {
         "min": vmin,
-        "min_date": ts_min,
+        "min_date": rows[idx_min][0],
         "max": vmax,
-        "max_date": ts_max,
+        "max_date": rows[idx_max][0],
         "avg": avg,
     }
 
 
-def fmt_usd(x: float) -> str:
-    return f"{x:,.2f}".replace(",", " ")
-
-
+@metrics.run("yearly")
 def main():
     if not (CMC_API_KEY and TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID):
         print("Не заданы переменные окружения для годового отчёта")
+        metrics.note(skipped="env")
         return
 
     year, start, end = get_year_bounds()
-    monthly_meta = load_json(MONTHLY_META_FILE, {})
-    yearly_meta = load_json(YEARLY_META_FILE, {})
+    yearly_meta = load_meta(YEARLY_META_FILE, {})
 
-    pnl_year_usd = 0.0
-    for m in range(1, 13):
-        key = f"{year}-{m:02d}"
-        if key in monthly_meta:
-            pnl_year_usd += monthly_meta[key].get("pnl_usd", 0.0)
+    # годовой итог — из накопителей бота, а не из сумм месячных отчётов
+    with metrics.stage("summary"):
+        if sqlite_store.is_enabled():
+            pnl_year = sqlite_store.summarize(STATE_FILE, start, end)
+        else:
+            pnl_year = pnl.period(pnl.load(STATE_FILE, TRADES_FILE), "years", str(year))
+    pnl_year_usd = pnl_year["pnl_usd"]
 
     pnl_year_pct = pnl_year_usd / BASE_CAPITAL * 100 if BASE_CAPITAL > 0 else 0.0
 
+    sync_quietly()
     fng_stats = get_yearly_fng_stats(year)
 
     header = f"📆 <b>Итоги за {year} год</b>\n"
@@ -140,30 +105,30 @@ def main():
         f"• Сумма ориентировочная, без учёта проскальзывания и комиссий биржи.\n"
     )
 
-    # текущее состояние виртуального портфеля
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            state = json.load(f)
+    risk = equity.stats(
+        equity.equity_path(STATE_FILE),
+        datetime.combine(start, time.min, tzinfo=timezone.utc),
+        datetime.combine(end, time.max, tzinfo=timezone.utc),
+    )
+    if risk:
+        result_block += (
+            f"• Стоимость портфеля за год: <b>{risk['return_pct']:+.2f}%</b>, "
+            f"макс. просадка <b>{risk['max_drawdown_pct']:.2f}%</b>, "
+            f"волатильность <b>{risk['volatility_pct']:.1f}%</b>, "
+            f"Sharpe <b>{risk['sharpe']:.2f}</b>.\n"
+        )
 
+    # текущее состояние виртуального портфеля
+    state = read_state(STATE_FILE)
+    if state is not None:
         cash = float(state.get("cash_usd", BASE_CAPITAL))
         btc = float(state.get("btc_amount", 0.0))
         eth = float(state.get("eth_amount", 0.0))
 
         try:
-            btc_price = float(
-                requests.get(
-                    "https://api.coingecko.com/api/v3/simple/price",
-                    params={"ids": "bitcoin", "vs_currencies": "usd"},
-                    timeout=10,
-                ).json()["bitcoin"]["usd"]
-            )
-            eth_price = float(
-                requests.get(
-                    "https://api.coingecko.com/api/v3/simple/price",
-                    params={"ids": "ethereum", "vs_currencies": "usd"},
-                    timeout=10,
-                ).json()["ethereum"]["usd"]
-            )
+            prices = get_prices(["BTCUSDT", "ETHUSDT"], timeout=10)
+            btc_price = prices["BTCUSDT"]
+            eth_price = prices["ETHUSDT"]
         except Exception:
             btc_price = 0.0
             eth_price = 0.0
@@ -193,7 +158,7 @@ def main():
         "через набор и разгрузку в заранее определённых зонах."
     )
 
-    res = send_telegram(header + fng_block + result_block + state_block + comment)
+    res = send_now(header + fng_block + result_block + state_block + comment)
     message_id = res["result"]["message_id"]
 
     yearly_meta[str(year)] = {
@@ -201,20 +166,19 @@ def main():
         "pnl_usd": pnl_year_usd,
         "pnl_pct": pnl_year_pct,
     }
-    save_json(YEARLY_META_FILE, yearly_meta)
+    save_meta(YEARLY_META_FILE, yearly_meta)
 
     # ссылки на предыдущие годы
     links = []
     for y, meta in sorted(yearly_meta.items()):
         mid = meta.get("message_id")
         if mid:
-            links.append(
-                f"• <a href=\"https://t.me/{TELEGRAM_CHAT_ID.lstrip('@')}/{mid}\">{y}</a>"
-            )
+            links.append(f"• <a href=\"{message_link(mid)}\">{y}</a>")
 
     if links:
         links_block = "\n\n🔗 <b>Отчёты за предыдущие годы</b>\n" + "\n".join(links)
-        send_telegram(links_block)
+        enqueue(links_block)
+        flush()
 
     print("Годовой отчёт отправлен.")
 